@@ -1,5 +1,7 @@
 # market data
 order_books = {}
+order_book_snapshots = {}
+best_bid_offers = {}
 instruments = {}
 tickers_container = []
 mark_px_container = []
@@ -11,3 +13,10 @@ positions_container = []
 
 # oms
 orders_container = []
+order_gateway_container = []
+
+# journal
+journal_recorder_container = []
+
+# update queue
+update_queue_container = []
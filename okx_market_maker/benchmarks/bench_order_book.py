@@ -0,0 +1,188 @@
+import random
+import time
+from dataclasses import dataclass, field
+from typing import List
+
+from okx_market_maker.market_data_service.model.OrderBook import OrderBook, OrderBookLevel
+from okx_market_maker.utils.OkxEnum import OrderSide
+
+
+@dataclass
+class ListOrderBook:
+    """
+    The previous list based OrderBook engine, kept as the baseline: linear scan plus list.insert / pop per level.
+    """
+    inst_id: str
+    _bids: List[OrderBookLevel] = field(default_factory=lambda: list())
+    _asks: List[OrderBookLevel] = field(default_factory=lambda: list())
+
+    def set_bids_on_snapshot(self, order_book_level_list: List[OrderBookLevel]):
+        self._bids = sorted(order_book_level_list, reverse=True)
+
+    def set_asks_on_snapshot(self, order_book_level_list: List[OrderBookLevel]):
+        self._asks = sorted(order_book_level_list, reverse=False)
+
+    def set_bids_on_update(self, order_book_level: OrderBookLevel):
+        if not self._bids or self._bids[-1] > order_book_level:
+            self._bids.append(order_book_level)
+        else:
+            for i in range(len(self._bids)):
+                if order_book_level > self._bids[i]:
+                    self._bids.insert(i, order_book_level)
+                    break
+                elif order_book_level == self._bids[i]:
+                    if order_book_level.quantity == 0:
+                        self._bids.pop(i)
+                    else:
+                        self._bids[i] = order_book_level
+                    break
+
+    def set_asks_on_update(self, order_book_level: OrderBookLevel):
+        if not self._asks or self._asks[-1] < order_book_level:
+            self._asks.append(order_book_level)
+        else:
+            for i in range(len(self._asks)):
+                if order_book_level < self._asks[i]:
+                    self._asks.insert(i, order_book_level)
+                    break
+                elif order_book_level == self._asks[i]:
+                    if order_book_level.quantity == 0:
+                        self._asks.pop(i)
+                    else:
+                        self._asks[i] = order_book_level
+                    break
+
+    def bid_by_level(self, level: int) -> OrderBookLevel:
+        return self._bids[level - 1]
+
+    def ask_by_level(self, level: int) -> OrderBookLevel:
+        return self._asks[level - 1]
+
+
+def _level(price_ticks: int, quantity: int) -> OrderBookLevel:
+    price_string = f"{price_ticks / 10:.1f}"
+    quantity_string = str(quantity)
+    return OrderBookLevel(price=float(price_string), quantity=float(quantity), order_count=1,
+                          price_string=price_string, quantity_string=quantity_string, order_count_string="1")
+
+
+def generate_messages(depth: int = 400, num_of_messages: int = 2000, levels_per_message: int = 20, seed: int = 7):
+    """
+    Synthetic "books" traffic around a 30000.0 mid with 0.1 tick: one snapshot of `depth` levels per side, then
+    updates that replace, delete and insert levels anywhere inside the book.
+    """
+    rnd = random.Random(seed)
+    mid_ticks = 300000
+    bids = [_level(mid_ticks - 1 - i, rnd.randint(1, 500)) for i in range(depth)]
+    asks = [_level(mid_ticks + 1 + i, rnd.randint(1, 500)) for i in range(depth)]
+    updates = []
+    for _ in range(num_of_messages):
+        bid_updates = []
+        ask_updates = []
+        for _ in range(levels_per_message // 2):
+            bid_updates.append(_level(mid_ticks - 1 - rnd.randint(0, depth * 2), rnd.choice([0, rnd.randint(1, 500)])))
+            ask_updates.append(_level(mid_ticks + 1 + rnd.randint(0, depth * 2), rnd.choice([0, rnd.randint(1, 500)])))
+        updates.append((bid_updates, ask_updates))
+    return bids, asks, updates
+
+
+def run_updates(order_book, bids, asks, updates) -> float:
+    order_book.set_bids_on_snapshot(list(bids))
+    order_book.set_asks_on_snapshot(list(asks))
+    start = time.perf_counter()
+    for bid_updates, ask_updates in updates:
+        for level in bid_updates:
+            order_book.set_bids_on_update(level)
+        for level in ask_updates:
+            order_book.set_asks_on_update(level)
+        order_book.bid_by_level(1)
+        order_book.ask_by_level(1)
+    return time.perf_counter() - start
+
+
+def run_check_sum(order_book: OrderBook, bids, asks, updates, cached: bool) -> float:
+    order_book.set_bids_on_snapshot(list(bids))
+    order_book.set_asks_on_snapshot(list(asks))
+    start = time.perf_counter()
+    for bid_updates, ask_updates in updates:
+        for level in bid_updates:
+            order_book.set_bids_on_update(level)
+        for level in ask_updates:
+            order_book.set_asks_on_update(level)
+        order_book._current_check_sum() if cached else order_book._calc_check_sum()
+    return time.perf_counter() - start
+
+
+def run_depth_view(bids, asks, updates, iterations: int = 10000):
+    order_book = OrderBook("BTC-USDT-SWAP")
+    plain_sec = run_updates(order_book, bids, asks, updates)
+    order_book = OrderBook("BTC-USDT-SWAP")
+    order_book.depth_view()
+    columnar_sec = run_updates(order_book, bids, asks, updates)
+    print(f"update us/msg without columns {plain_sec / len(updates) * 1e6:.2f}, "
+          f"with columns {columnar_sec / len(updates) * 1e6:.2f}")
+    depth_view = order_book.depth_view()
+    helpers = {
+        "depth_view": lambda: order_book.depth_view(),
+        "cumulative_depth": lambda: depth_view.cumulative_depth(OrderSide.BUY, depth_view.ask_prices[200]),
+        "price_for_size": lambda: depth_view.price_for_size(OrderSide.SELL, 5000),
+        "vwap_for_size": lambda: depth_view.vwap_for_size(OrderSide.BUY, 5000),
+        "imbalance": lambda: depth_view.imbalance(400),
+        "microprice": lambda: depth_view.microprice(),
+    }
+    for name, helper in helpers.items():
+        start = time.perf_counter()
+        for _ in range(iterations):
+            helper()
+        print(f"{name:>16s} {(time.perf_counter() - start) / iterations * 1e6:8.2f} us")
+
+
+def run_wide_book(max_depth: int, num_of_messages: int = 20000, width: int = 5000, seed: int = 11):
+    """
+    Updates spread far beyond the 400 snapshot levels, as the exchange book widens over a long session.
+    :return: us per message, levels held on the bid side (sorted part and overflow)
+    """
+    rnd = random.Random(seed)
+    mid_ticks = 300000
+    order_book = OrderBook("BTC-USDT-SWAP", max_depth=max_depth)
+    order_book.set_bids_on_snapshot([_level(mid_ticks - 1 - i, rnd.randint(1, 500)) for i in range(400)])
+    order_book.set_asks_on_snapshot([_level(mid_ticks + 1 + i, rnd.randint(1, 500)) for i in range(400)])
+    updates = [(_level(mid_ticks - 1 - rnd.randint(0, width), rnd.choice([0, rnd.randint(1, 500)])),
+                _level(mid_ticks + 1 + rnd.randint(0, width), rnd.choice([0, rnd.randint(1, 500)])))
+               for _ in range(num_of_messages)]
+    start = time.perf_counter()
+    for bid_level, ask_level in updates:
+        order_book.set_bids_on_update(bid_level)
+        order_book.set_asks_on_update(ask_level)
+        order_book._current_check_sum()
+    elapsed = time.perf_counter() - start
+    return elapsed / num_of_messages * 1e6, len(order_book._bids) + len(order_book._bids._overflow)
+
+
+def main():
+    print("depth  messages  list_us/msg  indexed_us/msg  speedup")
+    for depth in [25, 100, 400]:
+        bids, asks, updates = generate_messages(depth=depth)
+        list_sec = run_updates(ListOrderBook("BTC-USDT-SWAP"), bids, asks, updates)
+        indexed_sec = run_updates(OrderBook("BTC-USDT-SWAP"), bids, asks, updates)
+        print(f"{depth:5d}  {len(updates):8d}  {list_sec / len(updates) * 1e6:11.2f}  "
+              f"{indexed_sec / len(updates) * 1e6:14.2f}  {list_sec / indexed_sec:6.1f}x")
+    print("\nchecksum verified on every message, 400 levels")
+    print("levels/msg  rebuild_us/msg  cached_us/msg")
+    for levels_per_message in [2, 20]:
+        bids, asks, updates = generate_messages(depth=400, levels_per_message=levels_per_message)
+        rebuild_sec = run_check_sum(OrderBook("BTC-USDT-SWAP"), bids, asks, updates, cached=False)
+        cached_sec = run_check_sum(OrderBook("BTC-USDT-SWAP"), bids, asks, updates, cached=True)
+        print(f"{levels_per_message:10d}  {rebuild_sec / len(updates) * 1e6:14.2f}  "
+              f"{cached_sec / len(updates) * 1e6:13.2f}")
+    print("\nwide book, updates over 5000 ticks on each side")
+    print("max_depth  us/msg  bid levels held")
+    for max_depth in [0, 50]:
+        us_per_message, levels_held = run_wide_book(max_depth)
+        print(f"{max_depth:9d}  {us_per_message:6.2f}  {levels_held:15d}")
+    print("\ncolumnar depth view, 400 levels")
+    run_depth_view(*generate_messages(depth=400))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import gc
+import json
+import multiprocessing
+import os
+import random
+import tracemalloc
+from dataclasses import dataclass
+
+from okx_market_maker import order_books
+from okx_market_maker.benchmarks.bench_order_book import ListOrderBook
+from okx_market_maker.market_data_service.WssMarketDataService import on_orderbook_snapshot_or_update
+from okx_market_maker.market_data_service.model.OrderBook import OrderBookLevel
+
+
+@dataclass
+class DataclassOrderBookLevel:
+    """
+    The previous OrderBookLevel, kept as the baseline: a dataclass with price, quantity and order count stored both
+    parsed and as strings.
+    """
+    price: float
+    quantity: float
+    order_count: int
+    price_string: str
+    quantity_string: str
+    order_count_string: str
+
+    def __lt__(self, other):
+        return self.price < other.price
+
+    def __eq__(self, other):
+        return self.price == other.price
+
+
+def _dataclass_level(level_info) -> DataclassOrderBookLevel:
+    return DataclassOrderBookLevel(price=float(level_info[0]), quantity=float(level_info[1]),
+                                   order_count=int(level_info[3]), price_string=level_info[0],
+                                   quantity_string=level_info[1], order_count_string=level_info[3])
+
+
+def generate_snapshot(inst_id: str, depth: int, rnd: random.Random) -> dict:
+    mid_ticks = rnd.randint(10000, 500000)
+    message = {
+        "arg": {"channel": "books", "instId": inst_id},
+        "action": "snapshot",
+        "data": [{
+            "bids": [[f"{(mid_ticks - 1 - i) / 10:.1f}", str(rnd.randint(1, 5000)), "0", str(rnd.randint(1, 30))]
+                     for i in range(depth)],
+            "asks": [[f"{(mid_ticks + 1 + i) / 10:.1f}", str(rnd.randint(1, 5000)), "0", str(rnd.randint(1, 30))]
+                     for i in range(depth)],
+            "ts": "1597026383085",
+        }]
+    }
+    # round trip so that the strings are fresh objects, as they are when parsed from the socket
+    return json.loads(json.dumps(message))
+
+
+def generate_update(inst_id: str, num_of_levels: int, rnd: random.Random) -> dict:
+    message = {
+        "arg": {"channel": "books", "instId": inst_id},
+        "action": "update",
+        "data": [{
+            "bids": [[f"{rnd.randint(10000, 500000) / 10:.1f}", str(rnd.randint(0, 5000)), "0",
+                      str(rnd.randint(1, 30))] for _ in range(num_of_levels)],
+            "asks": [[f"{rnd.randint(10000, 500000) / 10:.1f}", str(rnd.randint(0, 5000)), "0",
+                      str(rnd.randint(1, 30))] for _ in range(num_of_levels)],
+            "ts": "1597026383085",
+        }]
+    }
+    return json.loads(json.dumps(message))
+
+
+def rss_bytes() -> int:
+    """
+    Current resident set size, 0 where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def _rss_in_child(make_messages, build, connection):
+    gc.collect()
+    before = rss_bytes()
+    messages = make_messages()
+    books = build(messages)
+    messages.clear()
+    gc.collect()
+    connection.send(rss_bytes() - before)
+    connection.close()
+    books.clear()
+
+
+def measure_rss(make_messages, build) -> int:
+    """
+    Resident memory added by the books build makes of the messages, once the messages are freed. Run in a forked
+    process so that each variant starts from the same heap.
+    """
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_rss_in_child, args=(make_messages, build, sender))
+    process.start()
+    rss = receiver.recv()
+    process.join()
+    return rss
+
+
+def measure(build) -> tuple:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    books = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    return books, sum(stat.size_diff for stat in stats), sum(stat.count_diff for stat in stats)
+
+
+def build_dataclass_books(messages) -> dict:
+    books = {}
+    for message in messages:
+        order_book = ListOrderBook(message["arg"]["instId"])
+        order_book.set_bids_on_snapshot([_dataclass_level(level) for level in message["data"][0]["bids"]])
+        order_book.set_asks_on_snapshot([_dataclass_level(level) for level in message["data"][0]["asks"]])
+        books[order_book.inst_id] = order_book
+    return books
+
+
+def build_slotted_books(messages) -> dict:
+    for message in messages:
+        on_orderbook_snapshot_or_update(message)
+    return order_books
+
+
+def main(num_of_instruments: int = 40, depth: int = 400, update_levels: int = 20):
+    def make_messages():
+        rnd = random.Random(7)
+        return [generate_snapshot(f"COIN{i}-USDT-SWAP", depth, rnd) for i in range(num_of_instruments)]
+
+    variants = [("dataclass (previous)", build_dataclass_books, _dataclass_level),
+                ("slotted (current)", build_slotted_books, OrderBookLevel.from_wire)]
+    num_of_levels = num_of_instruments * depth * 2
+    # before any book is built in this process, so that no variant reuses memory freed by another
+    rss_by_variant = {name: measure_rss(make_messages, build) for name, build, _ in variants}
+    messages = make_messages()
+    rnd = random.Random(11)
+    updates = [generate_update(message["arg"]["instId"], update_levels, rnd) for message in messages]
+
+    print(f"{num_of_instruments} instruments x {depth} levels per side, book state excluding the parsed messages")
+    print("level                 bytes/level  allocations/level  total MB")
+    for name, build, _ in variants:
+        books, size, count = measure(lambda: build(messages))
+        print(f"{name:20s}  {size / num_of_levels:11.1f}  {count / num_of_levels:17.2f}  {size / 1e6:8.2f}")
+        books.clear()
+    print("book state including the wire strings it retains, and RSS, once the messages are freed")
+    print("level                 bytes/level  total MB  RSS MB")
+    for name, build, _ in variants:
+        books, size, _ = measure(lambda: build(make_messages()))
+        rss = rss_by_variant[name]
+        print(f"{name:20s}  {size / num_of_levels:11.1f}  {size / 1e6:8.2f}  {rss / 1e6 if rss else float('nan'):6.2f}")
+        books.clear()
+    print(f"update messages of {update_levels} levels per side, levels parsed per message")
+    print("level                 bytes/message  allocations/message")
+    for name, _, parse in variants:
+        levels, size, count = measure(lambda: {i: [parse(level) for side in ["bids", "asks"]
+                                                   for level in update["data"][0][side]]
+                                               for i, update in enumerate(updates)})
+        print(f"{name:20s}  {size / len(updates):13.1f}  {count / len(updates):19.1f}")
+        levels.clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import time
+from copy import deepcopy
+
+from okx_market_maker import orders_container
+from okx_market_maker.order_management_service.WssOrderManagementService import on_orders_update
+from okx_market_maker.order_management_service.model.Order import Orders
+from okx_market_maker.order_management_service.model.OrderArchive import OrderArchive
+from okx_market_maker.strategy.BaseStrategy import BaseStrategy
+from okx_market_maker.tests.fixtures import order_json
+
+
+def main(num_of_orders: int = 10000, iterations: int = 200):
+    orders_container.clear()
+    orders_container.append(Orders.init_from_json({"data": [order_json(i) for i in range(num_of_orders)]}))
+    start = time.perf_counter()
+    for _ in range(iterations // 10):
+        deepcopy(orders_container[0])
+    deepcopy_us = (time.perf_counter() - start) / (iterations // 10) * 1e6
+    start = time.perf_counter()
+    for _ in range(iterations):
+        BaseStrategy.get_orders()
+    snapshot_us = (time.perf_counter() - start) / iterations * 1e6
+    start = time.perf_counter()
+    for i in range(iterations):
+        on_orders_update({"arg": {"channel": "orders"}, "data": [order_json(i, state="filled")]})
+    publish_us = (time.perf_counter() - start) / iterations * 1e6
+    print(f"{num_of_orders} cached orders")
+    print(f"get_orders with deepcopy (previous) {deepcopy_us:12.2f} us")
+    print(f"get_orders copy-on-write snapshot   {snapshot_us:12.2f} us")
+    print(f"publish one orders push (socket thread, copy-on-write) {publish_us:.2f} us")
+    orders_container.clear()
+    print("\nlong session, 20000 orders placed and canceled")
+    for bounded in [False, True]:
+        cached, publish_us = run_long_session(bounded)
+        print(f"{'bounded' if bounded else 'unbounded':>9s} cache: {cached:6d} orders cached, "
+              f"{publish_us:8.2f} us per push")
+
+
+def run_long_session(bounded: bool, num_of_orders: int = 20000, resting: int = 20):
+    """
+    Requoting for a long session: every order is placed, then canceled once `resting` newer orders are live.
+    The bounded cache uses a grace period of 0, as if the session was long enough for every canceled order to
+    expire, and a cap of 1000 orders.
+    :return: orders cached at the end, us per push over the last 1000 pushes
+    """
+    if bounded:
+        orders = Orders(terminal_grace_sec=0, max_orders=1000, archive=OrderArchive(1000))
+    else:
+        orders = Orders(terminal_grace_sec=float("inf"), max_orders=10 ** 9, archive=OrderArchive(1000))
+    orders_container.clear()
+    orders_container.append(orders)
+    start = 0
+    for i in range(num_of_orders):
+        if i == num_of_orders - 1000:
+            start = time.perf_counter()
+        data = [order_json(i)]
+        if i >= resting:
+            data.append(order_json(i - resting, state="canceled"))
+        on_orders_update({"arg": {"channel": "orders"}, "data": data})
+    publish_us = (time.perf_counter() - start) / 1000 * 1e6
+    cached = len(orders_container[0]._order_map)
+    orders_container.clear()
+    return cached, publish_us
+
+
+if __name__ == "__main__":
+    main()
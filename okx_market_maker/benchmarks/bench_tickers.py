@@ -0,0 +1,70 @@
+import json
+import time
+import tracemalloc
+
+from okx_market_maker.market_data_service.model.Tickers import Ticker, Tickers
+
+
+def _ticker_json(i: int, ts: int) -> dict:
+    return {"instType": "SPOT", "instId": f"C{i}-USDT", "last": "9999.99", "lastSz": "0.1", "askPx": "9999.99",
+            "askSz": "11", "bidPx": "8888.88", "bidSz": "5", "open24h": "9000", "high24h": "10000",
+            "low24h": "8888.88", "volCcy24h": "2222", "vol24h": "2222", "sodUtc0": "2222", "sodUtc8": "2222",
+            "ts": str(ts)}
+
+
+def _legacy_update(ticker_map: dict, data: list) -> dict:
+    """
+    Previous store: every ticker of every message parsed into a Ticker.
+    """
+    for info in data:
+        ticker_map[info["instId"]] = Ticker.init_from_json(info)
+    return ticker_map
+
+
+def _columnar_store(data: list) -> Tickers:
+    tickers = Tickers()
+    tickers.update_from_data(data)
+    return tickers
+
+
+def _time_us(update, store, messages) -> float:
+    start = time.perf_counter()
+    for data in messages:
+        update(store, data)
+    return (time.perf_counter() - start) / len(messages) * 1e6
+
+
+def main(num_of_tickers: int = 700, iterations: int = 50):
+    unchanged = [[_ticker_json(i, 1597026383085) for i in range(num_of_tickers)]] * iterations
+    changed = [[_ticker_json(i, 1597026383085 + k + 1) for i in range(num_of_tickers)] for k in range(iterations)]
+    print(f"{num_of_tickers} spot tickers per REST response, us per response")
+    for name, messages in [("unchanged ts", unchanged), ("advanced ts", changed)]:
+        legacy_map = {}
+        _legacy_update(legacy_map, unchanged[0])
+        tickers = Tickers()
+        tickers.update_from_data(unchanged[0])
+        legacy_us = _time_us(_legacy_update, legacy_map, messages)
+        columnar_us = _time_us(Tickers.update_from_data, tickers, messages)
+        print(f"{name:>12s}: Ticker objects (previous) {legacy_us:10.2f} us, columnar {columnar_us:10.2f} us")
+    legacy_bytes = _retained_bytes(lambda data: _legacy_update({}, data), num_of_tickers)
+    columnar_bytes = _retained_bytes(_columnar_store, num_of_tickers)
+    print(f"memory retained once the messages are freed: Ticker objects (previous) {legacy_bytes / 1024:.1f} KiB, "
+          f"columnar {columnar_bytes / 1024:.1f} KiB")
+
+
+def _retained_bytes(build, num_of_tickers: int) -> int:
+    """
+    :param build: applies the messages to a new store, and returns it
+    :return: bytes still allocated after the messages are freed, i.e. held by the store
+    """
+    tracemalloc.start()
+    data = json.loads(json.dumps([_ticker_json(i, 1597026383085) for i in range(num_of_tickers)]))
+    store = build(data)
+    del data
+    retained_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del store
+    return retained_bytes
+
+if __name__ == "__main__":
+    main()
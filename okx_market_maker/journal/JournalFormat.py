@@ -0,0 +1,56 @@
+"""
+Journal file layout, all integers little endian:
+
+    file header   FILE_MAGIC
+    chunk         CHUNK_HEADER, then compressed_length bytes of zlib compressed records
+    ...
+
+Each record in a decompressed chunk is RECORD_HEADER (local receive time in ns, length of the message) followed by
+the message as compact JSON. Chunks are appended whole, so a file cut short by a crash loses at most its last
+chunk, and the first / last receive times in the chunk headers allow seeking by time without decompressing.
+"""
+import json
+import struct
+import zlib
+from typing import List, Tuple
+
+FILE_MAGIC = b"OKXJRNL1"
+CHUNK_MAGIC = b"CHNK"
+# magic, number of records, raw length, compressed length, first receive time ns, last receive time ns
+CHUNK_HEADER = struct.Struct("<4sIIIqq")
+# receive time ns, message length
+RECORD_HEADER = struct.Struct("<qI")
+JOURNAL_FILE_SUFFIX = ".journal"
+
+
+def encode_chunk(records: List[Tuple[int, dict]], compress_level: int = 6) -> bytes:
+    """
+    :param records: list of (receive time ns, message)
+    :param compress_level: zlib compression level
+    :return: chunk header followed by the compressed records
+    """
+    parts = []
+    for recv_ns, message in records:
+        body = json.dumps(message, separators=(",", ":")).encode()
+        parts.append(RECORD_HEADER.pack(recv_ns, len(body)))
+        parts.append(body)
+    raw = b"".join(parts)
+    compressed = zlib.compress(raw, compress_level)
+    header = CHUNK_HEADER.pack(CHUNK_MAGIC, len(records), len(raw), len(compressed), records[0][0], records[-1][0])
+    return header + compressed
+
+
+def decode_chunk(compressed: bytes) -> List[Tuple[int, dict]]:
+    """
+    :param compressed: compressed records of one chunk, without the chunk header
+    :return: list of (receive time ns, message)
+    """
+    raw = zlib.decompress(compressed)
+    records = []
+    offset = 0
+    while offset < len(raw):
+        recv_ns, length = RECORD_HEADER.unpack_from(raw, offset)
+        offset += RECORD_HEADER.size
+        records.append((recv_ns, json.loads(raw[offset:offset + length])))
+        offset += length
+    return records
@@ -0,0 +1,90 @@
+import logging
+import mmap
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+from okx_market_maker.journal.JournalFormat import FILE_MAGIC, CHUNK_HEADER, CHUNK_MAGIC, decode_chunk
+
+
+@dataclass
+class ChunkIndexEntry:
+    offset: int
+    compressed_length: int
+    num_of_records: int
+    first_recv_ns: int
+    last_recv_ns: int
+
+
+class JournalReader:
+    """
+    Reads a journal file through a read-only memory map. Opening the file scans the chunk headers only, which gives
+    an index of the chunks by receive time; chunks are decompressed one at a time while iterating.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._file = open(file_path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(FILE_MAGIC)] != FILE_MAGIC:
+            self.close()
+            raise ValueError(f"{file_path} is not a journal file.")
+        self.index: List[ChunkIndexEntry] = self._build_index()
+        self._last_recv_ns_list = [entry.last_recv_ns for entry in self.index]
+
+    def _build_index(self) -> List[ChunkIndexEntry]:
+        index = []
+        offset = len(FILE_MAGIC)
+        size = len(self._mmap)
+        while offset + CHUNK_HEADER.size <= size:
+            magic, num_of_records, _, compressed_length, first_recv_ns, last_recv_ns = \
+                CHUNK_HEADER.unpack_from(self._mmap, offset)
+            end = offset + CHUNK_HEADER.size + compressed_length
+            if magic != CHUNK_MAGIC or end > size:
+                logging.warning(f"{self.file_path}: incomplete chunk at offset {offset}, ignoring the rest of the file")
+                break
+            index.append(ChunkIndexEntry(offset=offset + CHUNK_HEADER.size, compressed_length=compressed_length,
+                                         num_of_records=num_of_records, first_recv_ns=first_recv_ns,
+                                         last_recv_ns=last_recv_ns))
+            offset = end
+        return index
+
+    def num_of_records(self) -> int:
+        return sum(entry.num_of_records for entry in self.index)
+
+    def time_range(self) -> Tuple[int, int]:
+        """
+        :return: receive time ns of the first and the last record, (0, 0) if the file holds no chunk
+        """
+        if not self.index:
+            return 0, 0
+        return self.index[0].first_recv_ns, self.index[-1].last_recv_ns
+
+    def iter_records(self, start_ns: Optional[int] = None, end_ns: Optional[int] = None) \
+            -> Iterator[Tuple[int, dict]]:
+        """
+        :param start_ns: skip records received before this time, chunks ending earlier are not decompressed
+        :param end_ns: stop at the first record received after this time
+        :return: iterator of (receive time ns, message)
+        """
+        chunk_index = bisect_left(self._last_recv_ns_list, start_ns) if start_ns is not None else 0
+        for entry in self.index[chunk_index:]:
+            if end_ns is not None and entry.first_recv_ns > end_ns:
+                return
+            compressed = self._mmap[entry.offset:entry.offset + entry.compressed_length]
+            for recv_ns, message in decode_chunk(compressed):
+                if start_ns is not None and recv_ns < start_ns:
+                    continue
+                if end_ns is not None and recv_ns > end_ns:
+                    return
+                yield recv_ns, message
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
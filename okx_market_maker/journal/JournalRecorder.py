@@ -0,0 +1,142 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from okx_market_maker.journal.JournalFormat import FILE_MAGIC, JOURNAL_FILE_SUFFIX, encode_chunk
+from okx_market_maker.settings import JOURNAL_DIRECTORY, JOURNAL_CHANNELS, JOURNAL_MAX_FILE_MB, \
+    JOURNAL_MAX_FILE_SEC, JOURNAL_CHUNK_MAX_RECORDS, JOURNAL_CHUNK_MAX_DELAY_SEC
+
+_STOP = object()
+
+
+class JournalRecorder:
+    """
+    Append-only recorder of the messages received by the websocket callbacks. record() only stamps the local receive
+    time and queues the message; a background writer thread serializes the queued messages into zlib compressed
+    chunks and rotates files by size or age, so no file I/O happens on the socket thread.
+
+    Messages are queued by reference, the callbacks do not mutate the messages they receive.
+    """
+
+    def __init__(self, directory: str = JOURNAL_DIRECTORY, channels: Optional[List[str]] = JOURNAL_CHANNELS,
+                 max_file_bytes: int = JOURNAL_MAX_FILE_MB * 1024 * 1024, max_file_sec: float = JOURNAL_MAX_FILE_SEC,
+                 chunk_max_records: int = JOURNAL_CHUNK_MAX_RECORDS,
+                 chunk_max_delay_sec: float = JOURNAL_CHUNK_MAX_DELAY_SEC, file_prefix: str = "md"):
+        """
+        :param directory: directory of the journal files, created if missing
+        :param channels: channels to record, None to record every channel
+        :param max_file_bytes: start a new file once the current one reaches this size
+        :param max_file_sec: start a new file once the current one is this old
+        :param chunk_max_records: write a chunk once it holds this many messages
+        :param chunk_max_delay_sec: write a chunk once its first message is this old
+        :param file_prefix: journal file name prefix
+        """
+        self.directory = directory
+        self.channels = set(channels) if channels is not None else None
+        self.max_file_bytes = max_file_bytes
+        self.max_file_sec = max_file_sec
+        self.chunk_max_records = chunk_max_records
+        self.chunk_max_delay_sec = chunk_max_delay_sec
+        self.file_prefix = file_prefix
+        self.file_paths: List[str] = []
+        self.records_written = 0
+        self.chunks_written = 0
+        self.bytes_written = 0
+        self.records_dropped = 0
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._file_open_time = 0
+        self._file_bytes = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="JournalRecorder", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """
+        Write out everything queued so far and close the current file.
+        """
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def record(self, message: dict):
+        """
+        Called on the socket thread, from the service callbacks.
+        :param message: message as received by the callback
+        """
+        recv_ns = time.time_ns()
+        if self.channels is not None:
+            arg = message.get("arg")
+            if not arg or arg.get("channel") not in self.channels:
+                return
+        self._queue.put((recv_ns, message))
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self):
+        records: List[Tuple[int, dict]] = []
+        chunk_deadline = 0
+        while True:
+            timeout = max(0.0, chunk_deadline - time.time()) if records else self.chunk_max_delay_sec
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                if records:
+                    self._write_chunk(records)
+                self._close_file()
+                return
+            if item is not None:
+                if not records:
+                    chunk_deadline = time.time() + self.chunk_max_delay_sec
+                records.append(item)
+            if records and (len(records) >= self.chunk_max_records or time.time() >= chunk_deadline):
+                self._write_chunk(records)
+                records = []
+
+    def _write_chunk(self, records: List[Tuple[int, dict]]):
+        try:
+            chunk = encode_chunk(records)
+            if self._file is None or self._file_bytes >= self.max_file_bytes or \
+                    time.time() - self._file_open_time >= self.max_file_sec:
+                self._rotate()
+            self._file.write(chunk)
+            self._file.flush()
+        except (OSError, TypeError, ValueError) as e:
+            self.records_dropped += len(records)
+            logging.warning(f"Journal failed to write {len(records)} messages: {e}")
+            return
+        self._file_bytes += len(chunk)
+        self.bytes_written += len(chunk)
+        self.records_written += len(records)
+        self.chunks_written += 1
+
+    def _rotate(self):
+        self._close_file()
+        file_name = f"{self.file_prefix}-{time.strftime('%Y%m%d-%H%M%S')}-{len(self.file_paths):04d}" \
+                    f"{JOURNAL_FILE_SUFFIX}"
+        file_path = os.path.join(self.directory, file_name)
+        self._file = open(file_path, "ab")
+        self._file.write(FILE_MAGIC)
+        self._file_open_time = time.time()
+        self._file_bytes = len(FILE_MAGIC)
+        self.file_paths.append(file_path)
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,79 @@
+import argparse
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from okx_market_maker.journal.JournalReader import JournalReader
+from okx_market_maker.market_data_service.WssMarketDataService import ORDER_BOOK_CHANNELS, \
+    on_orderbook_snapshot_or_update
+from okx_market_maker.utils.LatencyStats import LatencyStats
+
+
+@dataclass
+class ReplayStats:
+    messages: int = 0
+    skipped: int = 0
+    elapsed_sec: float = 0
+    apply_latency: LatencyStats = field(default_factory=LatencyStats)
+
+    def messages_per_sec(self) -> float:
+        return self.messages / self.elapsed_sec if self.elapsed_sec else 0
+
+    def __str__(self):
+        return f"{self.messages} book messages in {self.elapsed_sec:.3f}s, {self.messages_per_sec():.0f} msgs/sec, " \
+               f"{self.skipped} other messages skipped, apply latency {self.apply_latency}"
+
+
+class JournalReplay:
+    """
+    Feeds the book messages of recorded journal files through on_orderbook_snapshot_or_update into order_books, in
+    receive time order of each file, either as fast as possible or paced on the recorded receive times.
+    """
+
+    def __init__(self, file_paths: List[str], speed: float = 0):
+        """
+        :param file_paths: journal files, replayed in the given order
+        :param speed: 0 to replay as fast as possible, otherwise the multiple of the recorded wall-clock rate
+        """
+        self.file_paths = file_paths
+        self.speed = speed
+
+    def run(self, start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> ReplayStats:
+        """
+        :param start_ns: replay from this receive time
+        :param end_ns: replay up to this receive time
+        :return: ReplayStats, the apply latency covers on_orderbook_snapshot_or_update only
+        """
+        stats = ReplayStats()
+        first_recv_ns = 0
+        replay_start_time = time.perf_counter()
+        for file_path in self.file_paths:
+            with JournalReader(file_path) as reader:
+                for recv_ns, message in reader.iter_records(start_ns=start_ns, end_ns=end_ns):
+                    arg = message.get("arg")
+                    if not arg or arg.get("channel") not in ORDER_BOOK_CHANNELS or not message.get("data"):
+                        stats.skipped += 1
+                        continue
+                    if self.speed > 0:
+                        if not first_recv_ns:
+                            first_recv_ns = recv_ns
+                        wait_sec = (recv_ns - first_recv_ns) / 1e9 / self.speed \
+                            - (time.perf_counter() - replay_start_time)
+                        if wait_sec > 0:
+                            time.sleep(wait_sec)
+                    apply_start_time = time.perf_counter()
+                    on_orderbook_snapshot_or_update(message)
+                    stats.apply_latency.record_since(apply_start_time, time.perf_counter())
+                    stats.messages += 1
+        stats.elapsed_sec = time.perf_counter() - replay_start_time
+        return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded book messages into order_books.")
+    parser.add_argument("file_paths", nargs="+", help="journal files, in replay order")
+    parser.add_argument("--speed", type=float, default=0, help="0 for as fast as possible, else wall-clock multiple")
+    parser.add_argument("--start-ns", type=int, default=None, help="replay from this receive time")
+    parser.add_argument("--end-ns", type=int, default=None, help="replay up to this receive time")
+    arguments = parser.parse_args()
+    print(JournalReplay(arguments.file_paths, speed=arguments.speed).run(arguments.start_ns, arguments.end_ns))
@@ -0,0 +1,92 @@
+import logging
+import threading
+import time
+import traceback
+from typing import Dict, List
+
+from okx.PublicData import PublicAPI
+
+from okx_market_maker import instruments
+from okx_market_maker.market_data_service.model.Instrument import Instrument
+from okx_market_maker.market_data_service.model.InstrumentCache import InstrumentCache
+from okx_market_maker.settings import IS_PAPER_TRADING, INSTRUMENT_PRELOAD_INST_TYPES, INSTRUMENT_CACHE_PATH, \
+    INSTRUMENT_CACHE_MAX_AGE_SEC, INSTRUMENT_REFRESH_SEC
+from okx_market_maker.utils.OkxEnum import InstState
+
+
+class InstrumentMetadataService(threading.Thread):
+    """
+    Fills okx_market_maker.instruments ahead of InstrumentUtil.get_instrument, so that the first lookup of an
+    instrument, e.g. of a new position in the risk calculation, is a dict read instead of a REST call. preload
+    reads the instruments from the cache file at cache_path if younger than cache_max_age_sec, or fetches every
+    instrument of each of inst_types, one call per instType, and saves them there. The thread then fetches them
+    again every refresh_sec, to pick up tick and lot size changes without a restart.
+
+    Only live instruments are cached, others are left to get_instrument to reject. OPTION instruments can only be
+    listed per underlying and are left to get_instrument by default.
+    """
+    def __init__(self, is_paper_trading: bool = IS_PAPER_TRADING, inst_types: List[str] = None,
+                 cache_path: str = INSTRUMENT_CACHE_PATH, cache_max_age_sec: float = INSTRUMENT_CACHE_MAX_AGE_SEC,
+                 refresh_sec: float = INSTRUMENT_REFRESH_SEC):
+        super().__init__()
+        self.public_api = PublicAPI(flag='0' if not is_paper_trading else '1', debug=False)
+        self.is_paper_trading = is_paper_trading
+        self.inst_types = inst_types if inst_types is not None else INSTRUMENT_PRELOAD_INST_TYPES
+        self.cache_path = cache_path
+        self.cache_max_age_sec = cache_max_age_sec
+        self.refresh_sec = refresh_sec
+
+    def run(self) -> None:
+        while 1:
+            try:
+                time.sleep(self.refresh_sec)
+                self.refresh()
+            except KeyboardInterrupt:
+                break
+            except Exception:
+                logging.warning(f"Instrument refresh failed: {traceback.format_exc()}")
+
+    def preload(self) -> int:
+        """
+        :return: instruments loaded, from the cache file or else the exchange
+        """
+        if not self.inst_types:
+            return 0
+        cache = InstrumentCache.load(self.cache_path, self.is_paper_trading, self.cache_max_age_sec)
+        if cache is not None:
+            instruments.update(cache.instruments)
+            return len(cache.instruments)
+        return len(self.refresh())
+
+    def refresh(self) -> Dict[str, Instrument]:
+        """
+        Fetch the instruments of each of inst_types, and replace those cached. The cache file is saved once every
+        instType was fetched.
+        :return: instruments fetched
+        """
+        fetched = {}
+        complete = True
+        for inst_type in self.inst_types:
+            json_response = self.public_api.get_instruments(instType=inst_type)
+            if json_response.get("code") != "0":
+                logging.warning(f"Failed to fetch {inst_type} instruments: {json_response}")
+                complete = False
+                continue
+            for instrument_json in json_response["data"]:
+                instrument = Instrument.init_from_json(instrument_json)
+                if instrument.state == InstState.LIVE:
+                    fetched[f"{instrument.inst_id}:{instrument.inst_type.value}"] = instrument
+        for key, instrument in fetched.items():
+            cached = instruments.get(key)
+            if cached is not None and (cached.tick_sz, cached.lot_sz, cached.min_sz) != \
+                    (instrument.tick_sz, instrument.lot_sz, instrument.min_sz):
+                logging.warning(f"{key} tick size {cached.tick_sz} -> {instrument.tick_sz}, lot size "
+                                f"{cached.lot_sz} -> {instrument.lot_sz}, min size {cached.min_sz} -> "
+                                f"{instrument.min_sz}")
+        instruments.update(fetched)
+        if complete and self.cache_path:
+            try:
+                InstrumentCache(instruments=fetched, is_paper_trading=self.is_paper_trading).save(self.cache_path)
+            except OSError:
+                logging.warning(f"Failed to save instrument cache {self.cache_path}: {traceback.format_exc()}")
+        return fetched
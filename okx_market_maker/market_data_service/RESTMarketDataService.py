@@ -2,48 +2,142 @@ import logging
 import threading
 import time
 import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
 
-from okx.exceptions import OkxAPIException, OkxParamsException, OkxRequestException
+import httpx
 from okx.MarketData import MarketAPI
 from okx.PublicData import PublicAPI
 from okx_market_maker.market_data_service.model.MarkPx import MarkPxCache
-from okx_market_maker.settings import IS_PAPER_TRADING
+from okx_market_maker.settings import IS_PAPER_TRADING, REST_MARKET_DATA_REFRESH_SEC, REST_MARKET_DATA_RETRY_SEC, \
+    REST_MARKET_DATA_MAX_WORKERS
 from okx_market_maker import tickers_container, mark_px_container
 from okx_market_maker.market_data_service.model.Tickers import Tickers
+from okx_market_maker.utils.LatencyStats import LatencyStats
 from okx_market_maker.utils.OkxEnum import InstType
 
+POLL_MIN_SLEEP_SEC = 0.05  # while a due fetch is still in flight
+
+
+@dataclass
+class RESTFetchStats:
+    latency: LatencyStats = field(default_factory=LatencyStats)
+    failures: int = 0
+    last_success_time: float = 0
+
+    def staleness_sec(self, now: float = None) -> float:
+        """
+        :return: seconds since the last successful fetch, inf before the first one
+        """
+        if not self.last_success_time:
+            return float("inf")
+        return (now or time.time()) - self.last_success_time
+
+
+@dataclass
+class _RESTEndpoint:
+    inst_type: InstType
+    fetch: Callable[[], Dict]
+    apply: Callable[[Dict], None]
+    refresh_sec: float
+    next_time: float = 0
+    future: Optional[Future] = None
+    stats: RESTFetchStats = field(default_factory=RESTFetchStats)
+
 
 class RESTMarketDataService(threading.Thread):
-    def __init__(self, is_paper_trading=IS_PAPER_TRADING):
+    """
+    Polls the spot tickers and the mark prices of the MARGIN, SWAP, FUTURES and OPTION instruments. Each instType
+    is refreshed every REST_MARKET_DATA_REFRESH_SEC[instType] seconds from the start of its previous fetch, on a
+    pool of worker threads, so that the fetches of different instTypes overlap instead of adding up. The market
+    and public APIs share one HTTP/2 client, whose connections are kept alive between fetches.
+
+    stats records the fetch latency, the failures and the time of the last successful fetch per instType; a
+    failed fetch is retried after REST_MARKET_DATA_RETRY_SEC.
+    """
+    def __init__(self, is_paper_trading=IS_PAPER_TRADING, refresh_sec: Dict[str, float] = None,
+                 max_workers: int = REST_MARKET_DATA_MAX_WORKERS, retry_sec: float = REST_MARKET_DATA_RETRY_SEC):
         super().__init__()
         self.market_api = MarketAPI(flag='0' if not is_paper_trading else '1', debug=False)
         self.public_api = PublicAPI(flag='0' if not is_paper_trading else '1', debug=False)
+        self.http_client = httpx.Client(base_url=self.market_api.domain, http2=True,
+                                        limits=httpx.Limits(max_connections=max_workers,
+                                                            max_keepalive_connections=max_workers))
+        self.market_api.client.close()
+        self.public_api.client.close()
+        self.market_api.client = self.http_client
+        self.public_api.client = self.http_client
+        self.retry_sec = retry_sec
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="RESTMarketData")
         if not tickers_container:
             tickers_container.append(Tickers())
         if not mark_px_container:
             mark_px_container.append(MarkPxCache())
+        refresh_sec = refresh_sec if refresh_sec is not None else REST_MARKET_DATA_REFRESH_SEC
+        self._endpoints = [_RESTEndpoint(
+            inst_type=InstType.SPOT, fetch=lambda: self.market_api.get_tickers(instType=InstType.SPOT.value),
+            apply=lambda json_response: tickers_container[0].update_from_json(json_response),
+            refresh_sec=refresh_sec[InstType.SPOT.value])]
+        for inst_type in [InstType.MARGIN, InstType.SWAP, InstType.FUTURES, InstType.OPTION]:
+            self._endpoints.append(_RESTEndpoint(
+                inst_type=inst_type, fetch=lambda inst_type=inst_type: self.public_api.get_mark_price(
+                    instType=inst_type.value),
+                apply=lambda json_response: mark_px_container[0].update_from_json(json_response),
+                refresh_sec=refresh_sec[inst_type.value]))
+        self.stats: Dict[InstType, RESTFetchStats] = {endpoint.inst_type: endpoint.stats
+                                                      for endpoint in self._endpoints}
 
     def run(self) -> None:
         while 1:
             try:
-                json_response = self.market_api.get_tickers(instType=InstType.SPOT.value)
-                tickers: Tickers = tickers_container[0]
-                tickers.update_from_json(json_response)
-                mark_px_cache: MarkPxCache = mark_px_container[0]
-                json_response = self.public_api.get_mark_price(instType=InstType.MARGIN.value)
-                mark_px_cache.update_from_json(json_response)
-                json_response = self.public_api.get_mark_price(instType=InstType.SWAP.value)
-                mark_px_cache.update_from_json(json_response)
-                json_response = self.public_api.get_mark_price(instType=InstType.FUTURES.value)
-                mark_px_cache.update_from_json(json_response)
-                json_response = self.public_api.get_mark_price(instType=InstType.OPTION.value)
-                mark_px_cache.update_from_json(json_response)
-                time.sleep(2)
+                time.sleep(max(self.poll() - time.time(), 0))
             except KeyboardInterrupt:
                 break
-            except (OkxAPIException, OkxParamsException, OkxRequestException):
-                logging.warning(traceback.format_exc())
-                time.sleep(10)
+
+    def poll(self) -> float:
+        """
+        Send the fetches that are due and not still in flight. next_time is only written here, on the scheduler
+        thread: a failed fetch is rescheduled from the failure time it returns once its future is done.
+        :return: time the next fetch is due
+        """
+        now = time.time()
+        for endpoint in self._endpoints:
+            if endpoint.future is not None:
+                if not endpoint.future.done():
+                    continue
+                failure_time = endpoint.future.result()
+                if failure_time is not None:
+                    endpoint.next_time = max(endpoint.next_time, failure_time + self.retry_sec)
+            if endpoint.next_time <= now:
+                endpoint.next_time = now + endpoint.refresh_sec
+                endpoint.future = self._executor.submit(self._fetch, endpoint)
+        return max(min(endpoint.next_time for endpoint in self._endpoints), now + POLL_MIN_SLEEP_SEC)
+
+    def _fetch(self, endpoint: _RESTEndpoint) -> Optional[float]:
+        """
+        :return: time of the failure, None if the fetch succeeded
+        """
+        send_time = time.time()
+        try:
+            json_response = endpoint.fetch()
+            if json_response.get("code") != "0":
+                raise ValueError(f"Unsuccessful {endpoint.inst_type.value} market data response {json_response}")
+            endpoint.apply(json_response)
+        except Exception:
+            endpoint.stats.failures += 1
+            logging.warning(f"{endpoint.inst_type.value} market data fetch failed: {traceback.format_exc()}")
+            return time.time()
+        receive_time = time.time()
+        endpoint.stats.latency.record_since(send_time, receive_time)
+        endpoint.stats.last_success_time = receive_time
+        return None
+
+    def fetch_summary(self) -> str:
+        now = time.time()
+        return ", ".join(f"{inst_type.value}: mean {stats.latency.mean_ms():.1f} ms, "
+                         f"p99 {stats.latency.percentile_ms(99):.1f} ms, stale {stats.staleness_sec(now):.1f} s, "
+                         f"{stats.failures} failed" for inst_type, stats in self.stats.items())
 
 
 if __name__ == "__main__":
@@ -1,50 +1,305 @@
+import json
+import logging
 import threading
-from typing import Dict, List
+from typing import Dict, List, Tuple
 import time
-from okx_market_maker import order_books
+from functools import partial
+
+from twisted.internet import reactor
+
+from okx_market_maker import order_books, order_book_snapshots, best_bid_offers, journal_recorder_container, \
+    update_queue_container, tickers_container, mark_px_container
+from okx_market_maker.settings import ORDER_BOOK_CHECK_SUM_ON_EVERY_MESSAGE, ORDER_BOOK_RESYNC_TIMEOUT_SEC, \
+    MDS_MAX_ARGS_PER_CONNECTION, ORDER_BOOK_MAX_DEPTH, ORDER_BOOK_MAX_DEPTH_BY_INSTRUMENT, ORDER_BOOK_MAX_OVERFLOW, \
+    ORDER_BOOK_SNAPSHOT_DEPTH, ORDER_BOOK_SNAPSHOT_DEPTH_VIEW
+from okx_market_maker.market_data_service.model.BestBidOffer import BestBidOffer
+from okx_market_maker.market_data_service.model.MarkPx import MarkPxCache
+from okx_market_maker.market_data_service.model.Tickers import Tickers
 from okx_market_maker.market_data_service.model.OrderBook import OrderBook, OrderBookLevel
+from okx_market_maker.utils.LatencyStats import LatencyStats
 from okx.websocket.WsPublic import WsPublic
 
 
+ORDER_BOOK_CHANNELS = ["books5", "books", "books50-l2-tbt", "books-l2-tbt"]
+BBO_CHANNELS = ["bbo-tbt"]  # top of book only, kept in best_bid_offers instead of order_books
+TICKERS_CHANNEL = "tickers"
+MARK_PX_CHANNEL = "mark-price"
+
+
 class WssMarketDataService(WsPublic):
-    def __init__(self, url, inst_id, channel="books5"):
+    def __init__(self, url, inst_id: str = "", channel="books5", inst_ids: List[str] = None,
+                 channels: List[str] = None, max_args_per_connection: int = MDS_MAX_ARGS_PER_CONNECTION):
+        """
+        Subscribe every channel in channels for every instrument in inst_ids, spread over as few connections as
+        max_args_per_connection allows, with one batched subscribe request per connection.
+        :param url: public websocket url
+        :param inst_id: single instrument, kept for the single instrument usage
+        :param channel: single channel, kept for the single instrument usage
+        :param inst_ids: instruments to subscribe, in addition to inst_id
+        :param channels: channels to subscribe for each instrument, overrides channel
+        :param max_args_per_connection: maximum number of channel-instrument subscriptions on one connection
+        """
         super().__init__(url)
-        self.inst_id = inst_id
-        self.channel = channel
-        order_books[self.inst_id] = OrderBook(inst_id=inst_id)
+        self.inst_ids = list(inst_ids) if inst_ids else []
+        if inst_id and inst_id not in self.inst_ids:
+            self.inst_ids.insert(0, inst_id)
+        self.inst_id = self.inst_ids[0] if self.inst_ids else ""
+        self.channels = list(channels) if channels else [channel]
+        self.channel = self.channels[0]
+        self.max_args_per_connection = max_args_per_connection
+        if any(channel in ORDER_BOOK_CHANNELS for channel in self.channels):
+            for book_inst_id in self.inst_ids:
+                order_books[book_inst_id] = new_order_book(book_inst_id)
         self.args = []
+        self.resync_latency = LatencyStats()
+        self.reconnect_latency = LatencyStats()
+        self._resync_start_time: Dict[str, float] = {}
+        self._reconnect_start_time: float = 0
+        self._connection_args: Dict[str, List[Dict]] = {}
+        self._arg_connection: Dict[Tuple, str] = {}
+        self._next_connection_index = 0
+        self._pending_ops: Dict[str, List[bytes]] = {}
 
     def run_service(self):
         args = self._prepare_args()
         print(args)
         print("subscribing")
-        self.subscribe(args, _callback)
-        self.args += args
+        self.add_args(args)
 
     def stop_service(self):
-        self.unsubscribe(self.args, lambda message: print(message))
-        self.close()
+        reactor.callFromThread(self._stop_service)
+
+    def _stop_service(self):
+        self._reconnect_start_time = time.time()
+        for connection_key in list(self._connection_args):
+            self.disconnect(connection_key)
+        self._connection_args = {}
+        self._arg_connection = {}
+        self._pending_ops = {}
+        self.args = []
+
+    def add_args(self, args: List[Dict]):
+        """
+        Subscribe new args. Connections with spare capacity are filled first with one batched subscribe request
+        each, and new connections are opened for the rest. The connection maps and factory payloads are only
+        changed on the reactor thread, together with the send, so that the connections always see them whole.
+        :param args: list of {"channel": ..., "instId": ...}
+        """
+        reactor.callFromThread(self._add_args, args)
+
+    def _add_args(self, args: List[Dict]):
+        args = [arg for arg in args if _arg_key(arg) not in self._arg_connection]
+        for connection_key, connection_args in self._connection_args.items():
+            if not args:
+                break
+            spare = self.max_args_per_connection - len(connection_args)
+            if spare <= 0:
+                continue
+            batch, args = args[:spare], args[spare:]
+            self._assign_args(connection_key, batch)
+            self._send_op("subscribe", batch, connection_key)
+        while args:
+            batch, args = args[:self.max_args_per_connection], args[self.max_args_per_connection:]
+            connection_key = f"mds-{self._next_connection_index}"
+            self._next_connection_index += 1
+            self._assign_args(connection_key, batch)
+            self.factories[connection_key] = self.initSubscribeFactory(
+                args=batch, subSet=set(), callback=partial(self._on_connection_message, connection_key))
+            self.addConnection(connection_key)
+
+    def remove_args(self, args: List[Dict]):
+        """
+        Unsubscribe args on the connections carrying them, a connection left with nothing to carry is closed.
+        Applied on the reactor thread, as add_args.
+        :param args: list of {"channel": ..., "instId": ...}
+        """
+        reactor.callFromThread(self._remove_args, args)
+
+    def _remove_args(self, args: List[Dict]):
+        args_by_connection: Dict[str, List[Dict]] = {}
+        for arg in args:
+            connection_key = self._arg_connection.pop(_arg_key(arg), None)
+            if connection_key is None:
+                continue
+            args_by_connection.setdefault(connection_key, []).append(arg)
+            self.args = [existing for existing in self.args if _arg_key(existing) != _arg_key(arg)]
+        for connection_key, connection_args in args_by_connection.items():
+            removed_keys = {_arg_key(arg) for arg in connection_args}
+            remaining = [arg for arg in self._connection_args[connection_key] if _arg_key(arg) not in removed_keys]
+            if not remaining:
+                del self._connection_args[connection_key]
+                self._pending_ops.pop(connection_key, None)
+                self.disconnect(connection_key)
+                continue
+            self._set_connection_args(connection_key, remaining)
+            self._send_op("unsubscribe", connection_args, connection_key)
+
+    def _assign_args(self, connection_key: str, args: List[Dict]):
+        for arg in args:
+            self._arg_connection[_arg_key(arg)] = connection_key
+        self.args = self.args + args  # a new list, read by the risk price service on the strategy thread
+        self._set_connection_args(connection_key, self._connection_args.get(connection_key, []) + args)
+
+    def _set_connection_args(self, connection_key: str, args: List[Dict]):
+        self._connection_args[connection_key] = args
+        factory = self.factories.get(connection_key)
+        if factory is not None:
+            # a reconnect replays the factory payload, keep it covering everything on the connection
+            factory.payload = json.dumps({"op": "subscribe", "args": args}, ensure_ascii=False).encode("utf8")
+
+    def resync_instrument(self, inst_id: str):
+        """
+        Re-subscribe the order book of a single instrument on its existing connection. The book stays stale,
+        dropping updates, until the snapshot of the new subscription lands. Other instruments are not affected.
+        Applied on the reactor thread, as add_args.
+        :param inst_id: instrument to re-subscribe
+        """
+        reactor.callFromThread(self._resync_instrument, inst_id)
+
+    def _resync_instrument(self, inst_id: str):
+        start_time = self._resync_start_time.get(inst_id)
+        if start_time and time.time() - start_time < ORDER_BOOK_RESYNC_TIMEOUT_SEC:
+            return
+        args = [arg for arg in self.args if arg.get("instId") == inst_id and arg["channel"] in ORDER_BOOK_CHANNELS]
+        if not args:
+            logging.warning(f"{inst_id} is not subscribed in MDS, unable to resync!")
+            return
+        if inst_id in order_books:
+            order_books[inst_id].set_stale(True)
+        self._resync_start_time[inst_id] = time.time()
+        logging.warning(f"{inst_id} orderbook out of sync, re-subscribing {inst_id}")
+        for arg in args:
+            connection_key = self._arg_connection[_arg_key(arg)]
+            self._send_op("unsubscribe", [arg], connection_key)
+            self._send_op("subscribe", [arg], connection_key)
+
+    def _send_op(self, op: str, args: List[Dict], connection_key: str):
+        """
+        Send on the reactor thread. A connection not open yet, or reconnecting, may be sending a subscribe payload
+        built before these args, so the request is held until the connection delivers its first message.
+        """
+        factory = self.factories.get(connection_key)
+        if factory is None:
+            return
+        payload = json.dumps({"op": op, "args": args}, ensure_ascii=False).encode("utf8")
+        protocol = factory.instance
+        if protocol is None or protocol.state != protocol.STATE_OPEN:
+            self._pending_ops.setdefault(connection_key, []).append(payload)
+            return
+        protocol.sendMessage(payload, False)
+
+    def _on_connection_message(self, connection_key: str, message):
+        pending_ops = self._pending_ops.pop(connection_key, None)
+        if pending_ops:
+            protocol = self.factories[connection_key].instance
+            for payload in pending_ops:
+                protocol.sendMessage(payload, False)
+        self._on_message(message)
+
+    def _on_message(self, message):
+        _callback(message)
+        arg = message.get("arg")
+        if not arg or message.get("event") or arg.get("channel") not in ORDER_BOOK_CHANNELS:
+            return
+        inst_id = arg.get("instId")
+        order_book: OrderBook = order_books.get(inst_id)
+        if order_book is None:
+            return
+        if order_book.stale:
+            self._resync_instrument(inst_id)
+            return
+        if self._reconnect_start_time:
+            self.reconnect_latency.record_since(self._reconnect_start_time, time.time())
+            self._reconnect_start_time = 0
+        if inst_id in self._resync_start_time:
+            self.resync_latency.record_since(self._resync_start_time.pop(inst_id), time.time())
+            print(f"{inst_id} orderbook resynced, resync latency {self.resync_latency}")
 
     def _prepare_args(self) -> List[Dict]:
         args = []
-        books5_sub = {
-            "channel": self.channel,
-            "instId": self.inst_id
-        }
-        args.append(books5_sub)
+        for inst_id in self.inst_ids:
+            for channel in self.channels:
+                args.append({
+                    "channel": channel,
+                    "instId": inst_id
+                })
         return args
 
 
+def _arg_key(arg: Dict) -> Tuple:
+    return tuple(sorted(arg.items()))
+
+
+def new_order_book(inst_id: str) -> OrderBook:
+    """
+    :param inst_id: instrument of the book
+    :return: empty OrderBook with the configured max depth of the instrument
+    """
+    return OrderBook(inst_id=inst_id, max_depth=ORDER_BOOK_MAX_DEPTH_BY_INSTRUMENT.get(inst_id, ORDER_BOOK_MAX_DEPTH),
+                     max_overflow=ORDER_BOOK_MAX_OVERFLOW)
+
+
 def _callback(message):
     arg = message.get("arg")
     # print(message)
     if not arg or not arg.get("channel"):
         return
-    if message.get("event") == "subscribe":
+    if message.get("event"):
         return
-    if arg.get("channel") in ["books5", "books", "bbo-tbt", "books50-l2-tbt", "books-l2-tbt"]:
+    if journal_recorder_container:
+        journal_recorder_container[0].record(message)
+    if arg.get("channel") in ORDER_BOOK_CHANNELS:
         on_orderbook_snapshot_or_update(message)
         # print(order_books)
+        inst_id = arg["instId"]
+        order_book_snapshot = order_books[inst_id].snapshot(ORDER_BOOK_SNAPSHOT_DEPTH,
+                                                            with_depth_view=ORDER_BOOK_SNAPSHOT_DEPTH_VIEW)
+        order_book_snapshots[inst_id] = order_book_snapshot  # readers always get a complete snapshot, no locking
+        if update_queue_container:
+            update_queue_container[0].put(arg["channel"], inst_id, order_book_snapshot)
+    elif arg.get("channel") in BBO_CHANNELS:
+        on_bbo_update(message)
+        if update_queue_container and arg["instId"] in best_bid_offers:
+            update_queue_container[0].put(arg["channel"], arg["instId"], best_bid_offers[arg["instId"]])
+    elif arg.get("channel") == TICKERS_CHANNEL:
+        on_tickers_update(message)
+    elif arg.get("channel") == MARK_PX_CHANNEL:
+        on_mark_px_update(message)
+
+
+def on_tickers_update(message):
+    if not tickers_container:
+        tickers_container.append(Tickers())
+    tickers_container[0].update_from_data(message.get("data") or [])
+
+
+def on_mark_px_update(message):
+    if not mark_px_container:
+        mark_px_container.append(MarkPxCache())
+    mark_px_container[0].update_from_data(message.get("data") or [])
+
+
+def on_bbo_update(message):
+    """
+    :param message:
+    {
+    "arg": {
+        "channel": "bbo-tbt",
+        "instId": "BTC-USDT"
+    },
+    "data": [{
+        "asks": [["8476.98", "415", "0", "13"]],
+        "bids": [["8476.97", "256", "0", "12"]],
+        "ts": "1597026383085",
+        "seqId": 123456
+    }]
+}
+    :return:
+    """
+    receive_timestamp = time.time()
+    inst_id = message["arg"]["instId"]
+    for data in message.get("data") or []:
+        best_bid_offers[inst_id] = BestBidOffer.init_from_json(inst_id, data, receive_timestamp)
 
 
 def on_orderbook_snapshot_or_update(message):
@@ -78,7 +333,9 @@ def on_orderbook_snapshot_or_update(message):
             ["8446", "95", "0", "3"]
         ],
         "ts": "1597026383085",
-        "checksum": -855196043
+        "checksum": -855196043,
+        "prevSeqId": -1,
+        "seqId": 123456
     }]
 }
     :return:
@@ -87,54 +344,44 @@ def on_orderbook_snapshot_or_update(message):
     inst_id = arg.get("instId")
     action = message.get("action")
     if inst_id not in order_books:
-        order_books[inst_id] = OrderBook(inst_id=inst_id)
+        order_books[inst_id] = new_order_book(inst_id)
     data = message.get("data")[0]
+    if action == "update":
+        if order_books[inst_id].stale:
+            return  # drop updates until the snapshot of the re-subscription lands
+        prev_seq_id = data.get("prevSeqId")
+        if prev_seq_id is not None and order_books[inst_id].seq_id and \
+                int(prev_seq_id) != order_books[inst_id].seq_id:
+            logging.warning(f"{inst_id} orderbook sequence gap: prevSeqId {prev_seq_id}, "
+                            f"last seqId {order_books[inst_id].seq_id}!")
+            order_books[inst_id].set_stale(True)
+            return
+    else:
+        order_books[inst_id].set_stale(False)
     if data.get("asks"):
         if action == "snapshot" or not action:
-            ask_list = [OrderBookLevel(price=float(level_info[0]),
-                                       quantity=float(level_info[1]),
-                                       order_count=int(level_info[3]),
-                                       price_string=level_info[0],
-                                       quantity_string=level_info[1],
-                                       order_count_string=level_info[3],
-                                       ) for level_info in data["asks"]]
-            order_books[inst_id].set_asks_on_snapshot(ask_list)
+            order_books[inst_id].set_asks_on_snapshot([OrderBookLevel.from_wire(level_info)
+                                                       for level_info in data["asks"]])
         if action == "update":
             for level_info in data["asks"]:
-                order_books[inst_id].set_asks_on_update(
-                    OrderBookLevel(price=float(level_info[0]),
-                                   quantity=float(level_info[1]),
-                                   order_count=int(level_info[3]),
-                                   price_string=level_info[0],
-                                   quantity_string=level_info[1],
-                                   order_count_string=level_info[3],
-                                   )
-                )
+                order_books[inst_id].set_asks_on_update(OrderBookLevel.from_wire(level_info))
     if data.get("bids"):
         if action == "snapshot" or not action:
-            bid_list = [OrderBookLevel(price=float(level_info[0]),
-                                       quantity=float(level_info[1]),
-                                       order_count=int(level_info[3]),
-                                       price_string=level_info[0],
-                                       quantity_string=level_info[1],
-                                       order_count_string=level_info[3],
-                                       ) for level_info in data["bids"]]
-            order_books[inst_id].set_bids_on_snapshot(bid_list)
+            order_books[inst_id].set_bids_on_snapshot([OrderBookLevel.from_wire(level_info)
+                                                       for level_info in data["bids"]])
         if action == "update":
             for level_info in data["bids"]:
-                order_books[inst_id].set_bids_on_update(
-                    OrderBookLevel(price=float(level_info[0]),
-                                   quantity=float(level_info[1]),
-                                   order_count=int(level_info[3]),
-                                   price_string=level_info[0],
-                                   quantity_string=level_info[1],
-                                   order_count_string=level_info[3],
-                                   )
-                )
+                order_books[inst_id].set_bids_on_update(OrderBookLevel.from_wire(level_info))
+    order_books[inst_id].increase_version()
     if data.get("ts"):
         order_books[inst_id].set_timestamp(int(data["ts"]))
+    if data.get("seqId") is not None:
+        order_books[inst_id].set_seq_id(int(data["seqId"]))
     if data.get("checksum"):
         order_books[inst_id].set_exch_check_sum(data["checksum"])
+        if ORDER_BOOK_CHECK_SUM_ON_EVERY_MESSAGE and not order_books[inst_id].do_check_sum():
+            logging.warning(f"{inst_id} orderbook checksum failed on {action or 'snapshot'} at ts {data.get('ts')}!")
+            order_books[inst_id].set_stale(True)
 
 
 class ChecksumThread(threading.Thread):
@@ -145,14 +392,11 @@ class ChecksumThread(threading.Thread):
     def run(self) -> None:
         while 1:
             try:
-                for inst_id, order_book in order_books.items():
+                for inst_id, order_book in list(order_books.items()):
                     order_book: OrderBook
-                    if order_book.do_check_sum():
+                    if not order_book.stale and order_book.do_check_sum():
                         continue
-                    self.wss_mds.stop_service()
-                    time.sleep(3)
-                    self.wss_mds.run_service()
-                    break
+                    self.wss_mds.resync_instrument(inst_id)
                 time.sleep(5)
             except KeyboardInterrupt:
                 break
@@ -161,7 +405,7 @@ class ChecksumThread(threading.Thread):
 if __name__ == "__main__":
     # url = "wss://ws.okx.com:8443/ws/v5/public"
     url = "wss://ws.okx.com:8443/ws/v5/public?brokerId=9999"
-    market_data_service = WssMarketDataService(url=url, inst_id="BTC-USDT-SWAP", channel="books")
+    market_data_service = WssMarketDataService(url=url, inst_ids=["BTC-USDT-SWAP", "ETH-USDT-SWAP"], channels=["books"])
     market_data_service.start()
     market_data_service.run_service()
     check_sum = ChecksumThread(market_data_service)
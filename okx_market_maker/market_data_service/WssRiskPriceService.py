@@ -0,0 +1,106 @@
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from okx_market_maker.market_data_service.WssMarketDataService import WssMarketDataService, _arg_key, \
+    TICKERS_CHANNEL, MARK_PX_CHANNEL
+from okx_market_maker import tickers_container, mark_px_container, instruments
+from okx_market_maker.position_management_service.model.Account import Account
+from okx_market_maker.position_management_service.model.Positions import Positions
+from okx_market_maker.settings import MDS_MAX_ARGS_PER_CONNECTION, RISK_PRICE_SUBSCRIBE_TIMEOUT_SEC
+from okx_market_maker.utils.InstrumentUtil import InstrumentUtil
+from okx_market_maker.utils.OkxEnum import InstType
+
+# mark prices MarkPxCache.get_usdt_to_usd_rate reads
+USDT_TO_USD_MARK_PX_INST_IDS = ["BTC-USD-SWAP", "BTC-USDT-SWAP"]
+# currencies without a {ccy}-USDT ticker: USDT itself, and the fiat USD of inverse and USD margined contracts,
+# converted with MarkPxCache.get_usdt_to_usd_rate
+NO_TICKER_CCYS = {"USDT", "USD"}
+
+
+class WssRiskPriceService(WssMarketDataService):
+    """
+    Streams the prices the risk snapshot is calculated with, instead of RESTMarketDataService polling every spot
+    ticker and every mark price: the tickers channel of the {ccy}-USDT spot pair of each currency held, and the
+    mark-price channel of each instrument with a position. update_subscriptions is called as holdings change,
+    and subscribes and unsubscribes the difference; pushes update tickers_container and mark_px_container in place.
+
+    A currency without a {ccy}-USDT spot pair has no ticker, and is priced at 0.
+    """
+    def __init__(self, url: str, max_args_per_connection: int = MDS_MAX_ARGS_PER_CONNECTION,
+                 subscribe_timeout_sec: float = RISK_PRICE_SUBSCRIBE_TIMEOUT_SEC):
+        super().__init__(url, inst_ids=[], channels=[TICKERS_CHANNEL, MARK_PX_CHANNEL],
+                         max_args_per_connection=max_args_per_connection)
+        self.subscribe_timeout_sec = subscribe_timeout_sec
+        self._last_subscribe_time = 0
+
+    def update_subscriptions(self, account: Optional[Account], positions: Optional[Positions],
+                             inst_ids: Iterable[str] = ()) -> Tuple[List[Dict], List[Dict]]:
+        """
+        :param account: currencies held
+        :param positions: instruments held
+        :param inst_ids: further instruments to price, e.g. the trading instrument and those held at inception
+        :return: args subscribed, args unsubscribed
+        """
+        required = {_arg_key(arg): arg for arg in risk_price_args(account, positions, inst_ids)}
+        subscribed = {_arg_key(arg): arg for arg in self.args}
+        to_remove = [arg for key, arg in subscribed.items() if key not in required]
+        to_add = [arg for key, arg in required.items() if key not in subscribed]
+        if to_remove:
+            self.remove_args(to_remove)
+        if to_add:
+            self.add_args(to_add)
+            self._last_subscribe_time = time.time()
+        return to_add, to_remove
+
+    def prices_ready(self) -> bool:
+        """
+        :return: whether every subscribed instrument has a price, or subscribe_timeout_sec passed since the last
+        subscription, e.g. for a {ccy}-USDT pair that does not exist
+        """
+        if time.time() - self._last_subscribe_time > self.subscribe_timeout_sec:
+            return True
+        for arg in self.args:
+            if arg["channel"] == TICKERS_CHANNEL and \
+                    (not tickers_container or arg["instId"] not in tickers_container[0]):
+                return False
+            if arg["channel"] == MARK_PX_CHANNEL and \
+                    (not mark_px_container or not mark_px_container[0].get_mark_px(arg["instId"])):
+                return False
+        return True
+
+
+def risk_price_args(account: Optional[Account], positions: Optional[Positions],
+                    inst_ids: Iterable[str] = ()) -> List[Dict]:
+    """
+    :return: tickers and mark-price args needed to price the account, the positions and inst_ids
+    """
+    ccy_set = set()
+    mark_px_inst_ids = set(USDT_TO_USD_MARK_PX_INST_IDS)
+    if account is not None:
+        ccy_set.update(account.get_account_details())
+    held_inst_ids = [position.inst_id for position in positions.get_position_map().values()] \
+        if positions is not None else []
+    for inst_id in held_inst_ids + list(inst_ids):
+        if not inst_id:
+            continue
+        inst_type = InstrumentUtil.get_inst_type_from_inst_id(inst_id)
+        ccy_set.update(_instrument_currencies(inst_id, inst_type))
+        if inst_id in held_inst_ids or inst_type != InstType.SPOT:
+            mark_px_inst_ids.add(inst_id)
+    if positions is not None:
+        for position in positions.get_position_map().values():
+            ccy_set.update(ccy for ccy in [position.ccy, position.pos_ccy] if ccy)
+    ccy_set -= NO_TICKER_CCYS
+    return [{"channel": TICKERS_CHANNEL, "instId": f"{ccy}-USDT"} for ccy in sorted(ccy_set)] + \
+        [{"channel": MARK_PX_CHANNEL, "instId": inst_id} for inst_id in sorted(mark_px_inst_ids)]
+
+
+def _instrument_currencies(inst_id: str, inst_type: InstType) -> List[str]:
+    """
+    :return: base and quote currencies of a spot pair, or the contract value and settlement currencies of a
+    derivative once its instrument is loaded, e.g. USD and BTC for BTC-USD-SWAP, else the first two parts of inst_id
+    """
+    instrument = instruments.get(f"{inst_id}:{inst_type.value}")
+    if inst_type == InstType.SPOT or instrument is None:
+        return inst_id.split("-")[:2]
+    return [ccy for ccy in [instrument.ct_val_ccy, instrument.settle_ccy] if ccy]
@@ -0,0 +1,47 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class BestBidOffer:
+    """
+    Top of book from the bbo-tbt channel. Every tick replaces the cached object as a whole, so a reader on another
+    thread never sees the bid of one tick next to the ask of another.
+    """
+    inst_id: str
+    bid_price: float = 0
+    bid_quantity: float = 0
+    ask_price: float = 0
+    ask_quantity: float = 0
+    timestamp: int = 0  # exchange timestamp in ms
+    receive_timestamp: float = 0  # local time.time() when the tick was received
+    seq_id: int = 0
+
+    @classmethod
+    def init_from_json(cls, inst_id: str, json_response: dict, receive_timestamp: float) -> "BestBidOffer":
+        """
+        :param inst_id: instrument of the tick
+        :param json_response:
+        {
+            "asks": [["8476.98", "415", "0", "13"]],
+            "bids": [["8476.97", "256", "0", "12"]],
+            "ts": "1597026383085",
+            "seqId": 123456
+        }
+        :param receive_timestamp: local time.time() when the tick was received
+        :return: BestBidOffer
+        """
+        bids = json_response.get("bids")
+        asks = json_response.get("asks")
+        return cls(inst_id=inst_id,
+                   bid_price=float(bids[0][0]) if bids else 0,
+                   bid_quantity=float(bids[0][1]) if bids else 0,
+                   ask_price=float(asks[0][0]) if asks else 0,
+                   ask_quantity=float(asks[0][1]) if asks else 0,
+                   timestamp=int(json_response["ts"]) if json_response.get("ts") else 0,
+                   receive_timestamp=receive_timestamp,
+                   seq_id=int(json_response["seqId"]) if json_response.get("seqId") is not None else 0)
+
+    def middle_price(self) -> float:
+        if not self.bid_price or not self.ask_price:
+            return 0
+        return (self.bid_price + self.ask_price) / 2
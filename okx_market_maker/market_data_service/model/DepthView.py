@@ -0,0 +1,99 @@
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+from okx_market_maker.utils.OkxEnum import OrderSide
+
+
+@dataclass
+class DepthView:
+    """
+    Columnar view of an OrderBook: float64 price and quantity arrays per side, best level first.
+    """
+    bid_prices: np.ndarray
+    bid_quantities: np.ndarray
+    ask_prices: np.ndarray
+    ask_quantities: np.ndarray
+
+    def copy(self) -> "DepthView":
+        """
+        :return: DepthView over copies of the arrays, unaffected by later updates of the book
+        """
+        return DepthView(bid_prices=self.bid_prices.copy(), bid_quantities=self.bid_quantities.copy(),
+                         ask_prices=self.ask_prices.copy(), ask_quantities=self.ask_quantities.copy())
+
+    def _side_to_take(self, side: OrderSide) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        A buy order takes liquidity from the asks, a sell order from the bids.
+        """
+        if side == OrderSide.BUY:
+            return self.ask_prices, self.ask_quantities
+        return self.bid_prices, self.bid_quantities
+
+    def cumulative_depth(self, side: OrderSide, price: float) -> float:
+        """
+        Quantity available to an order of this side up to and including the limit price.
+        :param side: side of the order taking liquidity
+        :param price: limit price
+        :return: total quantity of the levels at or better than price
+        """
+        if side == OrderSide.BUY:
+            num_of_levels = np.searchsorted(self.ask_prices, price, side="right")
+            return float(self.ask_quantities[:num_of_levels].sum())
+        num_of_levels = np.searchsorted(-self.bid_prices, -price, side="right")
+        return float(self.bid_quantities[:num_of_levels].sum())
+
+    def price_for_size(self, side: OrderSide, size: float) -> float:
+        """
+        Worst price reached when an order of this side fills size against the book.
+        :param side: side of the order taking liquidity
+        :param size: quantity to fill
+        :return: price of the last level needed, 0 if the book is not deep enough
+        """
+        prices, quantities = self._side_to_take(side)
+        cumulative = np.cumsum(quantities)
+        index = np.searchsorted(cumulative, size, side="left")
+        if index >= len(prices):
+            return 0
+        return float(prices[index])
+
+    def vwap_for_size(self, side: OrderSide, size: float) -> float:
+        """
+        Volume weighted average price of filling size against the book.
+        :param side: side of the order taking liquidity
+        :param size: quantity to fill
+        :return: average fill price, 0 if the book is not deep enough
+        """
+        prices, quantities = self._side_to_take(side)
+        cumulative = np.cumsum(quantities)
+        index = np.searchsorted(cumulative, size, side="left")
+        if index >= len(prices) or size <= 0:
+            return 0
+        filled = np.minimum(quantities[:index + 1], size - (cumulative[:index + 1] - quantities[:index + 1]))
+        return float(np.dot(prices[:index + 1], filled) / size)
+
+    def imbalance(self, levels: int) -> float:
+        """
+        (bid quantity - ask quantity) / (bid quantity + ask quantity) over the top levels of each side.
+        :param levels: number of levels on each side
+        :return: imbalance in [-1, 1], 0 for an empty book
+        """
+        bid_quantity = self.bid_quantities[:levels].sum()
+        ask_quantity = self.ask_quantities[:levels].sum()
+        total = bid_quantity + ask_quantity
+        if not total:
+            return 0
+        return float((bid_quantity - ask_quantity) / total)
+
+    def microprice(self) -> float:
+        """
+        Mid price weighted by the opposite top of book quantity.
+        :return: microprice, 0 if either side is empty
+        """
+        if not len(self.bid_prices) or not len(self.ask_prices):
+            return 0
+        bid_quantity = self.bid_quantities[0]
+        ask_quantity = self.ask_quantities[0]
+        return float((self.bid_prices[0] * ask_quantity + self.ask_prices[0] * bid_quantity)
+                     / (bid_quantity + ask_quantity))
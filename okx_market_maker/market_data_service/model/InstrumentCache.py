@@ -0,0 +1,46 @@
+import logging
+from dataclasses import dataclass, field, fields
+from typing import Dict, Optional, Tuple
+
+from okx_market_maker.market_data_service.model.Instrument import Instrument
+from okx_market_maker.utils.PickleFileUtil import PickleFileUtil
+
+INSTRUMENT_CACHE_VERSION = 1
+
+
+def _instrument_fields() -> Tuple[str, ...]:
+    return tuple(f.name for f in fields(Instrument))
+
+
+@dataclass
+class InstrumentCache:
+    """
+    Instruments bulk loaded from the exchange, keyed by f"{inst_id}:{inst_type}" as in okx_market_maker.instruments,
+    kept on disk between runs. A file written by another version, or before a change of the Instrument fields, is
+    ignored.
+    """
+    instruments: Dict[str, Instrument]
+    is_paper_trading: bool
+    saved_time: float = 0
+    version: int = INSTRUMENT_CACHE_VERSION
+    instrument_fields: Tuple[str, ...] = field(default_factory=_instrument_fields)
+
+    def save(self, path: str) -> None:
+        PickleFileUtil.save(self, path)
+
+    @classmethod
+    def load(cls, path: str, is_paper_trading: bool, max_age_sec: float) -> Optional["InstrumentCache"]:
+        """
+        :return: the cache, or None if PickleFileUtil.load finds none, or it is of the other trading environment
+        """
+        cache = PickleFileUtil.load(path, InstrumentCache, INSTRUMENT_CACHE_VERSION, max_age_sec, "instrument cache")
+        if cache is None:
+            return None
+        if cache.instrument_fields != _instrument_fields():
+            logging.warning(f"Ignored instrument cache {path} of another version")
+            return None
+        if cache.is_paper_trading != is_paper_trading:
+            logging.warning(f"Ignored instrument cache {path} of the "
+                            f"{'paper' if cache.is_paper_trading else 'live'} trading environment")
+            return None
+        return cache
@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import Dict
+from typing import Dict, List
 
 from okx_market_maker.utils.OkxEnum import InstType
 
@@ -28,7 +28,12 @@ class MarkPxCache:
     def update_from_json(self, json_response):
         if json_response.get("code") != "0":
             return
-        data_list = json_response["data"]
+        self.update_from_data(json_response["data"])
+
+    def update_from_data(self, data_list: List[Dict]):
+        """
+        :param data_list: mark prices, of a REST response or of a mark-price channel push
+        """
         for data in data_list:
             mark_px = MarkPx.init_from_json(data)
             self._mark_px_map[mark_px.inst_id] = mark_px
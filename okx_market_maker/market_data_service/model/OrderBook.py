@@ -1,21 +1,50 @@
+from bisect import bisect_left, bisect_right, insort
 from dataclasses import field, dataclass
-from typing import List
+from typing import List, Dict, Iterator, Optional, Sequence, Tuple
 import binascii
 
+import numpy as np
+
+from okx_market_maker.market_data_service.model.DepthView import DepthView
+
+CHECK_SUM_DEPTH = 25  # number of levels on each side covered by the exchange checksum
+DEFAULT_MAX_OVERFLOW = 400  # levels kept beyond max_depth on each side, for re-promotion
+
 
-@dataclass
 class OrderBookLevel:
-    price: float
-    quantity: float
-    order_count: int
-    price_string: str
-    quantity_string: str
-    order_count_string: str
+    """
+    A single price level. Slotted, without a per instance dict. The price and quantity are parsed once, as they
+    are read on every decision, and the wire strings the checksum is computed from are kept next to them. The
+    order count, not covered by the checksum, is kept as an int only, a shared small int for most levels, so that
+    its wire string is not retained.
+    """
+    __slots__ = ("price", "quantity", "order_count", "price_string", "quantity_string")
+
+    def __init__(self, price: float, quantity: float = 0, order_count: int = 0, price_string: str = "",
+                 quantity_string: str = "", order_count_string: str = ""):
+        self.price = price
+        self.quantity = float(quantity_string) if quantity_string else quantity
+        self.order_count = int(order_count_string) if order_count_string else order_count
+        self.price_string = price_string or str(price)
+        self.quantity_string = quantity_string or str(quantity)
+
+    @classmethod
+    def from_wire(cls, level_info: List[str]) -> "OrderBookLevel":
+        """
+        :param level_info: ["8476.98", "415", "0", "13"], price, quantity, deprecated field and order count
+        :return: OrderBookLevel
+        """
+        level = cls.__new__(cls)
+        level.price = float(level_info[0])
+        level.quantity = float(level_info[1])
+        level.order_count = int(level_info[3])
+        level.price_string = level_info[0]
+        level.quantity_string = level_info[1]
+        return level
 
     @staticmethod
     def _is_valid_operand(other):
-        return (hasattr(other, "price") and
-                hasattr(other, "quantity"))
+        return isinstance(other, OrderBookLevel)
 
     def __lt__(self, other):
         if not self._is_valid_operand(other):
@@ -27,77 +56,281 @@ class OrderBookLevel:
             return NotImplemented
         return self.price == other.price
 
+    def __repr__(self):
+        return f"OrderBookLevel(price={self.price!r}, quantity_string={self.quantity_string!r}, " \
+               f"order_count={self.order_count!r})"
 
-@dataclass
-class OrderBook:
-    inst_id: str
-    _bids: List[OrderBookLevel] = field(default_factory=lambda: list())
-    _asks: List[OrderBookLevel] = field(default_factory=lambda: list())
-    timestamp: int = 0
-    exch_check_sum: int = 0
 
-    def set_bids_on_snapshot(self, order_book_level_list: List[OrderBookLevel]):
-        self._bids = sorted(order_book_level_list, reverse=True)
+class OrderBookSide:
+    """
+    One side of the order book. Levels are stored in a dict keyed by price, next to an ascending list of the same
+    price objects, so that a price lookup is O(1), locating an insert or delete position is O(log n) by bisect, and
+    the n-th level is a direct index. Bids are read from the end of the list, so index 0 is the best level on both
+    sides without keeping a second, negated key per level.
 
-    def set_asks_on_snapshot(self, order_book_level_list: List[OrderBookLevel]):
-        self._asks = sorted(order_book_level_list, reverse=False)
+    Once columnar is enabled, contiguous float64 price and quantity arrays in best-first order are kept up to date
+    by every update as well.
 
-    def set_bids_on_update(self, order_book_level: OrderBookLevel):
-        if not self._bids or self._bids[-1] > order_book_level:
-            self._bids.append(order_book_level)
-        else:
-            for i in range(len(self._bids)):
-                if order_book_level > self._bids[i]:
-                    self._bids.insert(i, order_book_level)
-                    break
-                elif order_book_level == self._bids[i]:
-                    if order_book_level.quantity == 0:
-                        self._bids.pop(i)
-                    else:
-                        self._bids[i] = order_book_level
-                    break
+    With a max_depth, only the best max_depth levels are kept sorted. Levels beyond it go to an overflow dict, next
+    to an ascending list of its prices, and the best of them is promoted whenever a level of the sorted part is
+    deleted. The overflow holds at most max_overflow levels: once full, the worst of the overflow and the incoming
+    level is dropped and counted in dropped_levels, so that a level demoted from the sorted part is never lost.
+    truncated_price is the best price dropped since the last snapshot; levels at or beyond it may be missing, and
+    only the first trusted_depth() levels are known to match the exchange book.
+    """
+    __slots__ = ("_is_bid", "_keys", "_levels", "_prices", "_quantities", "_max_depth", "_max_overflow",
+                 "_overflow", "_overflow_keys", "dropped_levels", "truncated_price")
 
-    def set_asks_on_update(self, order_book_level: OrderBookLevel):
-        if not self._asks or self._asks[-1] < order_book_level:
-            self._asks.append(order_book_level)
+    def __init__(self, is_bid: bool, max_depth: int = 0, max_overflow: int = DEFAULT_MAX_OVERFLOW):
+        self._is_bid = is_bid
+        self._keys: List[float] = []
+        self._levels: Dict[float, OrderBookLevel] = {}
+        self._prices: Optional[np.ndarray] = None
+        self._quantities: Optional[np.ndarray] = None
+        self._max_depth = max_depth
+        self._max_overflow = max_overflow
+        self._overflow: Dict[float, OrderBookLevel] = {}
+        self._overflow_keys: List[float] = []
+        self.dropped_levels = 0
+        self.truncated_price: Optional[float] = None
+
+    def set_max_depth(self, max_depth: int, max_overflow: int = DEFAULT_MAX_OVERFLOW):
+        """
+        :param max_depth: number of levels kept sorted, 0 to keep every level
+        :param max_overflow: number of levels kept beyond max_depth for re-promotion
+        """
+        self._max_depth = max_depth
+        self._max_overflow = max_overflow
+        truncated_price = self.truncated_price
+        self.set_snapshot(list(self) + list(self._overflow.values()))
+        if truncated_price is not None:
+            self._truncate(truncated_price)
+
+    def _index(self, position: int) -> int:
+        """
+        :param position: position in the ascending key list
+        :return: best-first index of the same level
+        """
+        return len(self._keys) - 1 - position if self._is_bid else position
+
+    def set_snapshot(self, order_book_level_list: List[OrderBookLevel]):
+        self._levels = {level.price: level for level in order_book_level_list}
+        self._keys = sorted(self._levels)
+        self._overflow = {}
+        self._overflow_keys = []
+        self.truncated_price = None
+        if self._max_depth and len(self._keys) > self._max_depth:
+            if self._is_bid:
+                overflow_keys = self._keys[-self._max_depth - 1::-1]
+                self._keys = self._keys[-self._max_depth:]
+            else:
+                overflow_keys = self._keys[self._max_depth:]
+                self._keys = self._keys[:self._max_depth]
+            kept_keys = overflow_keys[:self._max_overflow]
+            self._overflow = {key: self._levels.pop(key) for key in kept_keys}
+            self._overflow_keys = sorted(kept_keys)
+            for key in overflow_keys[self._max_overflow:]:
+                del self._levels[key]
+            if len(overflow_keys) > self._max_overflow:
+                self.dropped_levels += len(overflow_keys) - self._max_overflow
+                self._truncate(overflow_keys[self._max_overflow])
+        if self._prices is not None:
+            self.enable_columnar()
+
+    def enable_columnar(self):
+        """
+        (Re)build the price and quantity arrays from the current levels, later updates keep them in place.
+        """
+        num_of_levels = len(self._keys)
+        capacity = max(64, num_of_levels * 2)
+        self._prices = np.zeros(capacity, dtype=np.float64)
+        self._quantities = np.zeros(capacity, dtype=np.float64)
+        for i, level in enumerate(self):
+            self._prices[i] = level.price
+            self._quantities[i] = level.quantity
+
+    def columns(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: zero-copy views of the price and quantity arrays, best level first
+        """
+        if self._prices is None:
+            self.enable_columnar()
+        num_of_levels = len(self._keys)
+        return self._prices[:num_of_levels], self._quantities[:num_of_levels]
+
+    def update(self, order_book_level: OrderBookLevel) -> int:
+        """
+        Insert, replace or delete (quantity 0) a single level
+        :param order_book_level: OrderBookLevel
+        :return: best-first index of the level affected, -1 if the book did not change
+        """
+        price = order_book_level.price
+        quantity = order_book_level.quantity
+        if price in self._levels:
+            position = bisect_left(self._keys, price)
+            index = self._index(position)
+            if quantity == 0:
+                del self._levels[price]
+                del self._keys[position]
+                if self._prices is not None:
+                    end = len(self._keys) + 1
+                    self._prices[index:end - 1] = self._prices[index + 1:end]
+                    self._quantities[index:end - 1] = self._quantities[index + 1:end]
+                if self._overflow:
+                    self._promote()
+            else:
+                # keep the price object already in the key list as the dict key as well
+                order_book_level.price = self._keys[position]
+                self._levels[price] = order_book_level
+                if self._prices is not None:
+                    self._quantities[index] = quantity
+            return index
+        if price in self._overflow:
+            if quantity == 0:
+                del self._overflow[price]
+                del self._overflow_keys[bisect_left(self._overflow_keys, price)]
+            else:
+                self._overflow[price] = order_book_level
+            return -1
+        if quantity == 0:
+            return -1
+        if self._max_depth and len(self._keys) >= self._max_depth and not self._is_better_than_worst(price):
+            self._add_overflow(order_book_level)
+            return -1
+        position = bisect_left(self._keys, price)
+        self._keys.insert(position, price)
+        self._levels[price] = order_book_level
+        index = self._index(position)
+        if self._prices is not None:
+            end = len(self._keys)
+            self._ensure_capacity(end)
+            self._prices[index + 1:end] = self._prices[index:end - 1]
+            self._quantities[index + 1:end] = self._quantities[index:end - 1]
+            self._prices[index] = price
+            self._quantities[index] = quantity
+        if self._max_depth and len(self._keys) > self._max_depth:
+            self._demote_worst()
+        return index
+
+    def _ensure_capacity(self, num_of_levels: int):
+        if num_of_levels > len(self._prices):
+            self._prices = np.concatenate([self._prices, np.zeros_like(self._prices)])
+            self._quantities = np.concatenate([self._quantities, np.zeros_like(self._quantities)])
+
+    def _is_better_than_worst(self, price: float) -> bool:
+        if self._is_bid:
+            return price > self._keys[0]
+        return price < self._keys[-1]
+
+    def _add_overflow(self, order_book_level: OrderBookLevel):
+        """
+        Once the overflow is full, the worse of its worst level and the incoming one is dropped.
+        """
+        price = order_book_level.price
+        if len(self._overflow) >= self._max_overflow:
+            if not self._overflow_keys or \
+                    (price <= self._overflow_keys[0] if self._is_bid else price >= self._overflow_keys[-1]):
+                self.dropped_levels += 1
+                self._truncate(price)
+                return
+            worst_key = self._overflow_keys.pop(0) if self._is_bid else self._overflow_keys.pop()
+            del self._overflow[worst_key]
+            self.dropped_levels += 1
+            self._truncate(worst_key)
+        insort(self._overflow_keys, price)
+        self._overflow[price] = order_book_level
+
+    def _truncate(self, price: float):
+        """
+        :param price: price of a dropped level, levels at or beyond the best such price may be missing
+        """
+        if self.truncated_price is None or \
+                (price > self.truncated_price if self._is_bid else price < self.truncated_price):
+            self.truncated_price = price
+
+    def trusted_depth(self) -> int:
+        """
+        :return: number of best-first levels strictly better than truncated_price, known to match the exchange book
+        """
+        if self.truncated_price is None:
+            return len(self._keys)
+        if self._is_bid:
+            return len(self._keys) - bisect_right(self._keys, self.truncated_price)
+        return bisect_left(self._keys, self.truncated_price)
+
+    def _demote_worst(self):
+        """
+        Move the worst level of the sorted part into the overflow, the columns only need their length reduced.
+        """
+        key = self._keys.pop(0) if self._is_bid else self._keys.pop()
+        self._add_overflow(self._levels.pop(key))
+
+    def _promote(self):
+        """
+        Move the best overflow level to the worst end of the sorted part, after a level of it was deleted.
+        """
+        price = self._overflow_keys.pop() if self._is_bid else self._overflow_keys.pop(0)
+        order_book_level = self._overflow.pop(price)
+        if self._is_bid:
+            self._keys.insert(0, price)
         else:
-            for i in range(len(self._asks)):
-                if order_book_level < self._asks[i]:
-                    self._asks.insert(i, order_book_level)
-                    break
-                elif order_book_level == self._asks[i]:
-                    if order_book_level.quantity == 0:
-                        self._asks.pop(i)
-                    else:
-                        self._asks[i] = order_book_level
-                    break
+            self._keys.append(price)
+        self._levels[price] = order_book_level
+        if self._prices is not None:
+            index = len(self._keys) - 1
+            self._ensure_capacity(index + 1)
+            self._prices[index] = price
+            self._quantities[index] = order_book_level.quantity
 
-    def set_timestamp(self, timestamp: int):
-        self.timestamp = timestamp
+    def top(self, depth: int) -> List[OrderBookLevel]:
+        levels = self._levels
+        if self._is_bid:
+            return [levels[key] for key in self._keys[:-depth - 1:-1]] if depth > 0 else []
+        return [levels[key] for key in self._keys[:depth]]
 
-    def set_exch_check_sum(self, checksum: int):
-        self.exch_check_sum = checksum
+    def __len__(self):
+        return len(self._keys)
 
-    def _current_check_sum(self):
-        bid_ask_string = ""
-        for i in range(max(len(self._bids), len(self._asks))):
-            if len(self._bids) > i:
-                bid_ask_string += f"{self._bids[i].price_string}:{self._bids[i].quantity_string}:"
-            if len(self._asks) > i:
-                bid_ask_string += f"{self._asks[i].price_string}:{self._asks[i].quantity_string}:"
-            if i + 1 >= 25:
-                break
-        if bid_ask_string:
-            bid_ask_string = bid_ask_string[:-1]
-        crc = binascii.crc32(bid_ask_string.encode()) & 0xffffffff  # Calculate CRC32 as unsigned integer
-        crc_signed = crc if crc < 0x80000000 else crc - 0x100000000  # Convert to signed integer
-        return crc_signed
+    def __getitem__(self, index: int) -> OrderBookLevel:
+        if self._is_bid:
+            if index >= len(self._keys) or index < -len(self._keys):
+                raise IndexError("order book side index out of range")
+            index = -1 - index
+        return self._levels[self._keys[index]]
 
-    def do_check_sum(self) -> bool:
-        if not self.exch_check_sum:
-            return True  # ignore check sum
-        current_crc = self._current_check_sum()
-        return current_crc == self.exch_check_sum
+    def __iter__(self) -> Iterator[OrderBookLevel]:
+        levels = self._levels
+        for key in (reversed(self._keys) if self._is_bid else self._keys):
+            yield levels[key]
+
+
+def calc_check_sum(bids: Sequence[OrderBookLevel], asks: Sequence[OrderBookLevel]) -> int:
+    """
+    :param bids: top CHECK_SUM_DEPTH bid levels, best first
+    :param asks: top CHECK_SUM_DEPTH ask levels, best first
+    :return: signed CRC32 of "bidPx:bidSz:askPx:askSz:..." as the exchange computes it
+    """
+    parts = []
+    for i in range(max(len(bids), len(asks))):
+        if len(bids) > i:
+            parts.append(bids[i].price_string)
+            parts.append(bids[i].quantity_string)
+        if len(asks) > i:
+            parts.append(asks[i].price_string)
+            parts.append(asks[i].quantity_string)
+    bid_ask_string = ":".join(parts)
+    crc = binascii.crc32(bid_ask_string.encode()) & 0xffffffff  # Calculate CRC32 as unsigned integer
+    crc_signed = crc if crc < 0x80000000 else crc - 0x100000000  # Convert to signed integer
+    return crc_signed
+
+
+class OrderBookReader:
+    """
+    Read accessors shared by the live OrderBook and its immutable OrderBookSnapshot, over best-first _bids / _asks.
+    """
+    inst_id: str
+    _bids: Sequence[OrderBookLevel]
+    _asks: Sequence[OrderBookLevel]
 
     def _check_empty_array(self, order_book_array):
         if not order_book_array:
@@ -139,3 +372,160 @@ class OrderBook:
         self._check_empty_array(self._bids)
         self._check_empty_array(self._asks)
         return (self._bids[0].price + self._asks[0].price) / 2
+
+
+@dataclass(frozen=True)
+class OrderBookSnapshot(OrderBookReader):
+    """
+    Immutable copy of the top levels of an OrderBook, safe to read on another thread while the book is updated.
+    Levels are shared with the book rather than copied, a level is never modified once it is in a book, so taking
+    one costs two short lists of references. The checksum of the top levels is taken from the book when the
+    snapshot is built, and a copy of the full depth arrays only when asked for.
+    """
+    inst_id: str
+    _bids: Tuple[OrderBookLevel, ...]
+    _asks: Tuple[OrderBookLevel, ...]
+    timestamp: int = 0
+    exch_check_sum: int = 0
+    seq_id: int = 0
+    stale: bool = False
+    version: int = 0
+    check_sum: int = 0  # of the top CHECK_SUM_DEPTH levels of the book
+    _depth_view: Optional[DepthView] = None
+
+    def do_check_sum(self) -> bool:
+        if not self.exch_check_sum:
+            return True  # ignore check sum
+        return self.check_sum == self.exch_check_sum
+
+    def depth_view(self) -> DepthView:
+        """
+        :return: DepthView of the full depth of the book when the snapshot was built, see OrderBook.snapshot
+        """
+        if self._depth_view is None:
+            raise ValueError(f"{self.inst_id} order book snapshot taken without depth view, "
+                             f"see ORDER_BOOK_SNAPSHOT_DEPTH_VIEW!")
+        return self._depth_view
+
+
+@dataclass
+class OrderBook(OrderBookReader):
+    inst_id: str
+    _bids: OrderBookSide = field(default_factory=lambda: OrderBookSide(is_bid=True))
+    _asks: OrderBookSide = field(default_factory=lambda: OrderBookSide(is_bid=False))
+    timestamp: int = 0
+    exch_check_sum: int = 0
+    seq_id: int = 0
+    stale: bool = False
+    version: int = 0  # number of messages applied
+    max_depth: int = 0
+    max_overflow: int = DEFAULT_MAX_OVERFLOW
+    _check_sum_dirty: bool = True
+    _cached_check_sum: int = 0
+
+    def __post_init__(self):
+        if self.max_depth:
+            self.set_max_depth(self.max_depth, self.max_overflow)
+
+    def set_max_depth(self, max_depth: int, max_overflow: int = DEFAULT_MAX_OVERFLOW):
+        """
+        Bound the sorted part of each side to max_depth levels, so that update cost and memory do not grow with
+        the width of the exchange book.
+        :param max_depth: 0 to keep every level, otherwise at least CHECK_SUM_DEPTH to keep the checksum verifiable
+        :param max_overflow: levels kept beyond max_depth on each side, for re-promotion when levels above go
+        """
+        if max_depth and max_depth < CHECK_SUM_DEPTH:
+            raise ValueError(f"max_depth {max_depth} of {self.inst_id} orderbook must cover the "
+                             f"{CHECK_SUM_DEPTH} checksum levels!")
+        self.max_depth = max_depth
+        self.max_overflow = max_overflow
+        self._bids.set_max_depth(max_depth, max_overflow)
+        self._asks.set_max_depth(max_depth, max_overflow)
+        self._check_sum_dirty = True
+
+    def set_bids_on_snapshot(self, order_book_level_list: List[OrderBookLevel]):
+        self._bids.set_snapshot(order_book_level_list)
+        self._check_sum_dirty = True
+
+    def set_asks_on_snapshot(self, order_book_level_list: List[OrderBookLevel]):
+        self._asks.set_snapshot(order_book_level_list)
+        self._check_sum_dirty = True
+
+    def set_bids_on_update(self, order_book_level: OrderBookLevel):
+        if 0 <= self._bids.update(order_book_level) < CHECK_SUM_DEPTH:
+            self._check_sum_dirty = True
+
+    def set_asks_on_update(self, order_book_level: OrderBookLevel):
+        if 0 <= self._asks.update(order_book_level) < CHECK_SUM_DEPTH:
+            self._check_sum_dirty = True
+
+    def set_timestamp(self, timestamp: int):
+        self.timestamp = timestamp
+
+    def set_exch_check_sum(self, checksum: int):
+        self.exch_check_sum = checksum
+
+    def set_seq_id(self, seq_id: int):
+        self.seq_id = seq_id
+
+    def increase_version(self):
+        self.version += 1
+
+    def set_stale(self, stale: bool):
+        """
+        A stale book missed updates (sequence gap or checksum mismatch), and is not reliable until the next snapshot.
+        :param stale: bool
+        """
+        self.stale = stale
+
+    def trusted_depth(self) -> int:
+        """
+        :return: number of levels on each side known to match the exchange book, fewer than max_depth once far
+        levels were dropped from a full overflow; levels beyond it may be missing until the next snapshot
+        """
+        return min(self._bids.trusted_depth(), self._asks.trusted_depth())
+
+    def _current_check_sum(self) -> int:
+        """
+        CRC32 of the top CHECK_SUM_DEPTH levels, cached until one of those levels changes.
+        :return: signed CRC32
+        """
+        if self._check_sum_dirty:
+            self._cached_check_sum = self._calc_check_sum()
+            self._check_sum_dirty = False
+        return self._cached_check_sum
+
+    def _calc_check_sum(self) -> int:
+        return calc_check_sum(self._bids.top(CHECK_SUM_DEPTH), self._asks.top(CHECK_SUM_DEPTH))
+
+    def do_check_sum(self) -> bool:
+        if not self.exch_check_sum:
+            return True  # ignore check sum
+        current_crc = self._current_check_sum()
+        return current_crc == self.exch_check_sum
+
+    def snapshot(self, depth: int = CHECK_SUM_DEPTH, with_depth_view: bool = False) -> OrderBookSnapshot:
+        """
+        :param depth: number of levels copied on each side, by_level beyond it returns the last level copied
+        :param with_depth_view: also copy the price and quantity arrays of the full depth, for deep analytics on
+        another thread through OrderBookSnapshot.depth_view()
+        :return: OrderBookSnapshot of the top depth levels
+        """
+        return OrderBookSnapshot(inst_id=self.inst_id, _bids=tuple(self._bids.top(depth)),
+                                 _asks=tuple(self._asks.top(depth)), timestamp=self.timestamp,
+                                 exch_check_sum=self.exch_check_sum, seq_id=self.seq_id, stale=self.stale,
+                                 version=self.version,
+                                 check_sum=self._current_check_sum() if self.exch_check_sum else 0,
+                                 _depth_view=self.depth_view().copy() if with_depth_view else None)
+
+    def depth_view(self) -> DepthView:
+        """
+        Array-backed view of both sides for vectorized analytics. The arrays are maintained incrementally from the
+        first call on, and the view shares their memory, so take a fresh view for every decision rather than
+        holding one across updates.
+        :return: DepthView
+        """
+        bid_prices, bid_quantities = self._bids.columns()
+        ask_prices, ask_quantities = self._asks.columns()
+        return DepthView(bid_prices=bid_prices, bid_quantities=bid_quantities,
+                         ask_prices=ask_prices, ask_quantities=ask_quantities)
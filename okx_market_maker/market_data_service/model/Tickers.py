@@ -1,8 +1,18 @@
+import sys
 from dataclasses import dataclass, field
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
+
+from okx_market_maker.market_data_service.model.UsdtConversionIndex import UsdtConversionIndex, ConversionAudit
 from okx_market_maker.utils.OkxEnum import InstType
 
+# ticker fields kept as the wire strings, joined in one string per row, and parsed only by get_ticker_by_inst_id
+LAZY_FIELDS = ["instType", "lastSz", "askSz", "bidSz", "open24h", "high24h", "low24h", "vol24h", "sodUtc0",
+               "sodUtc8"]
+LAZY_FIELD_SEPARATOR = "\x1f"
+_LAZY_FIELD_DEFAULTS = [""] * len(LAZY_FIELDS)
+
 
 @dataclass
 class Ticker:
@@ -85,35 +95,128 @@ class Ticker:
 
 @dataclass
 class Tickers:
-    _ticker_map: Dict[str, Ticker] = field(default_factory=lambda: dict())
+    """
+    Latest ticker of each instrument, in numpy columns indexed by an interned instId -> row map. Only the fields
+    read on every lookup are parsed as tickers arrive: bid, ask, last, ts, and the 24h volume in quote currency the
+    USDT conversion paths are chosen by. A ticker whose ts did not advance is skipped without parsing its prices.
+    The other fields are kept as their wire strings, joined in one string per row, and the full Ticker is built
+    from them on demand.
+
+    A row is written before it is published in the row map, and columns grown before being replaced, so that
+    lookups from other threads always read a complete row.
+    """
+    initial_capacity: int = 1024
+    _rows: Dict[str, int] = field(init=False, repr=False)
+    _bid_px: np.ndarray = field(init=False, repr=False)
+    _ask_px: np.ndarray = field(init=False, repr=False)
+    _last: np.ndarray = field(init=False, repr=False)
+    _vol_ccy24h: np.ndarray = field(init=False, repr=False)
+    _ts: np.ndarray = field(init=False, repr=False)
+    _lazy_fields: List[str] = field(init=False, repr=False)
+    _conversion_index: UsdtConversionIndex = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._rows = {}
+        self._bid_px = np.zeros(self.initial_capacity, dtype=np.float64)
+        self._ask_px = np.zeros(self.initial_capacity, dtype=np.float64)
+        self._last = np.zeros(self.initial_capacity, dtype=np.float64)
+        self._vol_ccy24h = np.zeros(self.initial_capacity, dtype=np.float64)
+        self._ts = np.zeros(self.initial_capacity, dtype=np.int64)
+        self._lazy_fields = []
+        self._conversion_index = UsdtConversionIndex(self)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, inst_id: str):
+        return inst_id in self._rows
 
     def update_from_json(self, json_response):
         if json_response.get("code") != '0':
             raise ValueError(f"Unsuccessful ticker response {json_response}")
-        data = json_response["data"]
+        self.update_from_data(json_response["data"])
+
+    def update_from_data(self, data: List[Dict]):
+        """
+        :param data: tickers, of a REST response or of a tickers channel push
+        """
         for info in data:
             inst_id = info["instId"]
-            if inst_id not in self._ticker_map:
-                self._ticker_map[inst_id] = Ticker.init_from_json(info)
-            else:
-                self._ticker_map[inst_id].update_from_json(info)
+            ts = int(info["ts"]) if info.get("ts") else 0
+            row = self._rows.get(inst_id)
+            if row is None:
+                self._add_row(sys.intern(inst_id), ts, info)
+                continue
+            if ts and ts <= self._ts.item(row):
+                continue
+            prices = self._bid_px.item(row), self._ask_px.item(row), self._last.item(row)
+            if self._write_row(row, ts, info) != prices:
+                self._conversion_index.on_price_update(inst_id)
 
-    def get_ticker_by_inst_id(self, inst_id: str) -> Ticker:
-        return self._ticker_map.get(inst_id)
+    def _add_row(self, inst_id: str, ts: int, info: Dict):
+        row = len(self._lazy_fields)
+        if row >= len(self._ts):
+            for name in ["_bid_px", "_ask_px", "_last", "_vol_ccy24h", "_ts"]:
+                column = getattr(self, name)
+                grown = np.zeros(len(column) * 2, dtype=column.dtype)
+                grown[:row] = column[:row]
+                setattr(self, name, grown)
+        self._lazy_fields.append("")
+        self._write_row(row, ts, info)
+        self._rows[inst_id] = row
+        self._conversion_index.add_instrument(inst_id)
+
+    def _write_row(self, row: int, ts: int, info: Dict) -> Tuple[float, float, float]:
+        """
+        :return: bid, ask and last written
+        """
+        bid_px = float(info["bidPx"]) if info.get("bidPx") else 0.0
+        ask_px = float(info["askPx"]) if info.get("askPx") else 0.0
+        last = float(info["last"]) if info.get("last") else 0.0
+        self._bid_px[row] = bid_px
+        self._ask_px[row] = ask_px
+        self._last[row] = last
+        self._vol_ccy24h[row] = float(info["volCcy24h"]) if info.get("volCcy24h") else 0
+        self._ts[row] = ts
+        self._lazy_fields[row] = LAZY_FIELD_SEPARATOR.join(map(info.get, LAZY_FIELDS, _LAZY_FIELD_DEFAULTS))
+        return bid_px, ask_px, last
+
+    def get_ticker_by_inst_id(self, inst_id: str) -> Optional[Ticker]:
+        """
+        :return: Ticker built from the columns and the wire strings of the latest ticker of inst_id
+        """
+        row = self._rows.get(inst_id)
+        if row is None:
+            return None
+        json_response = dict(zip(LAZY_FIELDS, self._lazy_fields[row].split(LAZY_FIELD_SEPARATOR)))
+        ticker = Ticker.init_from_json({**json_response, "instId": inst_id})
+        ticker.last = self._last.item(row)
+        ticker.ask_px = self._ask_px.item(row)
+        ticker.bid_px = self._bid_px.item(row)
+        ticker.vol_ccy24h = self._vol_ccy24h.item(row)
+        ticker.ts = self._ts.item(row)
+        return ticker
+
+    def get_price(self, inst_id: str, use_mid: bool = True) -> float:
+        row = self._rows.get(inst_id)
+        if row is None:
+            return 0
+        return float((self._ask_px[row] + self._bid_px[row]) / 2) if use_mid else float(self._last[row])
+
+    def get_vol_ccy24h(self, inst_id: str) -> float:
+        row = self._rows.get(inst_id)
+        if row is None:
+            return 0
+        return float(self._vol_ccy24h[row])
 
     def get_usdt_price_by_ccy(self, ccy: str, use_mid: bool = True) -> float:
-        if ccy == "USDT":
-            return 1
-        # 1. if ccy-USDT inst_id exists
-        if f"{ccy}-USDT" in self._ticker_map:
-            ticker = self.get_ticker_by_inst_id(f"{ccy}-USDT")
-            return ((ticker.ask_px + ticker.bid_px) / 2) if use_mid else ticker.last
-        # 2. if ccy-quote and quote-USDT inst_id exists
-        for quote in ["USDC", "BTC", "ETH", "DAI", "OKB", "DOT", "EURT"]:
-            if f"{ccy}-{quote}" in self._ticker_map and f"{quote}-USDT" in self._ticker_map:
-                ticker = self.get_ticker_by_inst_id(f"{ccy}-{quote}")
-                quote_ticker = self.get_ticker_by_inst_id(f"{quote}-USDT")
-                return (((ticker.ask_px + ticker.bid_px) / 2) * ((quote_ticker.ask_px + quote_ticker.bid_px) / 2)) \
-                    if use_mid else (ticker.last * quote_ticker.last)
-        # 3. if neither case then return 0
-        return 0
+        """
+        :return: USDT price of ccy through the spot tickers, 0 if there is no path to USDT
+        """
+        return self._conversion_index.get_usdt_price(ccy, use_mid)
+
+    def audit_usdt_price(self, ccy: str, use_mid: bool = True) -> ConversionAudit:
+        """
+        :return: USDT price of ccy, with the spot tickers it is computed through
+        """
+        return self._conversion_index.audit(ccy, use_mid)
@@ -0,0 +1,124 @@
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+# quote currencies tried first for a currency without a USDT spot pair, when liquidity does not tell them apart
+PREFERRED_QUOTES = ["USDC", "BTC", "ETH", "DAI", "OKB", "DOT", "EURT"]
+
+
+@dataclass(frozen=True)
+class ConversionAudit:
+    ccy: str
+    usdt_price: float
+    inst_ids: Tuple[str, ...]  # spot tickers multiplied along the path, () for USDT or without path
+    use_mid: bool
+
+
+class UsdtConversionIndex:
+    """
+    USDT price of each currency through the spot tickers of a Tickers: the {ccy}-USDT pair, or else {ccy}-{quote}
+    times {quote}-USDT through the quote currency with the most liquid path, the lower 24h USDT volume of its two
+    pairs. Paths are chosen on first lookup and kept until a new spot instrument is seen. Prices are computed on
+    first lookup, mid or last, and kept until a ticker on their path changes price, so that a lookup is a dict
+    read.
+
+    Lookups can run concurrently with the thread updating the tickers; paths and prices are computed and
+    invalidated under a lock.
+    """
+    def __init__(self, tickers):
+        """
+        :param tickers: Tickers, read through get_price and get_vol_ccy24h
+        """
+        self._tickers = tickers
+        self._lock = threading.Lock()
+        self._inst_ids_by_base: Dict[str, List[str]] = {}  # base ccy -> spot inst_ids, the Tickers keys themselves
+        self._paths: Dict[str, Tuple[str, ...]] = {}
+        self._prices: Dict[Tuple[str, bool], float] = {}
+        self._dependents: Dict[str, Set[str]] = {}  # spot inst_id -> currencies whose path goes through it
+
+    def add_instrument(self, inst_id: str):
+        """
+        A new ticker: a spot pair may open a better path for any currency, every path is chosen again.
+        """
+        if inst_id.count("-") != 1:
+            return
+        base = inst_id[:inst_id.index("-")]
+        with self._lock:
+            inst_ids = self._inst_ids_by_base.setdefault(base, [])
+            if inst_id not in inst_ids:
+                inst_ids.append(inst_id)
+            self._paths.clear()
+            self._prices.clear()
+            self._dependents.clear()
+
+    def on_price_update(self, inst_id: str):
+        """
+        A ticker changed price: drop the prices of the currencies whose path goes through it.
+        """
+        if inst_id not in self._dependents:
+            return
+        with self._lock:
+            for ccy in self._dependents.get(inst_id, ()):
+                self._prices.pop((ccy, True), None)
+                self._prices.pop((ccy, False), None)
+
+    def get_usdt_price(self, ccy: str, use_mid: bool = True) -> float:
+        price = self._prices.get((ccy, use_mid))
+        if price is not None:
+            return price
+        return self.audit(ccy, use_mid).usdt_price
+
+    def audit(self, ccy: str, use_mid: bool = True) -> ConversionAudit:
+        """
+        :return: the USDT price of ccy with the path it was computed through, 0 without path
+        """
+        with self._lock:
+            path = self._paths.get(ccy)
+            if path is None:
+                path = self._paths[ccy] = self._find_path(ccy)
+                for inst_id in path:
+                    self._dependents.setdefault(inst_id, set()).add(ccy)
+            price = self._prices.get((ccy, use_mid))
+            if price is None:
+                price = self._prices[(ccy, use_mid)] = self._path_price(ccy, path, use_mid)
+        return ConversionAudit(ccy=ccy, usdt_price=price, inst_ids=path, use_mid=use_mid)
+
+    def _path_price(self, ccy: str, path: Tuple[str, ...], use_mid: bool) -> float:
+        if ccy == "USDT":
+            return 1
+        if not path:
+            return 0
+        price = 1
+        for inst_id in path:
+            price *= self._tickers.get_price(inst_id, use_mid)
+        return price
+
+    def _find_path(self, ccy: str) -> Tuple[str, ...]:
+        if ccy == "USDT":
+            return ()
+        quotes = self._quotes(ccy)
+        if "USDT" in quotes:
+            return quotes["USDT"],
+        best_path, best_liquidity = (), -1
+        for quote in sorted(quotes, key=lambda q: (PREFERRED_QUOTES.index(q) if q in PREFERRED_QUOTES
+                                                   else len(PREFERRED_QUOTES), q)):
+            quote_usdt_inst_id = self._quotes(quote).get("USDT")
+            if quote_usdt_inst_id is None:
+                continue
+            liquidity = min(self._usdt_volume(quotes[quote], quote_usdt_inst_id),
+                            self._usdt_volume(quote_usdt_inst_id))
+            if liquidity > best_liquidity:
+                best_path, best_liquidity = (quotes[quote], quote_usdt_inst_id), liquidity
+        return best_path
+
+    def _quotes(self, base: str) -> Dict[str, str]:
+        """
+        :return: quote ccy -> spot inst_id, of the spot pairs of base
+        """
+        return {inst_id[len(base) + 1:]: inst_id for inst_id in self._inst_ids_by_base.get(base, ())}
+
+    def _usdt_volume(self, inst_id: str, quote_usdt_inst_id: Optional[str] = None) -> float:
+        volume = self._tickers.get_vol_ccy24h(inst_id)
+        if quote_usdt_inst_id is None:
+            return volume
+        return volume * self._tickers.get_price(quote_usdt_inst_id, False)
@@ -0,0 +1,297 @@
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from okx.Trade import TradeAPI
+
+from okx_market_maker.settings import ORDER_GATEWAY_MAX_WORKERS, ORDER_GATEWAY_WS_TIMEOUT_SEC
+from okx_market_maker.utils.LatencyStats import LatencyStats
+from okx_market_maker.utils.OkxEnum import OrderOp
+from okx_market_maker.utils.WsOrderUtil import check_socket_request_params
+
+REST = "rest"
+WEBSOCKET = "websocket"
+RATE_LIMIT_CODES = ["50011", "50061"]
+ORDER_NOT_EXIST_CODE = "51603"
+
+
+@dataclass
+class OrderResponse:
+    """
+    Outcome of one batch request, the REST response or the websocket reply, which share the same layout. Any code
+    other than 0 (all succeeded) and 2 (partially succeeded) means no order of the batch went through, e.g. 50011
+    when rate limited.
+
+    A REST request that raised, e.g. on a read timeout, or a websocket batch without reply, has an unknown outcome
+    instead: the exchange may or may not have processed it. It is reported with outcome_unknown, without code and
+    with the reason as msg, and is not a failed batch; the orders channel or an order lookup tells what happened.
+
+    An order lookup (OrderGateway.get_order) is reported without op, with the REST get order response as result,
+    and the fills of the order under "fills".
+    """
+    op: Optional[OrderOp]
+    order_data_list: List[Dict]
+    result: Dict
+    send_time: float
+    receive_time: float = 0
+    channel: str = REST
+    outcome_unknown: bool = False
+
+    def is_batch_failed(self) -> bool:
+        return not self.outcome_unknown and self.result.get("code") not in ["0", "2"]
+
+    def is_rate_limited(self) -> bool:
+        return self.result.get("code") in RATE_LIMIT_CODES or any(
+            single_order_data.get("sCode") in RATE_LIMIT_CODES for single_order_data in self.result.get("data") or [])
+
+
+@dataclass
+class OrderGatewayStats:
+    sent: int = 0
+    completed: int = 0
+    failed: int = 0
+    unknown: int = 0  # batches without response, which the exchange may have processed
+    rest_fallbacks: int = 0
+    max_in_flight: int = 0
+    send_to_ack: Dict[Tuple[str, OrderOp], LatencyStats] = field(default_factory=dict)
+
+
+@dataclass
+class _WsRequest:
+    op: OrderOp
+    order_data_list: List[Dict]
+    future: Future
+    send_time: float
+
+
+class OrderGateway:
+    """
+    Sends place, amend and cancel batches without blocking the strategy thread, so that the batches of one requote
+    are in flight together.
+
+    With a websocket client, batches go out as batch-orders / batch-amend-orders / batch-cancel-orders ops on the
+    logged in private connection, and the replies are matched back by request id in on_ws_reply. A batch falls back
+    to the REST trade API, sent on a pool of worker threads, when the connection is not available or the op is
+    rejected before reaching the matching engine.
+
+    Every batch returns a Future resolved with its OrderResponse. Completed responses are handed back to the
+    strategy thread through on_response, or kept until drain_responses() when no callback is given; they are never
+    applied on the gateway threads. Requests in flight are tracked by clOrdId, and by reqId for amendments.
+    """
+    def __init__(self, trade_api: TradeAPI, max_workers: int = ORDER_GATEWAY_MAX_WORKERS,
+                 on_response: Callable[[OrderResponse], None] = None, ws_client=None,
+                 ws_timeout_sec: float = ORDER_GATEWAY_WS_TIMEOUT_SEC):
+        """
+        :param trade_api: REST trade API, used for every batch without ws_client
+        :param max_workers: REST requests in flight concurrently
+        :param on_response: called with every completed OrderResponse, on the thread that completed it
+        :param ws_client: anything with send_order_op(request_id, op, args) -> bool, False if it cannot send now
+        :param ws_timeout_sec: a websocket batch without reply after this long has an unknown outcome
+        """
+        self.trade_api = trade_api
+        self.on_response = on_response
+        self.ws_client = ws_client
+        self.ws_timeout_sec = ws_timeout_sec
+        self.stats = OrderGatewayStats()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="OrderGateway")
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._ws_requests: Dict[str, _WsRequest] = {}
+        self._responses: Deque[OrderResponse] = deque()
+
+    def place_orders(self, order_data_list: List[Dict]) -> Future:
+        return self._submit(OrderOp.BATCH_ORDER, order_data_list)
+
+    def amend_orders(self, order_data_list: List[Dict]) -> Future:
+        return self._submit(OrderOp.BATCH_AMEND, order_data_list)
+
+    def cancel_orders(self, order_data_list: List[Dict]) -> Future:
+        return self._submit(OrderOp.BATCH_CANCEL, order_data_list)
+
+    def get_order(self, inst_id: str, client_order_id: str) -> Future:
+        """
+        Look up an order over REST on the worker threads, e.g. one of a batch with an unknown outcome, together
+        with its fills, as the order itself only carries the last one.
+        :return: Future resolved with an OrderResponse without op
+        """
+        future = Future()
+        self._executor.submit(self._request_rest, None, [{"instId": inst_id, "clOrdId": client_order_id}],
+                              self._get_order_with_fills, future)
+        return future
+
+    def _get_order_with_fills(self, order_data_list: List[Dict]) -> Dict:
+        result = self.trade_api.get_order(**order_data_list[0])
+        if result.get("code") != "0" or not result.get("data") or not float(result["data"][0].get("accFillSz") or 0):
+            return result
+        fills_result = self.trade_api.get_fills(instId=order_data_list[0]["instId"], ordId=result["data"][0]["ordId"])
+        if fills_result.get("code") != "0":
+            return fills_result
+        return {**result, "fills": fills_result.get("data") or []}
+
+    def _submit(self, op: OrderOp, order_data_list: List[Dict]) -> Future:
+        self.expire_ws_requests()
+        request_id = check_socket_request_params(op.value, order_data_list) if self.ws_client is not None else None
+        future = Future()
+        with self._lock:
+            for order_data in order_data_list:
+                self._in_flight[self._request_key(op, order_data)] = future
+            self.stats.sent += 1
+            self.stats.max_in_flight = max(self.stats.max_in_flight, len(self._in_flight))
+        if request_id is None or not self._send_ws(request_id, op, order_data_list, future):
+            self._send_rest(op, order_data_list, future)
+        return future
+
+    @staticmethod
+    def _request_key(op: OrderOp, order_data: Dict) -> str:
+        if op == OrderOp.BATCH_AMEND and order_data.get("reqId"):
+            return order_data["reqId"]
+        return order_data.get("clOrdId") or order_data.get("ordId")
+
+    def _send_ws(self, request_id: str, op: OrderOp, order_data_list: List[Dict], future: Future) -> bool:
+        with self._lock:
+            self._ws_requests[request_id] = _WsRequest(op=op, order_data_list=order_data_list, future=future,
+                                                       send_time=time.time())
+        try:
+            sent = self.ws_client.send_order_op(request_id, op, order_data_list)
+        except Exception:
+            print(f"{op.value} websocket request failed: {traceback.format_exc()}")
+            sent = False
+        if not sent:
+            with self._lock:
+                self._ws_requests.pop(request_id, None)
+                self.stats.rest_fallbacks += 1
+        return sent
+
+    def _send_rest(self, op: OrderOp, order_data_list: List[Dict], future: Future):
+        if op == OrderOp.BATCH_ORDER:
+            request = self.trade_api.place_multiple_orders
+        elif op == OrderOp.BATCH_AMEND:
+            request = self.trade_api.amend_multiple_orders
+        else:
+            request = self.trade_api.cancel_multiple_orders
+        self._executor.submit(self._request_rest, op, order_data_list, request, future)
+
+    def _request_rest(self, op: Optional[OrderOp], order_data_list: List[Dict],
+                      request: Callable[[List[Dict]], Dict], future: Future):
+        send_time = time.time()
+        outcome_unknown = False
+        try:
+            result = request(order_data_list)
+        except Exception as e:
+            print(f"{op.value if op else 'get order'} request failed: {traceback.format_exc()}")
+            result = {"code": "", "msg": str(e), "data": []}
+            outcome_unknown = True
+        self._complete(future, OrderResponse(op=op, order_data_list=order_data_list, result=result,
+                                             send_time=send_time, receive_time=time.time(), channel=REST,
+                                             outcome_unknown=outcome_unknown))
+
+    def on_ws_reply(self, message: Dict):
+        """
+        Called by the private websocket callback with the reply to an order op. A code other than 0 (all
+        succeeded), 1 (all failed) or 2 (partially succeeded) means the op itself was rejected, e.g. not logged in,
+        and the batch is resent over REST.
+        :param message: {"id": ..., "op": ..., "code": ..., "msg": ..., "data": [...]}
+        """
+        with self._lock:
+            ws_request = self._ws_requests.pop(message.get("id"), None)
+        if ws_request is None:
+            return
+        if message.get("code") not in ["0", "1", "2"]:
+            print(f"{ws_request.op.value} websocket request rejected: {message}, resending over REST")
+            with self._lock:
+                self.stats.rest_fallbacks += 1
+            self._send_rest(ws_request.op, ws_request.order_data_list, ws_request.future)
+            return
+        self._complete(ws_request.future, OrderResponse(
+            op=ws_request.op, order_data_list=ws_request.order_data_list, result=message,
+            send_time=ws_request.send_time, receive_time=time.time(), channel=WEBSOCKET))
+
+    def expire_ws_requests(self):
+        """
+        Complete the websocket batches still without reply after ws_timeout_sec with an unknown outcome. They are not
+        resent, as the exchange may have processed them; the orders channel still reports their outcome.
+        """
+        now = time.time()
+        with self._lock:
+            expired = [(request_id, ws_request) for request_id, ws_request in self._ws_requests.items()
+                       if now - ws_request.send_time > self.ws_timeout_sec]
+            for request_id, _ in expired:
+                del self._ws_requests[request_id]
+        for request_id, ws_request in expired:
+            self._complete(ws_request.future, OrderResponse(
+                op=ws_request.op, order_data_list=ws_request.order_data_list,
+                result={"code": "", "msg": f"no reply to {request_id} in {self.ws_timeout_sec} seconds", "data": []},
+                send_time=ws_request.send_time, receive_time=now, channel=WEBSOCKET, outcome_unknown=True))
+
+    def _complete(self, future: Future, response: OrderResponse):
+        if response.op is None:
+            self._complete_lookup(future, response)
+            return
+        with self._lock:
+            for order_data in response.order_data_list:
+                key = self._request_key(response.op, order_data)
+                if self._in_flight.get(key) is future:
+                    del self._in_flight[key]
+            self.stats.completed += 1
+            if response.is_batch_failed():
+                self.stats.failed += 1
+            if response.outcome_unknown:
+                self.stats.unknown += 1
+            self.stats.send_to_ack.setdefault((response.channel, response.op), LatencyStats()).record_since(
+                response.send_time, response.receive_time)
+            if self.on_response is None:
+                self._responses.append(response)
+        if self.on_response is not None:
+            self.on_response(response)
+        future.set_result(response)
+
+    def _complete_lookup(self, future: Future, response: OrderResponse):
+        if self.on_response is not None:
+            self.on_response(response)
+        else:
+            with self._lock:
+                self._responses.append(response)
+        future.set_result(response)
+
+    def drain_responses(self) -> List[OrderResponse]:
+        with self._lock:
+            responses = list(self._responses)
+            self._responses.clear()
+        return responses
+
+    def in_flight(self, key: str) -> Optional[Future]:
+        """
+        :param key: clOrdId of a place or cancel request, reqId of an amend request
+        :return: the Future of the batch the request is in flight with, None once it completed
+        """
+        with self._lock:
+            return self._in_flight.get(key)
+
+    def in_flight_count(self) -> int:
+        with self._lock:
+            return len(self._in_flight)
+
+    def wait_all(self, timeout: float = None) -> bool:
+        """
+        Block until every request in flight completed, e.g. the cancellations sent on shutdown.
+        :return: whether all completed within the timeout
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        while self.in_flight_count():
+            if deadline is not None and time.time() >= deadline:
+                return False
+            self.expire_ws_requests()
+            time.sleep(0.01)
+        return True
+
+    def send_to_ack_summary(self) -> str:
+        return ", ".join(f"{channel} {op.value}: {stats.count} sent, mean {stats.mean_ms():.1f} ms, "
+                         f"p99 {stats.percentile_ms(99):.1f} ms"
+                         for (channel, op), stats in self.stats.send_to_ack.items())
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,101 @@
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Tuple
+
+from okx_market_maker.settings import ORDER_RATE_LIMIT_WINDOW_SEC, ORDER_RATE_LIMIT_PER_INSTRUMENT, \
+    ORDER_RATE_LIMIT_PER_ACCOUNT
+from okx_market_maker.utils.OkxEnum import OrderOp
+
+MAX_ORDERS_PER_BATCH = 20
+ACCOUNT_LIMITED_OPS = [OrderOp.BATCH_ORDER, OrderOp.BATCH_AMEND]
+
+
+class TokenBucket:
+    """
+    capacity tokens, refilled continuously at refill_per_sec.
+    """
+    __slots__ = ("capacity", "refill_per_sec", "tokens", "_last_refill")
+
+    def __init__(self, capacity: float, refill_per_sec: float):
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self.tokens = capacity
+        self._last_refill = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last_refill) * self.refill_per_sec)
+        self._last_refill = now
+
+    def available(self) -> float:
+        self._refill()
+        return self.tokens
+
+    def take(self, tokens: float = 1):
+        self._refill()
+        self.tokens -= tokens
+
+    def empty(self):
+        self._refill()
+        self.tokens = min(self.tokens, 0)
+
+
+@dataclass
+class OrderRateLimiterStats:
+    admitted: Dict[OrderOp, int] = field(default_factory=dict)
+    deferred: Dict[OrderOp, int] = field(default_factory=dict)
+    rate_limited: int = 0
+
+
+class OrderRateLimiter:
+    """
+    Order operation budget, counted in orders as OKX limits the batch endpoints: a token bucket per endpoint and
+    instrument, and one per account shared by new orders and amendments.
+
+    The strategy acquires one token per request before sending it, cancels first, then amendments, then new
+    orders, so that under a tight budget requotes do not starve cancels and amendments of resting orders. A request
+    without budget is not sent and goes back to the strategy, to be decided on again with fresh data.
+    """
+    def __init__(self, window_sec: float = ORDER_RATE_LIMIT_WINDOW_SEC,
+                 per_instrument: int = ORDER_RATE_LIMIT_PER_INSTRUMENT,
+                 per_account: int = ORDER_RATE_LIMIT_PER_ACCOUNT):
+        self.window_sec = window_sec
+        self.per_instrument = per_instrument
+        self.stats = OrderRateLimiterStats()
+        self._account_bucket = TokenBucket(per_account, per_account / window_sec)
+        self._instrument_buckets: Dict[Tuple[OrderOp, str], TokenBucket] = {}
+
+    def _buckets(self, op: OrderOp, inst_id: str) -> List[TokenBucket]:
+        instrument_bucket = self._instrument_buckets.get((op, inst_id))
+        if instrument_bucket is None:
+            instrument_bucket = self._instrument_buckets[(op, inst_id)] = TokenBucket(
+                self.per_instrument, self.per_instrument / self.window_sec)
+        if op in ACCOUNT_LIMITED_OPS:
+            return [instrument_bucket, self._account_bucket]
+        return [instrument_bucket]
+
+    def try_acquire(self, op: OrderOp, inst_id: str) -> bool:
+        """
+        Take one order of budget from every bucket the operation counts against, or none.
+        :param op: OrderOp.BATCH_ORDER / BATCH_AMEND / BATCH_CANCEL
+        :param inst_id: instrument of the order
+        :return: whether the order can be sent now
+        """
+        buckets = self._buckets(op, inst_id)
+        if any(bucket.available() < 1 for bucket in buckets):
+            self.stats.deferred[op] = self.stats.deferred.get(op, 0) + 1
+            return False
+        for bucket in buckets:
+            bucket.take()
+        self.stats.admitted[op] = self.stats.admitted.get(op, 0) + 1
+        return True
+
+    def on_rate_limited(self, op: OrderOp, inst_ids: Iterable[str]):
+        """
+        The exchange rejected a batch with 50011 / 50061: our view of the budget is ahead of the exchange's, e.g.
+        orders sent from elsewhere on the same account. Empty the buckets, so that they refill from now.
+        """
+        self.stats.rate_limited += 1
+        for inst_id in set(inst_ids):
+            for bucket in self._buckets(op, inst_id):
+                bucket.empty()
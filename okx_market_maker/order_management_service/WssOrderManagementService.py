@@ -1,24 +1,31 @@
 import json
 import time
-from typing import List, Dict
+from typing import Container, List, Dict
 
 from okx_market_maker.order_management_service.model.Order import Order, Orders
+from okx_market_maker.order_management_service.model.OrderArchive import OrderArchive
 from okx.websocket.WsPrivate import WsPrivate
-from okx_market_maker import orders_container
-from okx_market_maker.settings import API_KEY, API_KEY_SECRET, API_PASSPHRASE
+from twisted.internet import reactor
+from okx_market_maker import orders_container, journal_recorder_container, update_queue_container, \
+    order_gateway_container
+from okx_market_maker.settings import API_KEY, API_KEY_SECRET, API_PASSPHRASE, ORDERS_TERMINAL_GRACE_SEC, \
+    ORDERS_MAX_CACHED, ORDERS_ARCHIVE_SIZE
+from okx_market_maker.utils.OkxEnum import OrderOp
 
 
 class WssOrderManagementService(WsPrivate):
     def __init__(self, url: str, api_key: str = API_KEY, passphrase: str = API_PASSPHRASE,
-                 secret_key: str = API_KEY_SECRET, useServerTime: bool = False):
+                 secret_key: str = API_KEY_SECRET, useServerTime: bool = False,
+                 pinned_client_order_ids: Container[str] = frozenset()):
         super().__init__(api_key, passphrase, secret_key, url, useServerTime)
         self.args = []
+        self.pinned_client_order_ids = pinned_client_order_ids
 
     def run_service(self):
         args = self._prepare_args()
         print(args)
         print("subscribing")
-        orders_container.append(Orders())
+        orders_container.append(new_orders(self.pinned_client_order_ids))
         self.subscribe(args, _callback)
         self.args += args
 
@@ -26,6 +33,23 @@ class WssOrderManagementService(WsPrivate):
         self.unsubscribe(self.args, lambda message: print(message))
         self.close()
 
+    def send_order_op(self, request_id: str, op: OrderOp, args: List[Dict]) -> bool:
+        """
+        Send an order operation on the logged in private connection of the orders subscription, the reply comes
+        back through _callback to the order gateway.
+        :param request_id: id echoed back in the reply
+        :param op: OrderOp
+        :param args: order requests' json
+        :return: False if the connection is not open
+        """
+        factory = self.factories.get(self.getPrivateKey("orders"))
+        protocol = factory.instance if factory is not None else None
+        if protocol is None or protocol.state != protocol.STATE_OPEN:
+            return False
+        payload = json.dumps({"id": request_id, "op": op.value, "args": args}, ensure_ascii=False).encode("utf8")
+        reactor.callFromThread(protocol.sendMessage, payload, False)
+        return True
+
     @staticmethod
     def _prepare_args() -> List[Dict]:
         args = []
@@ -38,22 +62,51 @@ class WssOrderManagementService(WsPrivate):
 
 
 def _callback(message):
+    if message.get("id") and message.get("op") in OrderOp:
+        if order_gateway_container:
+            order_gateway_container[0].on_ws_reply(message)
+        return
     arg = message.get("arg")
     # print(message)
     if not arg or not arg.get("channel"):
         return
     if message.get("event") == "subscribe":
         return
+    if journal_recorder_container:
+        journal_recorder_container[0].record(message)
     if arg.get("channel") == "orders":
         on_orders_update(message)
+        if update_queue_container:
+            update_queue_container[0].put("orders", None, message.get("data", []))
         # print(orders_container)
 
 
+def new_orders(pinned_client_order_ids: Container[str] = frozenset()) -> Orders:
+    """
+    :param pinned_client_order_ids: clOrdIds whose orders are never evicted from the cache
+    """
+    return Orders(terminal_grace_sec=ORDERS_TERMINAL_GRACE_SEC, max_orders=ORDERS_MAX_CACHED,
+                  archive=OrderArchive(ORDERS_ARCHIVE_SIZE), pinned_client_order_ids=pinned_client_order_ids)
+
+
 def on_orders_update(message):
     if not orders_container:
-        orders_container.append(Orders.init_from_json(message))
+        orders_container.append(new_orders().updated_from_json(message))
     else:
-        orders_container[0].update_from_json(message)
+        # Publish by swapping the reference: a new version is built with updated_from_json and replaces
+        # container[0], the previous one is never modified, so a reader holding it keeps a consistent view without
+        # locking. The account and positions containers are published the same way.
+        orders_container[0] = orders_container[0].updated_from_json(message)
+
+
+def seed_orders(data: List[Dict]):
+    """
+    Seed the orders cache from a REST snapshot, skipping the orders the websocket already pushed a newer update of.
+    """
+    if orders_container:
+        data = orders_container[0].newer_than_cached(data)
+    if data:
+        on_orders_update({"data": data})
 
 
 if __name__ == "__main__":
@@ -1,8 +1,15 @@
+import time
 from dataclasses import dataclass, field
 from decimal import Decimal
-from typing import Dict, List
+from typing import Container, Dict, List
+from okx_market_maker.order_management_service.model.OrderArchive import OrderArchive
 from okx_market_maker.utils.OkxEnum import *
 
+DEFAULT_TERMINAL_GRACE_SEC = 60
+DEFAULT_MAX_ORDERS = 10000
+DEFAULT_ARCHIVE_SIZE = 10000
+TERMINAL_STATES = [OrderState.FILLED, OrderState.CANCELED]
+
 
 @dataclass
 class Order:
@@ -52,7 +59,7 @@ class Order:
         order.category = OrderCategory(json_response["category"])
         order.ccy = json_response["ccy"]
         order.cl_ord_id = json_response["clOrdId"]
-        order.exec_type = OrderExecType(json_response["execType"]) if json_response["execType"] else None
+        order.exec_type = OrderExecType(json_response["execType"]) if json_response.get("execType") else None
         order.fee = float(json_response.get("fee", 0))
         order.fee_ccy = json_response.get("feeCcy", "")
         order.fill_fee = float(json_response.get("fillFee", 0))
@@ -86,9 +93,24 @@ class Order:
 
 @dataclass
 class Orders:
+    """
+    Orders seen on the orders channel, by ordId and by clOrdId. An order in a terminal state (filled or canceled)
+    stays for terminal_grace_sec after the update that made it terminal, then is moved to the archive. Beyond
+    max_orders, the oldest terminal orders are archived without waiting for the grace period; live orders are
+    never evicted. Neither are the orders whose clOrdId is in pinned_client_order_ids, the strategy orders not
+    reconciled yet: they are looked at again a grace period later.
+    """
     _order_map: Dict[str, Order] = field(default_factory=lambda: dict())
     _client_order_map: Dict[str, Order] = field(default_factory=lambda: dict())
     _non_client_order_map: Dict[str, Order] = field(default_factory=lambda: dict())
+    version: int = 0
+    # ordId -> local time the order turned terminal, oldest first
+    _terminal_since: Dict[str, float] = field(default_factory=lambda: dict())
+    terminal_grace_sec: float = DEFAULT_TERMINAL_GRACE_SEC
+    max_orders: int = DEFAULT_MAX_ORDERS
+    archive: OrderArchive = field(default_factory=lambda: OrderArchive(DEFAULT_ARCHIVE_SIZE))
+    # owned by the strategy thread, only tested for membership here
+    pinned_client_order_ids: Container[str] = field(default_factory=frozenset)
 
     @classmethod
     def init_from_json(cls, json_response):
@@ -99,6 +121,9 @@ class Orders:
                                     if order.cl_ord_id}
         orders._non_client_order_map = {order.ord_id: order for ord_id, order in orders._order_map.items()
                                         if not order.cl_ord_id}
+        now = time.time()
+        orders._terminal_since = {ord_id: now for ord_id, order in orders._order_map.items()
+                                  if order.state in TERMINAL_STATES}
         return orders
 
     def update_from_json(self, json_response):
@@ -117,6 +142,79 @@ class Orders:
                 self._client_order_map[new_order.cl_ord_id] = new_order
             else:
                 self._non_client_order_map[new_order.ord_id] = new_order
+            if new_order.state in TERMINAL_STATES:
+                if new_order.ord_id not in self._terminal_since:
+                    self._terminal_since[new_order.ord_id] = time.time()
+            elif new_order.ord_id in self._terminal_since:
+                del self._terminal_since[new_order.ord_id]
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Archive the terminal orders past their grace period, then the oldest terminal orders while above
+        max_orders. Both only look at the front of _terminal_since, which is in terminal time order.
+        """
+        stats = self.archive.stats
+        now = time.time()
+        expiry = now - self.terminal_grace_sec
+        pinned = []
+        while self._terminal_since:
+            ord_id, terminal_since = next(iter(self._terminal_since.items()))
+            if terminal_since > expiry:
+                break
+            if self._is_pinned(ord_id):
+                pinned.append(ord_id)
+                del self._terminal_since[ord_id]
+                continue
+            self._archive_order(ord_id)
+            stats.evicted_after_grace += 1
+        while len(self._order_map) > self.max_orders and self._terminal_since:
+            ord_id = next(iter(self._terminal_since))
+            if self._is_pinned(ord_id):
+                pinned.append(ord_id)
+                del self._terminal_since[ord_id]
+                continue
+            self._archive_order(ord_id)
+            stats.evicted_over_cap += 1
+        if len(self._order_map) > self.max_orders:
+            stats.over_cap_with_active_orders += 1
+        for ord_id in pinned:
+            self._terminal_since[ord_id] = now
+
+    def _is_pinned(self, order_id: str) -> bool:
+        client_order_id = self._order_map[order_id].cl_ord_id
+        return bool(client_order_id) and client_order_id in self.pinned_client_order_ids
+
+    def _archive_order(self, order_id: str) -> None:
+        del self._terminal_since[order_id]
+        order = self._order_map.pop(order_id)
+        self._non_client_order_map.pop(order_id, None)
+        if self._client_order_map.get(order.cl_ord_id) is order:
+            del self._client_order_map[order.cl_ord_id]
+        self.archive.append(order)
+
+    def updated_from_json(self, json_response) -> "Orders":
+        """New Orders of the next version with the push merged in, self is left untouched."""
+        orders = Orders(_order_map=dict(self._order_map), _client_order_map=dict(self._client_order_map),
+                        _non_client_order_map=dict(self._non_client_order_map), version=self.version + 1,
+                        _terminal_since=dict(self._terminal_since), terminal_grace_sec=self.terminal_grace_sec,
+                        max_orders=self.max_orders, archive=self.archive,
+                        pinned_client_order_ids=self.pinned_client_order_ids)
+        orders.update_from_json(json_response)
+        return orders
+
+    def newer_than_cached(self, data: List[Dict]) -> List[Dict]:
+        """
+        Entries of a REST orders snapshot this cache does not hold an equal or newer update of.
+        :param data: orders' json, as returned by the orders endpoints
+        :return: the entries absent from the cache and the archive, or with a later uTime
+        """
+        newer = []
+        for single_order in data:
+            cached = self._order_map.get(single_order["ordId"]) or self.archive.find(order_id=single_order["ordId"])
+            if cached is None or int(single_order.get("uTime", 0)) > cached.u_time:
+                newer.append(single_order)
+        return newer
 
     def get_order_by_order_id(self, order_id: str) -> Order:
         return self._order_map.get(order_id)
@@ -144,6 +242,7 @@ class Orders:
             client_order_id = order.cl_ord_id
             order_id = order.ord_id
             del self._order_map[order_id]
+            self._terminal_since.pop(order_id, None)
             if order_id in self._non_client_order_map:
                 del self._non_client_order_map[order_id]
             if client_order_id in self._client_order_map:
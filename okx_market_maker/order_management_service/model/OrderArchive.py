@@ -0,0 +1,59 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, NamedTuple, Optional
+
+from okx_market_maker.utils.OkxEnum import OrderSide, OrderState
+
+
+class ArchivedOrder(NamedTuple):
+    ord_id: str
+    cl_ord_id: str
+    inst_id: str
+    side: OrderSide
+    state: OrderState
+    px: float
+    sz: float
+    acc_fill_sz: str
+    avg_px: float
+    c_time: int
+    u_time: int
+
+
+@dataclass
+class OrdersCacheStats:
+    archived: int = 0
+    evicted_after_grace: int = 0
+    evicted_over_cap: int = 0
+    over_cap_with_active_orders: int = 0
+
+
+class OrderArchive:
+    """
+    Ring buffer of the last max_size orders evicted from the Orders cache, in eviction order, kept as compact
+    ArchivedOrder tuples. It is append-only and shared by all Orders versions, written by the websocket thread only.
+    """
+    def __init__(self, max_size: int):
+        self._records: Deque[ArchivedOrder] = deque(maxlen=max_size)
+        self.stats = OrdersCacheStats()
+
+    def append(self, order) -> None:
+        self._records.append(ArchivedOrder(
+            ord_id=order.ord_id, cl_ord_id=order.cl_ord_id, inst_id=order.inst_id, side=order.side,
+            state=order.state, px=order.px, sz=order.sz, acc_fill_sz=order.acc_fill_sz, avg_px=order.avg_px,
+            c_time=order.c_time, u_time=order.u_time))
+        self.stats.archived += 1
+
+    def find(self, order_id: str = "", client_order_id: str = "") -> Optional[ArchivedOrder]:
+        """
+        Latest archived record of an order, searched from the most recent eviction backwards.
+        """
+        for record in reversed(self._records):
+            if (order_id and record.ord_id == order_id) or (client_order_id and record.cl_ord_id == client_order_id):
+                return record
+        return None
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self):
+        return iter(self._records)
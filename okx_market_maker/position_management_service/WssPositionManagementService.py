@@ -7,7 +7,8 @@ from okx_market_maker.position_management_service.model.BalanceAndPosition impor
 from okx_market_maker.position_management_service.model.Account import Account, AccountDetail
 from okx_market_maker.position_management_service.model.Positions import Position, Positions
 from okx.websocket.WsPrivate import WsPrivate
-from okx_market_maker import balance_and_position_container, account_container, positions_container
+from okx_market_maker import balance_and_position_container, account_container, positions_container, \
+    journal_recorder_container, update_queue_container
 from okx_market_maker.settings import API_KEY, API_KEY_SECRET, API_PASSPHRASE
 
 
@@ -54,6 +55,8 @@ def _callback(message):
         return
     if message.get("event") == "subscribe":
         return
+    if journal_recorder_container:
+        journal_recorder_container[0].record(message)
     if arg.get("channel") == "balance_and_position":
         on_balance_and_position(message)
         # print(balance_and_position_container)
@@ -75,17 +78,34 @@ def on_balance_and_position(message):
 
 
 def on_account(message):
+    """Merge a push, which may carry some of the currencies only, and hand the account to the update queue."""
     if not account_container:
         account_container.append(Account.init_from_json(message))
     else:
-        account_container[0].update_from_json(message)
+        account_container[0] = account_container[0].updated_from_json(message)
+    if update_queue_container:
+        update_queue_container[0].put("account", None, account_container[0])
 
 
 def on_position(message):
+    """Merge a push and hand the positions to the update queue."""
     if not positions_container:
         positions_container.append(Positions.init_from_json(message))
     else:
-        positions_container[0].update_from_json(message)
+        positions_container[0] = positions_container[0].updated_from_json(message)
+    if update_queue_container:
+        update_queue_container[0].put("positions", None, positions_container[0])
+
+
+def seed_positions(data: List[Dict]):
+    """
+    Seed the positions cache from a REST snapshot, skipping the positions the websocket already pushed a newer
+    update of.
+    """
+    if positions_container:
+        data = positions_container[0].newer_than_cached(data)
+    if data:
+        on_position({"data": data})
 
 
 if __name__ == "__main__":
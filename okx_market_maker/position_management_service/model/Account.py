@@ -1,4 +1,4 @@
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from typing import Dict
 
 
@@ -164,5 +164,11 @@ class Account:
                 continue
             self.details[account_detail.ccy] = account_detail
 
+    def updated_from_json(self, json_response) -> "Account":
+        """New Account with the push merged in, self is left untouched."""
+        account = replace(self, details=dict(self.details))
+        account.update_from_json(json_response)
+        return account
+
     def get_account_details(self) -> Dict[str, AccountDetail]:
         return self.details
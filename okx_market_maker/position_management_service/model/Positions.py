@@ -1,6 +1,6 @@
 from dataclasses import dataclass, field
 from okx_market_maker.utils.OkxEnum import *
-from typing import Dict
+from typing import Dict, List
 
 
 @dataclass
@@ -147,5 +147,20 @@ class Positions:
                 continue
             self._position_map[new_pos.position_id] = new_pos
 
+    def updated_from_json(self, json_response) -> "Positions":
+        """New Positions with the push merged in, self is left untouched."""
+        positions = Positions(_position_map=dict(self._position_map))
+        positions.update_from_json(json_response)
+        return positions
+
+    def newer_than_cached(self, data: List[Dict]) -> List[Dict]:
+        """
+        Entries of a REST positions snapshot this cache does not hold an equal or newer update of.
+        :param data: positions' json, as returned by the positions endpoint
+        :return: the entries absent from the cache, or with a later uTime
+        """
+        return [single_pos for single_pos in data if str(single_pos["posId"]) not in self._position_map
+                or int(single_pos.get("uTime", 0)) > self._position_map[str(single_pos["posId"])].u_time]
+
     def get_position_map(self) -> Dict[str, Position]:
         return self._position_map
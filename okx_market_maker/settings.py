@@ -10,10 +10,88 @@ IS_PAPER_TRADING = True
 TRADING_INSTRUMENT_ID = "BTC-USDT-SWAP"
 TRADING_MODE = "cross"  # "cash" / "isolated" / "cross"
 
+# market data subscription
+MARKET_DATA_INSTRUMENT_IDS = [TRADING_INSTRUMENT_ID]  # instruments with order books maintained by one MDS
+# "bbo-tbt" keeps a tick-by-tick top of book apart from the depth book, and the strategy quotes off it when
+# subscribed; ["bbo-tbt"] alone skips the depth book entirely
+MARKET_DATA_CHANNELS = ["books"]  # channels subscribed for each of the MARKET_DATA_INSTRUMENT_IDS
+MDS_MAX_ARGS_PER_CONNECTION = 100  # channel-instrument subscriptions per websocket, more opens another connection
+
 # default latency tolerance level
 ORDER_BOOK_DELAYED_SEC = 60  # Warning if OrderBook not updated for these seconds, potential issues from wss connection
 ACCOUNT_DELAYED_SEC = 60  # Warning if Account not updated for these seconds, potential issues from wss connection
 
+# order book checksum
+ORDER_BOOK_CHECK_SUM_ON_EVERY_MESSAGE = False  # verify the exchange checksum as each message is applied
+ORDER_BOOK_RESYNC_TIMEOUT_SEC = 10  # re-subscribe again if the snapshot of a resync has not landed in these seconds
+
+# order book depth
+ORDER_BOOK_MAX_DEPTH = 0  # levels kept sorted on each side, 0 keeps every level, otherwise at least 25 for checksum
+ORDER_BOOK_MAX_DEPTH_BY_INSTRUMENT = {}  # per instrument override of ORDER_BOOK_MAX_DEPTH, e.g. {"BTC-USDT": 50}
+ORDER_BOOK_MAX_OVERFLOW = 400  # levels kept beyond the max depth on each side, to re-promote when levels above go
+ORDER_BOOK_SNAPSHOT_DEPTH = 25  # levels on each side of the snapshot handed to the strategy thread
+ORDER_BOOK_SNAPSHOT_DEPTH_VIEW = False  # also copy the full depth arrays into each snapshot, see get_depth_view
+
+# risk prices
+RISK_PRICE_SOURCE = "rest"  # "rest": poll every spot ticker and mark price / "websocket": stream the tickers and
+# mark prices of the currencies and instruments held only
+RISK_PRICE_SUBSCRIBE_TIMEOUT_SEC = 5  # websocket: risk summary waits this long for newly subscribed prices
+# rest: refresh interval per instType, spot tickers for SPOT and mark prices for the others
+REST_MARKET_DATA_REFRESH_SEC = {"SPOT": 2, "MARGIN": 2, "SWAP": 2, "FUTURES": 2, "OPTION": 10}
+REST_MARKET_DATA_MAX_WORKERS = 5  # rest: fetches in flight concurrently, and kept alive connections
+REST_MARKET_DATA_RETRY_SEC = 10  # rest: retry a failed fetch after this long
+
+# update queue between the websocket threads and the strategy
+UPDATE_QUEUE_ENABLED = True  # strategy reads books, bbo, account and order updates handed over by the queue
+UPDATE_QUEUE_MAX_DEPTH = 10000  # warn once this many updates are pending, orders are never dropped
+
+# orders cache
+ORDERS_TERMINAL_GRACE_SEC = 60  # filled / canceled orders are archived this long after their last update
+ORDERS_MAX_CACHED = 10000  # above this, the oldest filled / canceled orders are archived right away
+ORDERS_ARCHIVE_SIZE = 10000  # archived orders kept, oldest dropped first
+
+# order gateway
+ORDER_ENTRY_CHANNEL = "websocket"  # "websocket": batch ops on the private websocket, falling back to REST / "rest"
+ORDER_GATEWAY_MAX_WORKERS = 4  # place, amend and cancel batches in flight concurrently over REST
+ORDER_GATEWAY_WS_TIMEOUT_SEC = 5  # a websocket batch without reply after this long has an unknown outcome
+ORDER_GATEWAY_CANCEL_ALL_TIMEOUT_SEC = 10  # cancel_all waits this long for the cancellations to complete
+ORDER_UNKNOWN_LOOKUP_SEC = 5  # an order whose request got no response is looked up over REST after this long
+
+# order rate limits, counted in orders, shared by websocket and REST order entry
+ORDER_RATE_LIMIT_WINDOW_SEC = 2
+ORDER_RATE_LIMIT_PER_INSTRUMENT = 300  # orders per window, per batch endpoint and instrument
+ORDER_RATE_LIMIT_PER_ACCOUNT = 1000  # new and amended orders per window, across endpoints and instruments
+
+# strategy run mode
+STRATEGY_RUN_MODE = "polling"  # "polling": a cycle every second / "event": a cycle as soon as updates of the
+# trading instrument book or bbo, orders, account or positions are queued, needs UPDATE_QUEUE_ENABLED
+STRATEGY_MIN_INTERVAL_SEC = 0.1  # event mode: minimum time between two decisions
+STRATEGY_DEBOUNCE_SEC = 0.01  # event mode: hold after the first update, so that a burst is decided on once
+STRATEGY_MAX_IDLE_SEC = 1  # event mode: run a cycle after this long without updates anyway
+STRATEGY_HOUSEKEEPING_INTERVAL_SEC = 1  # event mode: exchange status, params reload and risk summary interval
+
+# warm start
+WARM_START_ENABLED = True  # on start, adopt the open strategy orders and restore the inception checkpoint
+STRATEGY_CLIENT_ORDER_ID_PREFIX = "order"  # clOrdId prefix of the strategy orders, others are left alone
+WARM_START_PAGE_LIMIT = 100  # pending orders per REST page
+STRATEGY_CHECKPOINT_PATH = os.path.abspath(os.path.dirname(__file__) + "/../strategy_checkpoint.pkl")
+STRATEGY_CHECKPOINT_MAX_AGE_SEC = 86400  # an older checkpoint is ignored and a new inception snapshot is taken
+
+# instrument metadata
+INSTRUMENT_PRELOAD_INST_TYPES = ["SPOT", "MARGIN", "SWAP", "FUTURES"]  # listed on start, one call each, [] to skip
+INSTRUMENT_CACHE_PATH = os.path.abspath(os.path.dirname(__file__) + "/../instrument_cache.pkl")
+INSTRUMENT_CACHE_MAX_AGE_SEC = 3600  # an older cache file is ignored and the instruments listed again
+INSTRUMENT_REFRESH_SEC = 300  # list the instruments again this often, to pick up tick and lot size changes
+
+# market data journal
+JOURNAL_ENABLED = False  # record the websocket messages below to JOURNAL_DIRECTORY for offline replay
+JOURNAL_DIRECTORY = os.path.abspath(os.path.dirname(__file__) + "/../journal_data")
+JOURNAL_CHANNELS = ["books5", "books", "bbo-tbt", "books50-l2-tbt", "books-l2-tbt", "orders"]
+JOURNAL_MAX_FILE_MB = 256  # start a new journal file once the current one reaches this size
+JOURNAL_MAX_FILE_SEC = 3600  # start a new journal file once the current one is this old
+JOURNAL_CHUNK_MAX_RECORDS = 1000  # compress and write a chunk once it holds this many messages
+JOURNAL_CHUNK_MAX_DELAY_SEC = 1  # compress and write a chunk once its first message is this old
+
 # risk-free ccy
 RISK_FREE_CCY_LIST = ["USDT", "USDC", "DAI"]
 
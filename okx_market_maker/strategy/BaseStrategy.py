@@ -1,12 +1,13 @@
 import time
 import traceback
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 from typing import List, Dict, Tuple
 import logging
-from copy import deepcopy
 
 from okx.Status import StatusAPI
+from twisted.internet import reactor
 from okx_market_maker.market_data_service.model.Instrument import Instrument, InstState
 from okx_market_maker.market_data_service.model.Tickers import Tickers
 from okx_market_maker.position_management_service.model.Positions import Positions
@@ -18,18 +19,33 @@ from okx.Trade import TradeAPI
 from okx.Account import AccountAPI
 from okx_market_maker.settings import *
 from okx_market_maker import orders_container, order_books, account_container, positions_container, tickers_container, \
-    mark_px_container
+    mark_px_container, journal_recorder_container, best_bid_offers, update_queue_container, order_book_snapshots, \
+    order_gateway_container
 from okx_market_maker.strategy.model.StrategyOrder import StrategyOrder, StrategyOrderStatus
 from okx_market_maker.strategy.model.StrategyMeasurement import StrategyMeasurement
-from okx_market_maker.market_data_service.model.OrderBook import OrderBook
+from okx_market_maker.strategy.model.StrategyCheckpoint import StrategyCheckpoint
+from okx_market_maker.market_data_service.model.OrderBook import OrderBook, OrderBookSnapshot
+from okx_market_maker.market_data_service.model.BestBidOffer import BestBidOffer
+from okx_market_maker.market_data_service.model.DepthView import DepthView
 from okx_market_maker.position_management_service.model.Account import Account
 from okx_market_maker.order_management_service.model.Order import Orders, Order, OrderState, OrderSide
 from okx_market_maker.strategy.risk.RiskCalculator import RiskCalculator
-from okx_market_maker.market_data_service.WssMarketDataService import WssMarketDataService
-from okx_market_maker.order_management_service.WssOrderManagementService import WssOrderManagementService
-from okx_market_maker.position_management_service.WssPositionManagementService import WssPositionManagementService
+from okx_market_maker.market_data_service.WssMarketDataService import WssMarketDataService, ORDER_BOOK_CHANNELS, \
+    BBO_CHANNELS
+from okx_market_maker.order_management_service.WssOrderManagementService import WssOrderManagementService, \
+    seed_orders
+from okx_market_maker.order_management_service.OrderGateway import OrderGateway, OrderResponse, \
+    ORDER_NOT_EXIST_CODE
+from okx_market_maker.order_management_service.OrderRateLimiter import OrderRateLimiter, MAX_ORDERS_PER_BATCH
+from okx_market_maker.position_management_service.WssPositionManagementService import \
+    WssPositionManagementService, seed_positions
 from okx_market_maker.market_data_service.RESTMarketDataService import RESTMarketDataService
-from okx_market_maker.utils.OkxEnum import AccountConfigMode, TdMode, InstType
+from okx_market_maker.market_data_service.InstrumentMetadataService import InstrumentMetadataService
+from okx_market_maker.market_data_service.WssRiskPriceService import WssRiskPriceService
+from okx_market_maker.journal.JournalRecorder import JournalRecorder
+from okx_market_maker.utils.OkxEnum import AccountConfigMode, TdMode, InstType, OrderOp
+from okx_market_maker.utils.LatencyStats import LatencyStats
+from okx_market_maker.utils.UpdateQueue import UpdateQueue, QueuePolicy
 from okx_market_maker.utils.TdModeUtil import TdModeUtil
 
 
@@ -54,16 +70,48 @@ class BaseStrategy(ABC):
             url="wss://ws.okx.com:8443/ws/v5/public?brokerId=9999" if is_paper_trading
             else "wss://ws.okx.com:8443/ws/v5/public",
             inst_id=TRADING_INSTRUMENT_ID,
-            channel="books"
+            inst_ids=MARKET_DATA_INSTRUMENT_IDS,
+            channels=MARKET_DATA_CHANNELS
         )
         self.rest_mds = RESTMarketDataService(is_paper_trading)
+        self.instrument_service = InstrumentMetadataService(is_paper_trading)
+        if RISK_PRICE_SOURCE not in ["rest", "websocket"]:
+            raise ValueError(f"Invalid RISK_PRICE_SOURCE {RISK_PRICE_SOURCE}, expected rest or websocket.")
+        self.risk_price_service = WssRiskPriceService(
+            url="wss://ws.okx.com:8443/ws/v5/public?brokerId=9999" if is_paper_trading
+            else "wss://ws.okx.com:8443/ws/v5/public") if RISK_PRICE_SOURCE == "websocket" else None
+        self._strategy_order_dict = dict()
+        # the polling fallback needs the exchange orders of the strategy orders it has not reconciled yet
         self.oms = WssOrderManagementService(
             url="wss://ws.okx.com:8443/ws/v5/private?brokerId=9999" if is_paper_trading
-            else "wss://ws.okx.com:8443/ws/v5/private")
+            else "wss://ws.okx.com:8443/ws/v5/private", pinned_client_order_ids=self._strategy_order_dict)
         self.pms = WssPositionManagementService(
             url="wss://ws.okx.com:8443/ws/v5/private?brokerId=9999" if is_paper_trading
             else "wss://ws.okx.com:8443/ws/v5/private")
-        self._strategy_order_dict = dict()
+        self.journal_recorder = JournalRecorder() if JOURNAL_ENABLED else None
+        self.update_queue = UpdateQueue(
+            policies={**{channel: QueuePolicy.CONFLATE_LATEST for channel in ORDER_BOOK_CHANNELS + BBO_CHANNELS},
+                      "account": QueuePolicy.CONFLATE_LATEST, "positions": QueuePolicy.CONFLATE_LATEST,
+                      "orders": QueuePolicy.NEVER_DROP, "order_responses": QueuePolicy.NEVER_DROP},
+            max_depth=UPDATE_QUEUE_MAX_DEPTH) if UPDATE_QUEUE_ENABLED else None
+        self.order_gateway = OrderGateway(
+            self.trade_api, on_response=(lambda response: self.update_queue.put("order_responses", None, response))
+            if self.update_queue is not None else None,
+            ws_client=self.oms if ORDER_ENTRY_CHANNEL == "websocket" else None)
+        self.order_rate_limiter = OrderRateLimiter()
+        self._order_book_snapshots: Dict[str, OrderBookSnapshot] = {}
+        self._bbo_snapshots: Dict[str, BestBidOffer] = {}
+        self._queued_account: Account = None
+        self._queued_positions: Positions = None
+        if STRATEGY_RUN_MODE not in ["polling", "event"]:
+            raise ValueError(f"Invalid STRATEGY_RUN_MODE {STRATEGY_RUN_MODE}, expected polling or event.")
+        self.event_driven = STRATEGY_RUN_MODE == "event"
+        self.tick_to_decision_latency = LatencyStats()
+        self._tick_time = 0
+        self._last_cycle_time = 0
+        self._last_decision_time = 0
+        self._last_housekeeping_time = 0
+        self._deferred_cancel_orders: List[CancelOrderRequest] = []
         self.params_loader = ParamsLoader()
 
     @abstractmethod
@@ -96,14 +144,18 @@ class BaseStrategy(ABC):
                 sell_orders.append(strategy_order)
         return sorted(sell_orders, key=lambda x: float(x.price), reverse=False)
 
-    def place_orders(self, order_request_list: List[PlaceOrderRequest]):
+    def place_orders(self, order_request_list: List[PlaceOrderRequest]) -> List[PlaceOrderRequest]:
         """
         place order and cache strategy order, Maximum 20 orders can be placed per request
         :param order_request_list: https://www.okx.com/docs-v5/en/#rest-api-trade-place-multiple-orders
-        :return:
+        :return: requests not sent for lack of rate limit budget
         """
         order_data_list = []
+        deferred = []
         for order_request in order_request_list:
+            if not self.order_rate_limiter.try_acquire(OrderOp.BATCH_ORDER, order_request.inst_id):
+                deferred.append(order_request)
+                continue
             strategy_order = StrategyOrder(
                 inst_id=order_request.inst_id, ord_type=order_request.ord_type, side=order_request.side,
                 size=order_request.size,
@@ -115,25 +167,35 @@ class BaseStrategy(ABC):
             order_data_list.append(order_request.to_dict())
             print(f"PLACE ORDER {order_request.ord_type.value} {order_request.side.value} {order_request.inst_id} "
                   f"{order_request.size} @ {order_request.price}")
-            if len(order_data_list) >= 20:
+            if len(order_data_list) >= MAX_ORDERS_PER_BATCH:
                 self._place_orders(order_data_list)
                 order_data_list = []
         if order_data_list:
             self._place_orders(order_data_list)
+        return deferred
 
     def _place_orders(self, order_data_list: List[Dict]):
         """
-        Place order through REST API, check the individual order placing response,
+        Send one batch through the order gateway without waiting for the response
+        :param order_data_list: list of order requests' json
+        :return: None
+        """
+        future = self.order_gateway.place_orders(order_data_list)
+        for order_data in order_data_list:
+            self._strategy_order_dict[order_data['clOrdId']].request_future = future
+
+    def _on_place_orders_response(self, response: OrderResponse):
+        """
+        Check the individual order placing response,
         if successful, mark strategy orders as ACK
         if unsuccessful, delete the strategy orders from strategy order cache
-        :param order_data_list: list of order requests' json
+        :param response: OrderResponse of a place batch
         :return: None
         """
-        result = self.trade_api.place_multiple_orders(order_data_list)
+        result = response.result
         print(result)
-        time.sleep(2)
-        if result["code"] == '1':
-            for order_data in order_data_list:
+        if response.is_batch_failed():
+            for order_data in response.order_data_list:
                 client_order_id = order_data['clOrdId']
                 if client_order_id in self._strategy_order_dict:
                     del self._strategy_order_dict[client_order_id]
@@ -148,20 +210,27 @@ class BaseStrategy(ABC):
                     continue
                 strategy_order: StrategyOrder = self._strategy_order_dict[client_order_id]
                 strategy_order.order_id = single_order_data["ordId"]
-                strategy_order.strategy_order_status = StrategyOrderStatus.ACK
+                if strategy_order.strategy_order_status == StrategyOrderStatus.SENT:
+                    strategy_order.strategy_order_status = StrategyOrderStatus.ACK
 
-    def amend_orders(self, order_request_list: List[AmendOrderRequest]):
+    def amend_orders(self, order_request_list: List[AmendOrderRequest]) -> List[AmendOrderRequest]:
         """
         amend order and cache strategy order,  Maximum 20 orders can be amended per request
         :param order_request_list: https://www.okx.com/docs-v5/en/#rest-api-trade-amend-multiple-orders
-        :return:
+        :return: requests not sent for lack of rate limit budget
         """
         order_data_list = []
+        deferred = []
         for order_request in order_request_list:
             client_order_id = order_request.client_order_id
             if client_order_id not in self._strategy_order_dict:
                 continue
             strategy_order = self._strategy_order_dict[client_order_id]
+            if strategy_order.request_in_flight():
+                continue
+            if not self.order_rate_limiter.try_acquire(OrderOp.BATCH_AMEND, order_request.inst_id):
+                deferred.append(order_request)
+                continue
             if order_request.new_size:
                 strategy_order.size = order_request.new_size
             if order_request.new_price:
@@ -171,21 +240,31 @@ class BaseStrategy(ABC):
             print(f"AMEND ORDER {order_request.client_order_id} with new size {order_request.new_size} or new price "
                   f"{order_request.new_price}, req_id is {order_request.req_id}")
             order_data_list.append(order_request.to_dict())
-            if len(order_data_list) >= 20:
+            if len(order_data_list) >= MAX_ORDERS_PER_BATCH:
                 self._amend_orders(order_data_list)
                 order_data_list = []
         if order_data_list:
             self._amend_orders(order_data_list)
+        return deferred
 
     def _amend_orders(self, order_data_list: List[Dict]):
         """
-        Amend order through REST API, check the individual order amending response,
-        Mark strategy orders as AMD_ACK, the strategy order status will be further confirmed by OMS update.
+        Send one batch through the order gateway without waiting for the response
         :param order_data_list: list of order requests' json
         :return: None
         """
-        result = self.trade_api.amend_multiple_orders(order_data_list)
-        data = result['data']
+        future = self.order_gateway.amend_orders(order_data_list)
+        for order_data in order_data_list:
+            self._strategy_order_dict[order_data['clOrdId']].request_future = future
+
+    def _on_amend_orders_response(self, response: OrderResponse):
+        """
+        Check the individual order amending response, matched by clOrdId and the reqId of the latest amendment,
+        Mark strategy orders as AMD_ACK, the strategy order status will be further confirmed by OMS update.
+        :param response: OrderResponse of an amend batch
+        :return: None
+        """
+        data = response.result['data']
         for single_order_data in data:
             client_order_id = single_order_data["clOrdId"]
             if client_order_id not in self._strategy_order_dict:
@@ -193,58 +272,173 @@ class BaseStrategy(ABC):
             if single_order_data['sCode'] != '0':
                 continue
             strategy_order: StrategyOrder = self._strategy_order_dict[client_order_id]
-            strategy_order.strategy_order_status = StrategyOrderStatus.AMD_ACK
+            if single_order_data.get("reqId") != strategy_order.amend_req_id:
+                continue
+            if strategy_order.strategy_order_status == StrategyOrderStatus.AMD_SENT:
+                strategy_order.strategy_order_status = StrategyOrderStatus.AMD_ACK
 
-    def cancel_orders(self, order_request_list: List[CancelOrderRequest]):
+    def cancel_orders(self, order_request_list: List[CancelOrderRequest]) -> List[CancelOrderRequest]:
         """
-        cancel order and cache strategy order, Maximum 20 orders can be canceled per request
+        cancel order and cache strategy order, Maximum 20 orders can be canceled per request. An order with a
+        request in flight, or already being canceled, is skipped; a rejected cancel can be sent again.
         :param order_request_list: https://www.okx.com/docs-v5/en/#rest-api-trade-cancel-multiple-orders
-        :return:
+        :return: requests not sent for lack of rate limit budget
         """
         order_data_list = []
+        deferred = []
         for order_request in order_request_list:
             client_order_id = order_request.client_order_id
             if client_order_id not in self._strategy_order_dict:
                 continue
             strategy_order = self._strategy_order_dict[client_order_id]
+            if strategy_order.request_in_flight() or strategy_order.strategy_order_status in [
+                    StrategyOrderStatus.CXL_SENT, StrategyOrderStatus.CXL_ACK]:
+                continue
+            if not self.order_rate_limiter.try_acquire(OrderOp.BATCH_CANCEL, order_request.inst_id):
+                deferred.append(order_request)
+                continue
             strategy_order.strategy_order_status = StrategyOrderStatus.CXL_SENT
             print(f"CANCELING ORDER {order_request.client_order_id}")
             order_data_list.append(order_request.to_dict())
-            if len(order_data_list) >= 20:
+            if len(order_data_list) >= MAX_ORDERS_PER_BATCH:
                 self._cancel_orders(order_data_list)
                 order_data_list = []
         if order_data_list:
             self._cancel_orders(order_data_list)
+        return deferred
 
     def _cancel_orders(self, order_data_list: List[Dict]):
         """
-        Cancel order through REST API, check the individual order canceling response,
-        Mark strategy orders as CXL_ACK, the strategy order status will be further confirmed by OMS update.
+        Send one batch through the order gateway without waiting for the response
         :param order_data_list: list of order requests' json
         :return: None
         """
-        result = self.trade_api.cancel_multiple_orders(order_data_list)
-        data = result['data']
-        for single_order_data in data:
-            client_order_id = single_order_data["clOrdId"]
-            if client_order_id not in self._strategy_order_dict:
+        future = self.order_gateway.cancel_orders(order_data_list)
+        for order_data in order_data_list:
+            self._strategy_order_dict[order_data['clOrdId']].request_future = future
+
+    def _on_cancel_orders_response(self, response: OrderResponse):
+        """
+        Check the individual order canceling response,
+        Mark strategy orders as CXL_ACK, the strategy order status will be further confirmed by OMS update.
+        A rejected cancel puts the order back to LIVE / PARTIALLY_FILLED, so that it can be canceled again.
+        :param response: OrderResponse of a cancel batch
+        :return: None
+        """
+        acknowledged = {single_order_data["clOrdId"] for single_order_data in response.result.get('data') or []
+                        if single_order_data.get('sCode') == '0'}
+        for order_data in response.order_data_list:
+            strategy_order: StrategyOrder = self._strategy_order_dict.get(order_data['clOrdId'])
+            if strategy_order is None:
                 continue
-            if single_order_data['sCode'] != '0':
+            if order_data['clOrdId'] in acknowledged:
+                strategy_order.strategy_order_status = StrategyOrderStatus.CXL_ACK
+            elif strategy_order.strategy_order_status == StrategyOrderStatus.CXL_SENT:
+                strategy_order.strategy_order_status = StrategyOrderStatus.PARTIALLY_FILLED \
+                    if Decimal(strategy_order.filled_size or "0") else StrategyOrderStatus.LIVE
+
+    def _on_order_responses(self, responses: List[OrderResponse]):
+        """
+        Apply the order gateway responses on the strategy thread, in completion order
+        :param responses: List[OrderResponse]
+        """
+        for response in responses:
+            if response.op is None:
+                self._on_order_lookup_response(response)
                 continue
-            strategy_order: StrategyOrder = self._strategy_order_dict[client_order_id]
-            strategy_order.strategy_order_status = StrategyOrderStatus.CXL_ACK
+            if response.outcome_unknown:
+                self._on_unknown_outcome(response)
+                continue
+            if response.is_rate_limited():
+                self.order_rate_limiter.on_rate_limited(
+                    response.op, [order_data["instId"] for order_data in response.order_data_list])
+            if response.op == OrderOp.BATCH_ORDER:
+                self._on_place_orders_response(response)
+            elif response.op == OrderOp.BATCH_AMEND:
+                self._on_amend_orders_response(response)
+            elif response.op == OrderOp.BATCH_CANCEL:
+                self._on_cancel_orders_response(response)
+
+    def _on_unknown_outcome(self, response: OrderResponse):
+        """
+        A batch without response may or may not have been processed by the exchange: its strategy orders are kept
+        as UNKNOWN, so that their orders channel updates are still applied and cancel_all still cancels them, until
+        an update or the lookup in _resolve_unknown_orders tells their state.
+        :param response: OrderResponse with outcome_unknown
+        """
+        logging.warning(f"{response.op.value} outcome unknown: {response.result.get('msg')}")
+        now = time.time()
+        for order_data in response.order_data_list:
+            strategy_order = self._strategy_order_dict.get(order_data.get("clOrdId"))
+            if strategy_order is None:
+                continue
+            strategy_order.strategy_order_status = StrategyOrderStatus.UNKNOWN
+            strategy_order.unknown_since = now
+
+    def _resolve_unknown_orders(self):
+        """
+        Look up through the order gateway the UNKNOWN strategy orders the orders channel said nothing about for
+        ORDER_UNKNOWN_LOOKUP_SEC, without waiting for the responses.
+        """
+        now = time.time()
+        for client_order_id, strategy_order in self._strategy_order_dict.items():
+            if strategy_order.strategy_order_status != StrategyOrderStatus.UNKNOWN or \
+                    now - strategy_order.unknown_since < ORDER_UNKNOWN_LOOKUP_SEC or strategy_order.request_in_flight():
+                continue
+            strategy_order.unknown_since = now  # looked up again ORDER_UNKNOWN_LOOKUP_SEC later if still unknown
+            strategy_order.request_future = self.order_gateway.get_order(strategy_order.inst_id, client_order_id)
+
+    def _on_order_lookup_response(self, response: OrderResponse):
+        """
+        Apply the lookup of an UNKNOWN strategy order. An order the exchange does not know was never placed, and is
+        forgotten; a failed lookup is retried.
+        :param response: OrderResponse without op
+        """
+        client_order_id = response.order_data_list[0]["clOrdId"]
+        strategy_order = self._strategy_order_dict.get(client_order_id)
+        if strategy_order is None or strategy_order.strategy_order_status != StrategyOrderStatus.UNKNOWN:
+            return
+        result = response.result
+        if result.get("code") == ORDER_NOT_EXIST_CODE:
+            del self._strategy_order_dict[client_order_id]
+            return
+        if result.get("code") != "0" or not result.get("data"):
+            logging.warning(f"Failed to look up order {client_order_id}: {result}")
+            return
+        exchange_order = Order.init_from_json(result["data"][0])
+        strategy_order.order_id = exchange_order.ord_id
+        # every fill of the order, those already recorded from the orders channel are skipped by tradeId
+        for fill in result.get("fills", []):
+            self._strategy_measurement.consume_fill(Order.init_from_json({
+                **result["data"][0], "tradeId": fill["tradeId"], "fillSz": fill["fillSz"], "fillPx": fill["fillPx"],
+                "fillFee": fill.get("fee", "0"), "fillTime": fill.get("fillTime") or fill.get("ts")}))
+        self._strategy_measurement.consume_fill(exchange_order)
+        self._apply_exchange_order(client_order_id, strategy_order, exchange_order)
 
     def cancel_all(self):
         """
-        Canceling all existing strategy orders
+        Canceling all existing strategy orders, and wait for the cancellations to complete
         :return:
         """
-        to_cancel = []
-        for cid, strategy_order in self._strategy_order_dict.items():
-            inst_id = strategy_order.inst_id
-            cancel_req = CancelOrderRequest(inst_id=inst_id, client_order_id=cid)
-            to_cancel.append(cancel_req)
-        self.cancel_orders(to_cancel)
+        deadline = time.time() + ORDER_GATEWAY_CANCEL_ALL_TIMEOUT_SEC
+        to_cancel = list(self._strategy_order_dict)
+        while to_cancel:
+            # an order with a place / amend in flight is canceled once its response is in
+            waiting = [cid for cid in to_cancel if cid in self._strategy_order_dict and
+                       self._strategy_order_dict[cid].request_in_flight() and
+                       self._strategy_order_dict[cid].strategy_order_status != StrategyOrderStatus.CXL_SENT]
+            deferred = self.cancel_orders([
+                CancelOrderRequest(inst_id=self._strategy_order_dict[cid].inst_id, client_order_id=cid)
+                for cid in to_cancel if cid in self._strategy_order_dict and cid not in waiting])
+            to_cancel = waiting + [order_request.client_order_id for order_request in deferred]
+            if not to_cancel or time.time() >= deadline:
+                break
+            time.sleep(0.1)
+            self._drain_updates()
+        if not self.order_gateway.wait_all(max(deadline - time.time(), 0)):
+            logging.warning(f"{self.order_gateway.in_flight_count()} order requests still in flight after "
+                            f"{ORDER_GATEWAY_CANCEL_ALL_TIMEOUT_SEC} seconds!")
+        self._drain_updates()
 
     def decide_td_mode(self, instrument: Instrument) -> TdMode:
         """
@@ -259,26 +453,71 @@ class BaseStrategy(ABC):
         """
         return TdModeUtil.decide_trading_mode(self._account_mode, instrument.inst_type, TRADING_MODE)
 
-    @staticmethod
-    def get_order_book() -> OrderBook:
+    def get_order_book(self) -> OrderBookSnapshot:
         """
-        Fetch order book object of the TRADING_INSTRUMENT_ID
-        :return: OrderBook
+        Fetch the latest snapshot of the top levels of the TRADING_INSTRUMENT_ID order book, as handed over by the
+        update queue, or else as last published by the websocket thread. A snapshot is never modified and holds
+        ORDER_BOOK_SNAPSHOT_DEPTH levels on each side, the full depth stays in order_books, read it with
+        get_depth_view.
+        :return: OrderBookSnapshot
         """
-        if TRADING_INSTRUMENT_ID not in order_books:
+        if self.update_queue is not None:
+            if TRADING_INSTRUMENT_ID not in self._order_book_snapshots:
+                raise ValueError(f"{TRADING_INSTRUMENT_ID} not ready in order books update queue!")
+            return self._order_book_snapshots[TRADING_INSTRUMENT_ID]
+        if TRADING_INSTRUMENT_ID not in order_book_snapshots:
             raise ValueError(f"{TRADING_INSTRUMENT_ID} not ready in order books cache!")
-        order_book: OrderBook = order_books[TRADING_INSTRUMENT_ID]
+        order_book: OrderBookSnapshot = order_book_snapshots[TRADING_INSTRUMENT_ID]
         return order_book
 
-    @staticmethod
-    def get_account() -> Account:
+    def get_depth_view(self) -> DepthView:
+        """
+        Fetch the full depth arrays of the TRADING_INSTRUMENT_ID order book, copied into the latest snapshot on the
+        websocket thread, so they can be read here while the book is updated. Needs ORDER_BOOK_SNAPSHOT_DEPTH_VIEW.
+        :return: DepthView
+        """
+        return self.get_order_book().depth_view()
+
+    def get_bbo(self) -> BestBidOffer:
+        """
+        Fetch the latest bbo-tbt tick of the TRADING_INSTRUMENT_ID, with its exchange and local receive timestamps
+        :return: BestBidOffer
+        """
+        if self.update_queue is not None:
+            if TRADING_INSTRUMENT_ID not in self._bbo_snapshots:
+                raise ValueError(f"{TRADING_INSTRUMENT_ID} not ready in best bid offers update queue!")
+            return self._bbo_snapshots[TRADING_INSTRUMENT_ID]
+        if TRADING_INSTRUMENT_ID not in best_bid_offers:
+            raise ValueError(f"{TRADING_INSTRUMENT_ID} not ready in best bid offers cache!")
+        bbo: BestBidOffer = best_bid_offers[TRADING_INSTRUMENT_ID]
+        return bbo
+
+    def uses_bbo(self) -> bool:
+        return any(channel in BBO_CHANNELS for channel in self.mds.channels)
+
+    def uses_order_book(self) -> bool:
+        return any(channel in ORDER_BOOK_CHANNELS for channel in self.mds.channels)
+
+    def get_account(self) -> Account:
+        if self.update_queue is not None:
+            if self._queued_account is None:
+                raise ValueError(f"account information not ready in update queue!")
+            return self._queued_account
         if not account_container:
             raise ValueError(f"account information not ready in accounts cache!")
         account: Account = account_container[0]
         return account
 
-    @staticmethod
-    def get_positions() -> Positions:
+    def get_positions(self) -> Positions:
+        """
+        Fetch the latest Positions, as handed over by the update queue, or else as last published by the websocket
+        thread. A published Positions is never modified.
+        :return: Positions
+        """
+        if self.update_queue is not None:
+            if self._queued_positions is None:
+                raise ValueError(f"positions information not ready in update queue!")
+            return self._queued_positions
         if not positions_container:
             raise ValueError(f"positions information not ready in accounts cache!")
         positions: Positions = positions_container[0]
@@ -293,70 +532,203 @@ class BaseStrategy(ABC):
 
     @staticmethod
     def get_orders() -> Orders:
+        """
+        The websocket thread publishes every update as a new Orders version, so the current one is returned as
+        is, and must be treated as read-only.
+        :return: Orders
+        """
         if not orders_container:
             raise ValueError(f"order information not ready in orders cache!")
         orders: Orders = orders_container[0]
-        return deepcopy(orders)
+        return orders
+
+    def _drain_updates(self):
+        """
+        Take over everything the websocket and order gateway threads queued since the last cycle: the latest book
+        snapshot, bbo and account of each key, and every order gateway response and order update in arrival order.
+        The queue time of the earliest update relevant to the trading instrument is kept as the tick the next
+        decision is measured from.
+        """
+        self.order_gateway.expire_ws_requests()
+        if self.update_queue is None:
+            self._on_order_responses(self.order_gateway.drain_responses())
+            return
+        order_data_list = []
+        order_responses = []
+        for event in self.update_queue.drain():
+            if event.key in (TRADING_INSTRUMENT_ID, None) and \
+                    (not self._tick_time or event.enqueue_time < self._tick_time):
+                self._tick_time = event.enqueue_time
+            if event.channel in ORDER_BOOK_CHANNELS:
+                self._order_book_snapshots[event.key] = event.payload
+            elif event.channel in BBO_CHANNELS:
+                self._bbo_snapshots[event.key] = event.payload
+            elif event.channel == "account":
+                self._queued_account = event.payload
+            elif event.channel == "positions":
+                self._queued_positions = event.payload
+            elif event.channel == "orders":
+                order_data_list += event.payload
+            elif event.channel == "order_responses":
+                order_responses.append(event.payload)
+        if order_responses:
+            self._on_order_responses(order_responses)
+        if order_data_list:
+            self._reconcile_order_updates(order_data_list)
+            self.on_order_updates(order_data_list)
+
+    def _wait_for_update(self) -> bool:
+        """
+        Event driven mode: block until an update relevant to the trading instrument is queued, or until
+        STRATEGY_MAX_IDLE_SEC passed since the last cycle. After an update, hold for STRATEGY_DEBOUNCE_SEC so that
+        a burst is decided on once, and keep STRATEGY_MIN_INTERVAL_SEC between two decisions.
+        :return: whether a relevant update is pending
+        """
+        idle_deadline = self._last_cycle_time + STRATEGY_MAX_IDLE_SEC
+        while not self._tick_time:
+            timeout = idle_deadline - time.time()
+            if timeout <= 0:
+                return False
+            if self.update_queue.wait(timeout):
+                self._drain_updates()
+        hold_sec = max(STRATEGY_DEBOUNCE_SEC, self._last_decision_time + STRATEGY_MIN_INTERVAL_SEC - time.time())
+        time.sleep(hold_sec)
+        return True
+
+    def _housekeeping_due(self) -> bool:
+        if not self.event_driven or time.time() - self._last_housekeeping_time >= STRATEGY_HOUSEKEEPING_INTERVAL_SEC:
+            self._last_housekeeping_time = time.time()
+            return True
+        return False
+
+    def _send_order_requests(self, place_order_list: List[PlaceOrderRequest],
+                             amend_order_list: List[AmendOrderRequest], cancel_order_list: List[CancelOrderRequest]):
+        """
+        Send the requests of a decision, cancels deferred in the previous cycle first. Cancels take the rate limit
+        budget first, then amendments, then new orders, and the requests left without budget are handed to
+        on_deferred_requests.
+        """
+        cancel_ids = {order_request.client_order_id for order_request in cancel_order_list}
+        cancel_order_list = [order_request for order_request in self._deferred_cancel_orders
+                             if order_request.client_order_id not in cancel_ids] + cancel_order_list
+        self._deferred_cancel_orders = []
+        deferred_cancels = self.cancel_orders(cancel_order_list)
+        deferred_amends = self.amend_orders(amend_order_list)
+        deferred_places = self.place_orders(place_order_list)
+        if deferred_cancels or deferred_amends or deferred_places:
+            print(f"{len(deferred_cancels) + len(deferred_amends) + len(deferred_places)} order requests deferred by "
+                  f"the order rate limiter")
+            self.on_deferred_requests(deferred_places, deferred_amends, deferred_cancels)
+
+    def on_deferred_requests(self, place_order_list: List[PlaceOrderRequest],
+                             amend_order_list: List[AmendOrderRequest], cancel_order_list: List[CancelOrderRequest]):
+        """
+        Called on the strategy thread with the requests of a decision the order rate limiter had no budget for.
+        By default the cancels are sent again ahead of the next decision, placements and amendments are dropped and
+        left to the next decision, taken on newer market data.
+        :param place_order_list: deferred placements
+        :param amend_order_list: deferred amendments
+        :param cancel_order_list: deferred cancels
+        """
+        self._deferred_cancel_orders = cancel_order_list
+
+    def on_order_updates(self, order_data_list: List[Dict]):
+        """
+        Called on the strategy thread with every order update pushed since the last cycle, in arrival order.
+        :param order_data_list: "data" items of the orders channel
+        """
+        pass
 
     def _health_check(self) -> bool:
+        if self.uses_bbo():
+            try:
+                bbo: BestBidOffer = self.get_bbo()
+            except ValueError:
+                return False
+            bbo_delay = time.time() - bbo.timestamp / 1000
+            if bbo_delay > ORDER_BOOK_DELAYED_SEC:
+                logging.warning(f"{TRADING_INSTRUMENT_ID} delayed in best bid offers cache for {bbo_delay:.2f} seconds!")
+                return False
+        if self.uses_order_book() and not self._order_book_health_check():
+            return False
+        try:
+            account = self.get_account()
+        except ValueError:
+            return False
+        account_delay = time.time() - account.u_time / 1000
+        if account_delay > ACCOUNT_DELAYED_SEC:
+            logging.warning(f"Account info delayed in accounts cache for {account_delay:.2f} seconds!")
+            return False
+        return True
+
+    def _order_book_health_check(self) -> bool:
         try:
-            order_book: OrderBook = self.get_order_book()
+            order_book: OrderBookSnapshot = self.get_order_book()
         except ValueError:
             return False
         order_book_delay = time.time() - order_book.timestamp / 1000
         if order_book_delay > ORDER_BOOK_DELAYED_SEC:
             logging.warning(f"{TRADING_INSTRUMENT_ID} delayed in order books cache for {order_book_delay:.2f} seconds!")
             return False
+        if order_book.stale:
+            logging.warning(f"{TRADING_INSTRUMENT_ID} orderbook is stale, waiting for the re-subscribed snapshot!")
+            self.mds.resync_instrument(TRADING_INSTRUMENT_ID)
+            return False
         check_sum_result: bool = order_book.do_check_sum()
         if not check_sum_result:
-            logging.warning(f"{TRADING_INSTRUMENT_ID} orderbook checksum failed, re-subscribe MDS!")
-            self.mds.stop_service()
-            self.mds.run_service()
-            return False
-        try:
-            account = self.get_account()
-        except ValueError:
-            return False
-        account_delay = time.time() - account.u_time / 1000
-        if account_delay > ACCOUNT_DELAYED_SEC:
-            logging.warning(f"Account info delayed in accounts cache for {account_delay:.2f} seconds!")
+            logging.warning(f"{TRADING_INSTRUMENT_ID} orderbook checksum failed, re-subscribe {TRADING_INSTRUMENT_ID}!")
+            self.mds.resync_instrument(TRADING_INSTRUMENT_ID)
             return False
         return True
 
+    def _reconcile_order_updates(self, order_data_list: List[Dict]):
+        """
+        Push based reconciliation: only the strategy orders named in the orders channel updates are touched, in
+        arrival order, and a fill is recorded in the fill ledger once per tradeId, however many updates carry it.
+        :param order_data_list: "data" items of the orders channel
+        """
+        for order_data in order_data_list:
+            client_order_id = order_data.get("clOrdId")
+            strategy_order = self._strategy_order_dict.get(client_order_id)
+            if strategy_order is None:
+                continue
+            exchange_order = Order.init_from_json(order_data)
+            self._strategy_measurement.consume_fill(exchange_order)
+            self._apply_exchange_order(client_order_id, strategy_order, exchange_order)
+
     def _update_strategy_order_status(self):
+        """
+        Full scan of the strategy orders against the orders cache, used when the update queue is disabled and order
+        updates are not delivered to the strategy thread.
+        """
         orders_cache: Orders = self.get_orders()
         order_not_found_in_cache = {}
-        order_to_remove_from_cache = []
         for client_order_id in self._strategy_order_dict.copy():
             exchange_order: Order = orders_cache.get_order_by_client_order_id(client_order_id=client_order_id)
             strategy_order = self._strategy_order_dict[client_order_id]
             if not exchange_order:
                 order_not_found_in_cache[client_order_id] = strategy_order
-
+                continue
             filled_size_from_update = Decimal(exchange_order.acc_fill_sz) - Decimal(strategy_order.filled_size)
-            side_flag = 1 if exchange_order.side == OrderSide.BUY else -1
-            self._strategy_measurement.net_filled_qty += filled_size_from_update * side_flag
-            self._strategy_measurement.trading_volume += filled_size_from_update
-            if side_flag == 1:
-                self._strategy_measurement.buy_filled_qty += filled_size_from_update
-            else:
-                self._strategy_measurement.sell_filled_qty += filled_size_from_update
-            if exchange_order.state == OrderState.LIVE:
-                strategy_order.strategy_order_status = StrategyOrderStatus.LIVE
-
-            if exchange_order.state == OrderState.PARTIALLY_FILLED:
-                strategy_order.strategy_order_status = StrategyOrderStatus.PARTIALLY_FILLED
-                strategy_order.filled_size = exchange_order.acc_fill_sz
-                strategy_order.avg_fill_price = exchange_order.fill_px
-
-            if exchange_order.state == OrderState.CANCELED or exchange_order.state == OrderState.FILLED:
-                del self._strategy_order_dict[client_order_id]
-                order_to_remove_from_cache.append(exchange_order)
-
-        orders_cache.remove_orders(order_to_remove_from_cache)
+            if filled_size_from_update:
+                self._strategy_measurement.add_filled_qty(exchange_order.side, filled_size_from_update)
+            self._apply_exchange_order(client_order_id, strategy_order, exchange_order)
+
         if order_not_found_in_cache:
             logging.warning(f"Strategy Orders not found in order cache: {order_not_found_in_cache}")
 
+    def _apply_exchange_order(self, client_order_id: str, strategy_order: StrategyOrder, exchange_order: Order):
+        if exchange_order.state == OrderState.LIVE:
+            strategy_order.strategy_order_status = StrategyOrderStatus.LIVE
+
+        if exchange_order.state == OrderState.PARTIALLY_FILLED:
+            strategy_order.strategy_order_status = StrategyOrderStatus.PARTIALLY_FILLED
+            strategy_order.filled_size = exchange_order.acc_fill_sz
+            strategy_order.avg_fill_price = exchange_order.fill_px
+
+        if exchange_order.state == OrderState.CANCELED or exchange_order.state == OrderState.FILLED:
+            del self._strategy_order_dict[client_order_id]
+
     def get_params(self):
         self.params_loader.load_params()
 
@@ -370,6 +742,34 @@ class BaseStrategy(ABC):
         mark_px_cache = mark_px_container[0]
         risk_snapshot = RiskCalculator.generate_risk_snapshot(account, positions, tickers, mark_px_cache)
         self._strategy_measurement.consume_risk_snapshot(risk_snapshot)
+        checkpoint = self._strategy_measurement.to_checkpoint() if WARM_START_ENABLED else None
+        if checkpoint is not None:
+            try:
+                checkpoint.save(STRATEGY_CHECKPOINT_PATH)
+            except OSError:
+                logging.warning(f"Failed to save strategy checkpoint: {traceback.format_exc()}")
+        if self.order_gateway.stats.send_to_ack:
+            print(f"Order send to ack: {self.order_gateway.send_to_ack_summary()}")
+        if self.risk_price_service is None:
+            print(f"Market data REST fetch: {self.rest_mds.fetch_summary()}")
+
+    def _update_risk_price_subscriptions(self):
+        """
+        Streaming risk prices: follow the currencies and instruments held, the trading instrument, and the
+        instruments held at inception, which the P&L since inception is still priced with.
+        """
+        if self.risk_price_service is None:
+            return
+        try:
+            account = self.get_account()
+        except ValueError:
+            account = None
+        try:
+            positions = self.get_positions()
+        except ValueError:
+            positions = None
+        self.risk_price_service.update_subscriptions(
+            account, positions, [TRADING_INSTRUMENT_ID] + self._strategy_measurement.inception_inst_ids())
 
     def check_status(self):
         status_response = self.status_api.status("ongoing")
@@ -384,14 +784,91 @@ class BaseStrategy(ABC):
             self._account_mode = AccountConfigMode(int(account_config.get("data")[0]['acctLv']))
 
     def _run_exchange_connection(self):
+        if self.journal_recorder is not None:
+            self.journal_recorder.start()
+            journal_recorder_container.append(self.journal_recorder)
+        if self.update_queue is not None:
+            update_queue_container.append(self.update_queue)
+        order_gateway_container.append(self.order_gateway)
         self.mds.start()
         self.oms.start()
         self.pms.start()
-        self.rest_mds.start()
+        if self.instrument_service.inst_types:
+            self.instrument_service.start()
+        if self.risk_price_service is None:
+            self.rest_mds.start()
+        else:
+            self.risk_price_service.start()
         self.mds.run_service()
         self.oms.run_service()
         self.pms.run_service()
 
+    def warm_start(self):
+        """
+        Pick up where a previous run of the strategy left off: restore the checkpointed inception risk snapshot, and
+        adopt the open orders of the trading instrument whose clOrdId starts with STRATEGY_CLIENT_ORDER_ID_PREFIX,
+        so that they are amended or canceled by the strategy instead of being left resting. Pending orders, page by
+        page, and positions are fetched over REST concurrently, and seed the orders and positions caches with the
+        entries the websockets have not pushed a newer update of.
+
+        Runs once the websockets are subscribed: order updates queued meanwhile are applied to the adopted orders
+        by the first cycle.
+        """
+        checkpoint = StrategyCheckpoint.load(STRATEGY_CHECKPOINT_PATH, TRADING_INSTRUMENT_ID,
+                                             STRATEGY_CHECKPOINT_MAX_AGE_SEC)
+        if checkpoint is not None:
+            self._strategy_measurement.restore_checkpoint(checkpoint)
+            saved_time_string = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(checkpoint.saved_time))
+            print(f"Restored strategy checkpoint saved at {saved_time_string}")
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="WarmStart") as executor:
+            pending_orders_future = executor.submit(self._fetch_pending_orders, TRADING_INSTRUMENT_ID)
+            positions_future = executor.submit(self.account_api.get_positions)
+            pending_orders = pending_orders_future.result()
+            positions_response = positions_future.result()
+        if positions_response.get("code") == "0":
+            reactor.callFromThread(seed_positions, positions_response.get("data", []))
+        else:
+            logging.warning(f"Failed to fetch positions on warm start: {positions_response}")
+        if pending_orders:
+            reactor.callFromThread(seed_orders, pending_orders)
+        adopted = self._adopt_pending_orders(pending_orders)
+        print(f"Warm start in {time.time() - start:.2f} seconds: {len(pending_orders)} pending orders, "
+              f"{adopted} adopted as strategy orders")
+
+    def _fetch_pending_orders(self, inst_id: str) -> List[Dict]:
+        pending_orders = []
+        after = ""
+        while 1:
+            json_response = self.trade_api.get_order_list(instId=inst_id, after=after,
+                                                          limit=str(WARM_START_PAGE_LIMIT))
+            if json_response.get("code") != "0":
+                raise ValueError(f"Failed to fetch pending orders of {inst_id}: {json_response}")
+            data = json_response.get("data", [])
+            pending_orders += data
+            if len(data) < WARM_START_PAGE_LIMIT:
+                return pending_orders
+            after = data[-1]["ordId"]
+
+    def _adopt_pending_orders(self, pending_orders: List[Dict]) -> int:
+        instrument = InstrumentUtil.get_instrument(TRADING_INSTRUMENT_ID, self.trading_instrument_type)
+        adopted = 0
+        for order_data in pending_orders:
+            client_order_id = order_data.get("clOrdId", "")
+            if not client_order_id.startswith(STRATEGY_CLIENT_ORDER_ID_PREFIX) \
+                    or client_order_id in self._strategy_order_dict:
+                continue
+            order = Order.init_from_json(order_data)
+            self._strategy_order_dict[client_order_id] = StrategyOrder(
+                inst_id=order.inst_id, ord_type=order.ord_type, side=order.side, size=order_data["sz"],
+                price=InstrumentUtil.price_trim_by_tick_sz(order.px, order.side, instrument),
+                client_order_id=client_order_id, order_id=order.ord_id,
+                strategy_order_status=StrategyOrderStatus.PARTIALLY_FILLED
+                if order.state == OrderState.PARTIALLY_FILLED else StrategyOrderStatus.LIVE,
+                filled_size=order.acc_fill_sz, avg_fill_price=order.avg_px)
+            adopted += 1
+        return adopted
+
     def trading_instrument_type(self) -> InstType:
         guessed_inst_type = InstrumentUtil.get_inst_type_from_inst_id(TRADING_INSTRUMENT_ID)
         if guessed_inst_type == InstType.SPOT:
@@ -412,36 +889,62 @@ class BaseStrategy(ABC):
                                                          trading_instrument_type=trading_instrument_type)
 
     def run(self):
+        try:
+            self.instrument_service.preload()
+        except Exception:
+            logging.warning(f"Instrument preload failed, fetching instruments on first use: {traceback.format_exc()}")
         self._set_account_config()
         self.trading_instrument_type = self.trading_instrument_type()
         InstrumentUtil.get_instrument(TRADING_INSTRUMENT_ID, self.trading_instrument_type)
         self.set_strategy_measurement(trading_instrument=TRADING_INSTRUMENT_ID,
                                       trading_instrument_type=self.trading_instrument_type)
         self._run_exchange_connection()
+        if WARM_START_ENABLED:
+            try:
+                self.warm_start()
+            except Exception:
+                logging.warning(f"Warm start failed, starting without the previous orders: {traceback.format_exc()}")
+        if self.event_driven and self.update_queue is None:
+            logging.warning("Event driven run mode needs UPDATE_QUEUE_ENABLED, falling back to polling.")
+            self.event_driven = False
         while 1:
             try:
-                exchange_normal = self.check_status()
-                if not exchange_normal:
-                    raise ValueError("There is a ongoing maintenance in OKX.")
-                self.get_params()
+                if self.event_driven:
+                    self._wait_for_update()
+                self._last_cycle_time = time.time()
+                housekeeping_due = self._housekeeping_due()
+                if housekeeping_due:
+                    exchange_normal = self.check_status()
+                    if not exchange_normal:
+                        raise ValueError("There is a ongoing maintenance in OKX.")
+                    self.get_params()
+                self._drain_updates()
                 result = self._health_check()
-                self.risk_summary()
+                if housekeeping_due:
+                    self._resolve_unknown_orders()
+                    self._update_risk_price_subscriptions()
+                if housekeeping_due and (self.risk_price_service is None or self.risk_price_service.prices_ready()):
+                    self.risk_summary()
                 if not result:
                     print(f"Health Check result is {result}")
                     time.sleep(5)
                     continue
                 # summary
-                self._update_strategy_order_status()
+                if self.update_queue is None:
+                    self._update_strategy_order_status()
                 place_order_list, amend_order_list, cancel_order_list = self.order_operation_decision()
+                self._last_decision_time = time.time()
+                if self._tick_time:
+                    self.tick_to_decision_latency.record_since(self._tick_time, self._last_decision_time)
+                    self._tick_time = 0
                 # print(place_order_list)
                 # print(amend_order_list)
                 # print(cancel_order_list)
 
-                self.place_orders(place_order_list)
-                self.amend_orders(amend_order_list)
-                self.cancel_orders(cancel_order_list)
+                self._send_order_requests(place_order_list, amend_order_list, cancel_order_list)
 
-                time.sleep(1)
+                if not self.event_driven:
+                    time.sleep(1)
             except:
                 print(traceback.format_exc())
                 try:
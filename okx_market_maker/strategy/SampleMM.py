@@ -4,10 +4,12 @@ from decimal import Decimal
 from typing import Tuple, List
 
 from okx_market_maker.market_data_service.model.Instrument import Instrument
-from okx_market_maker.market_data_service.model.OrderBook import OrderBook
+from okx_market_maker.market_data_service.model.BestBidOffer import BestBidOffer
+from okx_market_maker.market_data_service.model.OrderBook import OrderBook, OrderBookSnapshot
 from okx_market_maker.order_management_service.model.OrderRequest import PlaceOrderRequest, AmendOrderRequest, \
     CancelOrderRequest
-from okx_market_maker.strategy.BaseStrategy import BaseStrategy, StrategyOrder, TRADING_INSTRUMENT_ID
+from okx_market_maker.strategy.BaseStrategy import BaseStrategy, StrategyOrder, TRADING_INSTRUMENT_ID, \
+    STRATEGY_CLIENT_ORDER_ID_PREFIX
 from okx_market_maker.utils.InstrumentUtil import InstrumentUtil
 from okx_market_maker.utils.OkxEnum import TdMode, OrderSide, OrderType, PosSide, InstType
 from okx_market_maker.utils.WsOrderUtil import get_request_uuid
@@ -23,15 +25,18 @@ class SampleMM(BaseStrategy):
         Custom Market Making Logic -> propose a group of market making orders
         :return:
         """
-        order_book: OrderBook = self.get_order_book()
-        bid_level = order_book.bid_by_level(1)
-        ask_level = order_book.ask_by_level(1)
-        if not bid_level and not ask_level:
+        if self.uses_bbo():
+            bbo: BestBidOffer = self.get_bbo()
+            bid_price, ask_price = bbo.bid_price, bbo.ask_price
+        else:
+            order_book: OrderBookSnapshot = self.get_order_book()
+            bid_price, ask_price = order_book.bid_by_level(1).price, order_book.ask_by_level(1).price
+        if not bid_price and not ask_price:
             raise ValueError("Empty order book!")
-        if bid_level and not ask_level:
-            ask_level = order_book.bid_by_level(1)
-        if ask_level and not bid_level:
-            bid_level = order_book.ask_by_level(1)
+        if bid_price and not ask_price:
+            ask_price = bid_price
+        if ask_price and not bid_price:
+            bid_price = ask_price
         instrument = InstrumentUtil.get_instrument(TRADING_INSTRUMENT_ID, self.trading_instrument_type)
         step_pct = self.params_loader.get_strategy_params("step_pct")
         num_of_order_each_side = self.params_loader.get_strategy_params("num_of_order_each_side")
@@ -49,9 +54,9 @@ class SampleMM(BaseStrategy):
         if strategy_measurement.net_filled_qty < 0:
             sell_num_of_order_each_side *= max(1 + strategy_measurement.net_filled_qty / max_net_sell, 0)
             sell_num_of_order_each_side = math.ceil(sell_num_of_order_each_side)
-        proposed_buy_orders = [(bid_level.price * (1 - step_pct * (i + 1)), single_order_size)
+        proposed_buy_orders = [(bid_price * (1 - step_pct * (i + 1)), single_order_size)
                                for i in range(buy_num_of_order_each_side)]
-        proposed_sell_orders = [(ask_level.price * (1 + step_pct * (i + 1)), single_order_size)
+        proposed_sell_orders = [(ask_price * (1 + step_pct * (i + 1)), single_order_size)
                                 for i in range(sell_num_of_order_each_side)]
 
         proposed_buy_orders = [(InstrumentUtil.price_trim_by_tick_sz(price_qty[0], OrderSide.BUY, instrument),
@@ -100,7 +105,7 @@ class SampleMM(BaseStrategy):
                     ord_type=OrderType.LIMIT,
                     size=size,
                     price=price,
-                    client_order_id=get_request_uuid("order"),
+                    client_order_id=get_request_uuid(STRATEGY_CLIENT_ORDER_ID_PREFIX),
                     pos_side=PosSide.net,
                     ccy=(instrument.base_ccy if side == OrderSide.BUY else instrument.quote_ccy)
                     if instrument.inst_type == InstType.MARGIN else ""
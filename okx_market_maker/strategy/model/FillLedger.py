@@ -0,0 +1,144 @@
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+import numpy as np
+
+from okx_market_maker.utils.OkxEnum import OrderSide
+
+
+@dataclass(frozen=True)
+class FillWindow:
+    count: int = 0
+    buy_qty: float = 0
+    sell_qty: float = 0
+    net_qty: float = 0
+    volume: float = 0
+    vwap: float = 0
+    realized_pnl: float = 0
+    fees: float = 0
+
+
+class FillLedger:
+    """
+    Append-only ledger of the strategy fills, one row per tradeId, in arrival order. Rows live in numpy columns
+    grown by doubling, next to running sums of the quantity, volume, notional, realized P&L and fees, so that any
+    time window is summarised with two binary searches, without rescanning the fills.
+
+    Position, average entry price and realized P&L are kept on the average cost method: a fill adding to the
+    position moves the average entry, a fill reducing it realizes (px - avg_entry_px) on the closed quantity, and
+    the remainder of a fill crossing through flat opens a new position at its price. P&L is in quote currency per
+    unit of size, i.e. to be multiplied by ct_val * ct_mul for contracts; fees are kept apart, as pushed by the
+    exchange (negative for a charge).
+
+    Fill times are clamped to be non-decreasing, so that the time index stays sorted.
+    """
+    def __init__(self, initial_capacity: int = 1024):
+        self._size = 0
+        self._time = np.empty(initial_capacity, dtype=np.int64)
+        self._signed_qty = np.empty(initial_capacity, dtype=np.float64)
+        self._px = np.empty(initial_capacity, dtype=np.float64)
+        self._cum_qty = np.empty(initial_capacity, dtype=np.float64)
+        self._cum_volume = np.empty(initial_capacity, dtype=np.float64)
+        self._cum_notional = np.empty(initial_capacity, dtype=np.float64)
+        self._cum_realized_pnl = np.empty(initial_capacity, dtype=np.float64)
+        self._cum_fees = np.empty(initial_capacity, dtype=np.float64)
+        self._trade_index: Dict[str, int] = {}
+        self.position: float = 0
+        self.avg_entry_px: float = 0
+        self.realized_pnl: float = 0
+        self.volume: float = 0
+        self.notional: float = 0
+        self.fees: float = 0
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, trade_id: str):
+        return trade_id in self._trade_index
+
+    def _ensure_capacity(self):
+        if self._size < len(self._time):
+            return
+        capacity = max(len(self._time) * 2, 1)
+        for name in ["_time", "_signed_qty", "_px", "_cum_qty", "_cum_volume", "_cum_notional",
+                     "_cum_realized_pnl", "_cum_fees"]:
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            setattr(self, name, grown)
+
+    def record(self, trade_id: str, fill_time: int, side: OrderSide, qty: float, px: float, fee: float = 0) -> bool:
+        """
+        :param trade_id: tradeId of the fill, a fill already recorded is ignored
+        :param fill_time: fillTime in ms
+        :param side: side of the order
+        :param qty: fillSz
+        :param px: fillPx
+        :param fee: fillFee
+        :return: whether the fill was new
+        """
+        if not trade_id or trade_id in self._trade_index or not qty:
+            return False
+        signed_qty = qty if side == OrderSide.BUY else -qty
+        self._apply_to_position(signed_qty, px)
+        self.volume += qty
+        self.notional += qty * px
+        self.fees += fee
+        self._ensure_capacity()
+        i = self._size
+        self._time[i] = max(fill_time, self._time[i - 1]) if i else fill_time
+        self._signed_qty[i] = signed_qty
+        self._px[i] = px
+        self._cum_qty[i] = self.position
+        self._cum_volume[i] = self.volume
+        self._cum_notional[i] = self.notional
+        self._cum_realized_pnl[i] = self.realized_pnl
+        self._cum_fees[i] = self.fees
+        self._trade_index[trade_id] = i
+        self._size += 1
+        return True
+
+    def _apply_to_position(self, signed_qty: float, px: float):
+        position = self.position
+        if position == 0 or (position > 0) == (signed_qty > 0):
+            self.avg_entry_px = (self.avg_entry_px * abs(position) + px * abs(signed_qty)) / \
+                                (abs(position) + abs(signed_qty))
+            self.position = position + signed_qty
+            return
+        closed_qty = min(abs(signed_qty), abs(position))
+        self.realized_pnl += closed_qty * (px - self.avg_entry_px) * (1 if position > 0 else -1)
+        self.position = position + signed_qty
+        if self.position == 0:
+            self.avg_entry_px = 0
+        elif (self.position > 0) != (position > 0):
+            self.avg_entry_px = px
+
+    def _window(self, start_ms: int, end_ms: int) -> Tuple[int, int]:
+        times = self._time[:self._size]
+        return int(np.searchsorted(times, start_ms, side="left")), int(np.searchsorted(times, end_ms, side="right"))
+
+    @staticmethod
+    def _between(column: np.ndarray, first: int, last: int) -> float:
+        return float(column[last - 1] - (column[first - 1] if first else 0))
+
+    def window(self, start_ms: int, end_ms: int) -> FillWindow:
+        """
+        Summary of the fills with start_ms <= fill time <= end_ms
+        """
+        first, last = self._window(start_ms, end_ms)
+        if first >= last:
+            return FillWindow()
+        net_qty = self._between(self._cum_qty, first, last)
+        volume = self._between(self._cum_volume, first, last)
+        return FillWindow(count=last - first, buy_qty=(volume + net_qty) / 2, sell_qty=(volume - net_qty) / 2,
+                          net_qty=net_qty, volume=volume,
+                          vwap=self._between(self._cum_notional, first, last) / volume,
+                          realized_pnl=self._between(self._cum_realized_pnl, first, last),
+                          fees=self._between(self._cum_fees, first, last))
+
+    def fill(self, trade_id: str) -> Tuple[int, float, float]:
+        """
+        :return: fill time, signed quantity and price of a recorded fill
+        """
+        i = self._trade_index[trade_id]
+        return int(self._time[i]), float(self._signed_qty[i]), float(self._px[i])
@@ -0,0 +1,42 @@
+import logging
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Optional
+
+from okx_market_maker.strategy.risk.RiskSnapshot import RiskSnapShot
+from okx_market_maker.utils.PickleFileUtil import PickleFileUtil
+
+CHECKPOINT_VERSION = 1
+
+
+@dataclass
+class StrategyCheckpoint:
+    """
+    What a restarted strategy carries over from the previous run: the inception RiskSnapShot its P&L is measured
+    against, and the filled quantities since inception.
+    """
+    trading_instrument: str
+    inception_risk_snapshot: RiskSnapShot
+    net_filled_qty: Decimal = 0
+    buy_filled_qty: Decimal = 0
+    sell_filled_qty: Decimal = 0
+    trading_volume: Decimal = 0
+    saved_time: float = 0
+    version: int = CHECKPOINT_VERSION
+
+    def save(self, path: str) -> None:
+        PickleFileUtil.save(self, path)
+
+    @classmethod
+    def load(cls, path: str, trading_instrument: str, max_age_sec: float) -> Optional["StrategyCheckpoint"]:
+        """
+        :return: the checkpoint, or None if PickleFileUtil.load finds none, or it is of another trading instrument
+        """
+        checkpoint = PickleFileUtil.load(path, StrategyCheckpoint, CHECKPOINT_VERSION, max_age_sec,
+                                         "strategy checkpoint")
+        if checkpoint is None:
+            return None
+        if checkpoint.trading_instrument != trading_instrument:
+            logging.warning(f"Ignored strategy checkpoint {path} of {checkpoint.trading_instrument}")
+            return None
+        return checkpoint
@@ -1,11 +1,15 @@
 import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from decimal import Decimal
+from typing import List, Optional
 
 from okx_market_maker.market_data_service.model.Tickers import Tickers
+from okx_market_maker.order_management_service.model.Order import Order
+from okx_market_maker.strategy.model.FillLedger import FillLedger
+from okx_market_maker.strategy.model.StrategyCheckpoint import StrategyCheckpoint
 from okx_market_maker.strategy.risk.RiskSnapshot import RiskSnapShot, AssetValueInst
 from okx_market_maker.utils.InstrumentUtil import InstrumentUtil
-from okx_market_maker.utils.OkxEnum import InstType, CtType
+from okx_market_maker.utils.OkxEnum import InstType, CtType, OrderSide
 from okx_market_maker import tickers_container, mark_px_container, order_books
 
 
@@ -17,6 +21,7 @@ class StrategyMeasurement:
     buy_filled_qty: Decimal = 0
     sell_filled_qty: Decimal = 0
     trading_volume: Decimal = 0
+    fill_ledger: FillLedger = field(default_factory=FillLedger, repr=False)
 
     asset_value_change_in_usd_since_running: float = 0
     pnl_in_usd_since_running: float = 0
@@ -27,6 +32,28 @@ class StrategyMeasurement:
     _current_risk_snapshot: RiskSnapShot = None
     _inception_risk_snapshot: RiskSnapShot = None
 
+    def consume_fill(self, order: Order) -> bool:
+        """
+        Record the fill carried by an orders channel update in the fill ledger, and count it in the filled quantities.
+        An update without fill, or with a tradeId already recorded, is ignored.
+        :param order: orders channel update of a strategy order
+        :return: whether the fill was new
+        """
+        if not self.fill_ledger.record(order.trade_id, order.fill_time, order.side, float(order.fill_sz),
+                                       order.fill_px, order.fill_fee):
+            return False
+        self.add_filled_qty(order.side, Decimal(order.fill_sz))
+        return True
+
+    def add_filled_qty(self, side: OrderSide, filled_qty: Decimal):
+        side_flag = 1 if side == OrderSide.BUY else -1
+        self.net_filled_qty += filled_qty * side_flag
+        self.trading_volume += filled_qty
+        if side_flag == 1:
+            self.buy_filled_qty += filled_qty
+        else:
+            self.sell_filled_qty += filled_qty
+
     def calc_pnl(self):
         """
         This P&L calculation is based on RiskSnapshots at current moment and inception, comparing both cash
@@ -123,6 +150,31 @@ class StrategyMeasurement:
                    * current_mark_px + asset_value_inst.margin
         return 0.0
 
+    def to_checkpoint(self) -> Optional[StrategyCheckpoint]:
+        if self._inception_risk_snapshot is None:
+            return None
+        return StrategyCheckpoint(trading_instrument=self.trading_instrument,
+                                  inception_risk_snapshot=self._inception_risk_snapshot,
+                                  net_filled_qty=self.net_filled_qty, buy_filled_qty=self.buy_filled_qty,
+                                  sell_filled_qty=self.sell_filled_qty, trading_volume=self.trading_volume)
+
+    def restore_checkpoint(self, checkpoint: StrategyCheckpoint):
+        """
+        Carry on measuring from a previous run: the next risk snapshot is compared to the checkpointed inception,
+        instead of becoming the inception.
+        """
+        self._inception_risk_snapshot = checkpoint.inception_risk_snapshot
+        self.net_filled_qty = checkpoint.net_filled_qty
+        self.buy_filled_qty = checkpoint.buy_filled_qty
+        self.sell_filled_qty = checkpoint.sell_filled_qty
+        self.trading_volume = checkpoint.trading_volume
+
+    def inception_inst_ids(self) -> List[str]:
+        if self._inception_risk_snapshot is None:
+            return []
+        return [asset_value_inst.instrument.inst_id
+                for asset_value_inst in self._inception_risk_snapshot.asset_instrument_value_snapshot.values()]
+
     def consume_risk_snapshot(self, risk_snapshot: RiskSnapShot):
         if self._inception_risk_snapshot is None:
             self._inception_risk_snapshot = risk_snapshot
@@ -171,4 +223,8 @@ class StrategyMeasurement:
               f"{self.trading_instrument_exposure_in_base:.4f}\n"
               f"Trading Instrument Exposure ({self.trading_inst_quote_ccy}): "
               f"{self.trading_instrument_exposure_in_quote:.2f}\nNet Traded Position: {self.net_filled_qty}\n"
-              f"Net Trading Volume: {self.trading_volume}\n==== End of Summary ====")
+              f"Net Trading Volume: {self.trading_volume}\n"
+              f"Fill Ledger: {len(self.fill_ledger)} fills, position {self.fill_ledger.position:.4f} "
+              f"@ avg entry {self.fill_ledger.avg_entry_px:.4f}, realized P&L ({self.trading_inst_quote_ccy} per unit "
+              f"of size) {self.fill_ledger.realized_pnl:.4f}, fees {self.fill_ledger.fees:.4f}\n"
+              f"==== End of Summary ====")
@@ -1,5 +1,7 @@
-from dataclasses import dataclass
+from concurrent.futures import Future
+from dataclasses import dataclass, field
 from enum import Enum
+from typing import Optional
 from okx_market_maker.utils.OkxEnum import OrderSide, OrderType
 
 
@@ -14,6 +16,7 @@ class StrategyOrderStatus(Enum):
     FILLED = "filled"
     LIVE = "live"
     PARTIALLY_FILLED = "partially_filled"
+    UNKNOWN = "unknown"  # a request of the order got no response, until the orders channel or a lookup tells
 
 
 @dataclass
@@ -30,6 +33,11 @@ class StrategyOrder:
     amend_req_id: str = ""
     filled_size: str = "0"
     avg_fill_price: float = 0
+    request_future: Optional[Future] = field(default=None, repr=False)  # last place / amend / cancel batch sent
+    unknown_since: float = 0  # time the status became UNKNOWN
+
+    def request_in_flight(self) -> bool:
+        return self.request_future is not None and not self.request_future.done()
 
     def __eq__(self, other):
         return (self.side == other.side) and (self.inst_id == other.inst_id) \
@@ -14,6 +14,7 @@ class ParamsLoader:
             with open(PARAMS_PATH, 'r') as file:
                 params = yaml.safe_load(file)
             self.params = params
+            self._inited = True
         except:
             print(traceback.format_exc())
 
@@ -0,0 +1,14 @@
+def order_json(i: int, state: str = "live") -> dict:
+    """
+    Order of the orders channel / REST order endpoints as sent by the exchange, shared by the tests and benchmarks
+    :param i: ordId, and the clOrdId "order{i}"
+    :param state: order state
+    :return: order json
+    """
+    return {"accFillSz": "0", "avgPx": "0", "cTime": "1597026383085", "category": "normal", "ccy": "",
+            "clOrdId": f"order{i}", "execType": "", "fee": "0", "feeCcy": "USDT", "fillFee": "0",
+            "fillFeeCcy": "", "fillNotionalUsd": "", "fillPx": "", "fillSz": "0", "fillTime": "",
+            "instId": "BTC-USDT-SWAP", "instType": "SWAP", "lever": "3", "notionalUsd": "30", "ordId": str(i),
+            "ordType": "limit", "pnl": "0", "posSide": "net", "px": "30000", "rebate": "0", "rebateCcy": "USDT",
+            "reduceOnly": "false", "side": "buy", "state": state, "sz": "1", "tag": "", "tradeId": "",
+            "uTime": "1597026383085"}
@@ -0,0 +1,47 @@
+from unittest import TestCase
+
+from okx_market_maker.strategy.model.FillLedger import FillLedger
+from okx_market_maker.utils.OkxEnum import OrderSide
+
+
+class TestFillLedger(TestCase):
+    def test_position_and_realized_pnl(self):
+        ledger = FillLedger(initial_capacity=2)
+        self.assertTrue(ledger.record("1", 1000, OrderSide.BUY, 2, 100, -0.2))
+        self.assertTrue(ledger.record("2", 2000, OrderSide.BUY, 2, 110, -0.2))
+        self.assertFalse(ledger.record("2", 2000, OrderSide.BUY, 2, 110, -0.2))
+        self.assertEqual(ledger.position, 4)
+        self.assertAlmostEqual(ledger.avg_entry_px, 105)
+        self.assertTrue(ledger.record("3", 3000, OrderSide.SELL, 1, 120))
+        self.assertAlmostEqual(ledger.realized_pnl, 15)
+        self.assertAlmostEqual(ledger.avg_entry_px, 105)
+        # sells through flat: 3 closed at 100, 2 opened short at 100
+        self.assertTrue(ledger.record("4", 4000, OrderSide.SELL, 5, 100))
+        self.assertAlmostEqual(ledger.realized_pnl, 0)
+        self.assertEqual(ledger.position, -2)
+        self.assertAlmostEqual(ledger.avg_entry_px, 100)
+        self.assertTrue(ledger.record("5", 5000, OrderSide.BUY, 2, 90))
+        self.assertAlmostEqual(ledger.realized_pnl, 20)
+        self.assertEqual(ledger.position, 0)
+        self.assertEqual(ledger.avg_entry_px, 0)
+        self.assertEqual(len(ledger), 5)
+        self.assertAlmostEqual(ledger.fees, -0.4)
+        self.assertEqual(ledger.fill("4"), (4000, -5, 100))
+
+    def test_window(self):
+        ledger = FillLedger(initial_capacity=1)
+        ledger.record("1", 1000, OrderSide.BUY, 2, 100, -0.2)
+        ledger.record("2", 2000, OrderSide.SELL, 1, 120, -0.1)
+        ledger.record("3", 3000, OrderSide.SELL, 1, 130, -0.1)
+        # out of order fill time is clamped to the previous one
+        ledger.record("4", 2500, OrderSide.BUY, 1, 110)
+        window = ledger.window(2000, 3000)
+        self.assertEqual(window.count, 3)
+        self.assertAlmostEqual(window.buy_qty, 1)
+        self.assertAlmostEqual(window.sell_qty, 2)
+        self.assertAlmostEqual(window.net_qty, -1)
+        self.assertAlmostEqual(window.vwap, 120)
+        self.assertAlmostEqual(window.realized_pnl, 50)
+        self.assertAlmostEqual(window.fees, -0.2)
+        self.assertEqual(ledger.window(0, 999).count, 0)
+        self.assertEqual(ledger.window(0, 10000).count, 4)
@@ -0,0 +1,117 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from okx_market_maker import order_books
+from okx_market_maker.journal.JournalFormat import FILE_MAGIC, CHUNK_HEADER, CHUNK_MAGIC, decode_chunk
+from okx_market_maker.journal.JournalReader import JournalReader
+from okx_market_maker.journal.JournalRecorder import JournalRecorder
+from okx_market_maker.journal.JournalReplay import JournalReplay
+
+
+def _read_journal(file_path: str):
+    with open(file_path, "rb") as f:
+        content = f.read()
+    assert content[:len(FILE_MAGIC)] == FILE_MAGIC
+    offset = len(FILE_MAGIC)
+    records = []
+    while offset < len(content):
+        magic, num_of_records, _, compressed_length, first_recv_ns, last_recv_ns = \
+            CHUNK_HEADER.unpack_from(content, offset)
+        assert magic == CHUNK_MAGIC
+        offset += CHUNK_HEADER.size
+        chunk_records = decode_chunk(content[offset:offset + compressed_length])
+        assert len(chunk_records) == num_of_records
+        assert (chunk_records[0][0], chunk_records[-1][0]) == (first_recv_ns, last_recv_ns)
+        records += chunk_records
+        offset += compressed_length
+    return records
+
+
+class TestJournalRecorder(TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_record_and_read_back(self):
+        recorder = JournalRecorder(directory=self.temp_dir.name, channels=["books", "orders"], chunk_max_records=3)
+        recorder.start()
+        for i in range(10):
+            recorder.record({"arg": {"channel": "books", "instId": "BTC-USDT"}, "data": [{"seqId": i}]})
+        recorder.record({"arg": {"channel": "tickers", "instId": "BTC-USDT"}, "data": []})
+        recorder.record({"arg": {"channel": "orders", "instType": "ANY"}, "data": [{"clOrdId": "a"}]})
+        recorder.stop()
+        self.assertEqual(recorder.records_written, 11)
+        self.assertEqual(recorder.chunks_written, 4)
+        self.assertEqual(len(recorder.file_paths), 1)
+        records = _read_journal(recorder.file_paths[0])
+        self.assertEqual([message["data"][0]["seqId"] for _, message in records[:10]], list(range(10)))
+        self.assertEqual(records[10][1]["arg"]["channel"], "orders")
+        self.assertEqual([recv_ns for recv_ns, _ in records], sorted(recv_ns for recv_ns, _ in records))
+
+    def test_rotate_by_size(self):
+        recorder = JournalRecorder(directory=self.temp_dir.name, channels=None, chunk_max_records=1,
+                                   max_file_bytes=1)
+        recorder.start()
+        for i in range(3):
+            recorder.record({"arg": {"channel": "books", "instId": "BTC-USDT"}, "data": [{"seqId": i}]})
+        recorder.stop()
+        self.assertEqual(len(recorder.file_paths), 3)
+        self.assertEqual(len(set(recorder.file_paths)), 3)
+        for i, file_path in enumerate(recorder.file_paths):
+            self.assertTrue(os.path.exists(file_path))
+            self.assertEqual(_read_journal(file_path)[0][1]["data"][0]["seqId"], i)
+
+
+def _books_message(action: str, seq_id: int, prev_seq_id: int, bids):
+    return {"arg": {"channel": "books", "instId": "BTC-USDT"}, "action": action,
+            "data": [{"asks": [["101", "1", "0", "1"]] if action == "snapshot" else [], "bids": bids,
+                      "ts": "1597026383085", "checksum": 0, "seqId": seq_id, "prevSeqId": prev_seq_id}]}
+
+
+class TestJournalReplay(TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        recorder = JournalRecorder(directory=self.temp_dir.name, channels=None, chunk_max_records=4)
+        recorder.start()
+        recorder.record(_books_message("snapshot", 1, -1, [["100", "1", "0", "1"]]))
+        recorder.record({"arg": {"channel": "orders", "instType": "ANY"}, "data": [{"clOrdId": "a"}]})
+        for i in range(2, 12):
+            recorder.record(_books_message("update", i, i - 1, [[str(90 + i), "1", "0", "1"]]))
+        recorder.stop()
+        self.file_path = recorder.file_paths[0]
+
+    def tearDown(self) -> None:
+        order_books.pop("BTC-USDT", None)
+        self.temp_dir.cleanup()
+
+    def test_replay_into_order_books(self):
+        stats = JournalReplay([self.file_path]).run()
+        self.assertEqual(stats.messages, 11)
+        self.assertEqual(stats.skipped, 1)
+        self.assertEqual(stats.apply_latency.count, 11)
+        order_book = order_books["BTC-USDT"]
+        self.assertEqual(order_book.seq_id, 11)
+        self.assertFalse(order_book.stale)
+        self.assertEqual(order_book.best_bid_price(), 101)
+        self.assertEqual(len(order_book._bids), 10)
+
+    def test_seek_by_time(self):
+        with JournalReader(self.file_path) as reader:
+            self.assertEqual(len(reader.index), 3)
+            self.assertEqual(reader.num_of_records(), 12)
+            start_ns = reader.index[1].first_recv_ns
+            records = list(reader.iter_records(start_ns=start_ns))
+            self.assertEqual(records[0][1]["data"][0]["seqId"], 4)
+            self.assertTrue(all(recv_ns >= start_ns for recv_ns, _ in records))
+
+    def test_incomplete_last_chunk_ignored(self):
+        with open(self.file_path, "rb") as f:
+            content = f.read()
+        with open(self.file_path, "wb") as f:
+            f.write(content[:-5])
+        with JournalReader(self.file_path) as reader:
+            self.assertEqual(len(reader.index), 2)
+            self.assertEqual(len(list(reader.iter_records())), 8)
@@ -0,0 +1,301 @@
+import os
+import tempfile
+from decimal import Decimal
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from okx_market_maker import order_books, order_book_snapshots, best_bid_offers, update_queue_container, \
+    tickers_container, mark_px_container, instruments
+from okx_market_maker.market_data_service.WssMarketDataService import WssMarketDataService, \
+    on_orderbook_snapshot_or_update, _callback
+from okx_market_maker.market_data_service.RESTMarketDataService import RESTMarketDataService
+from okx_market_maker.market_data_service.WssRiskPriceService import WssRiskPriceService
+from okx_market_maker.market_data_service.InstrumentMetadataService import InstrumentMetadataService
+from okx_market_maker.market_data_service.model.Instrument import Instrument
+from okx_market_maker.utils.InstrumentUtil import InstrumentUtil
+from okx_market_maker.position_management_service.model.Account import Account, AccountDetail
+from okx_market_maker.position_management_service.model.Positions import Positions, Position
+from okx_market_maker.utils.OkxEnum import InstType
+from okx_market_maker.utils.UpdateQueue import UpdateQueue, QueuePolicy
+
+INST_ID = "ETH-USDT-SWAP"
+
+
+def _books_message(action: str, seq_id: int, prev_seq_id: int, bids=None, asks=None, inst_id: str = INST_ID):
+    return {
+        "arg": {"channel": "books", "instId": inst_id},
+        "action": action,
+        "data": [{"asks": asks or [], "bids": bids or [], "ts": "1597026383085", "checksum": 0,
+                  "seqId": seq_id, "prevSeqId": prev_seq_id}]
+    }
+
+
+class TestWssMarketDataService(TestCase):
+    def setUp(self) -> None:
+        self.mds = WssMarketDataService(url="wss://localhost", inst_id=INST_ID, channel="books")
+        self.mds._assign_args("mds-0", self.mds._prepare_args())
+        self.mds._send_op = MagicMock(return_value=None)
+        self.order_book = order_books[INST_ID]
+        on_orderbook_snapshot_or_update(_books_message(
+            "snapshot", 10, -1, bids=[["100", "1", "0", "1"]], asks=[["101", "1", "0", "1"]]))
+
+    def tearDown(self) -> None:
+        order_books.pop(INST_ID, None)
+
+    def test_sequence_in_order(self):
+        on_orderbook_snapshot_or_update(_books_message("update", 11, 10, bids=[["100.5", "2", "0", "1"]]))
+        on_orderbook_snapshot_or_update(_books_message("update", 11, 11))
+        self.assertFalse(self.order_book.stale)
+        self.assertEqual(self.order_book.seq_id, 11)
+        self.assertEqual(self.order_book.best_bid_price(), 100.5)
+
+    def test_sequence_gap_marks_stale_until_snapshot(self):
+        on_orderbook_snapshot_or_update(_books_message("update", 13, 12, bids=[["100.5", "2", "0", "1"]]))
+        self.assertTrue(self.order_book.stale)
+        on_orderbook_snapshot_or_update(_books_message("update", 14, 13, bids=[["100.6", "2", "0", "1"]]))
+        self.assertEqual(self.order_book.best_bid_price(), 100)
+        on_orderbook_snapshot_or_update(_books_message(
+            "snapshot", 20, -1, bids=[["99", "1", "0", "1"]], asks=[["101", "1", "0", "1"]]))
+        self.assertFalse(self.order_book.stale)
+        self.assertEqual(self.order_book.best_bid_price(), 99)
+
+    def test_gap_resubscribes_single_instrument(self):
+        self.mds._on_message(_books_message("update", 13, 12))
+        self.assertEqual(self.mds._send_op.call_count, 2)
+        self.mds._send_op.assert_any_call("unsubscribe", [{"channel": "books", "instId": INST_ID}], "mds-0")
+        self.mds._send_op.assert_any_call("subscribe", [{"channel": "books", "instId": INST_ID}], "mds-0")
+        self.mds._on_message(_books_message("update", 14, 13))
+        self.assertEqual(self.mds._send_op.call_count, 2)
+        self.mds._on_message(_books_message("snapshot", 20, -1, bids=[["99", "1", "0", "1"]]))
+        self.assertEqual(self.mds.resync_latency.count, 1)
+        self.assertNotIn(INST_ID, self.mds._resync_start_time)
+
+    @patch("time.time", return_value=1597026383.2)
+    def test_bbo_cached_apart_from_order_book(self, time_mock):
+        _callback({"arg": {"channel": "bbo-tbt", "instId": "SOL-USDT"},
+                   "data": [{"asks": [["20.5", "3", "0", "1"]], "bids": [["20.4", "7", "0", "2"]],
+                             "ts": "1597026383085", "seqId": 5}]})
+        self.assertNotIn("SOL-USDT", order_books)
+        bbo = best_bid_offers.pop("SOL-USDT")
+        self.assertEqual((bbo.bid_price, bbo.bid_quantity, bbo.ask_price, bbo.ask_quantity), (20.4, 7, 20.5, 3))
+        self.assertEqual((bbo.timestamp, bbo.receive_timestamp, bbo.seq_id), (1597026383085, 1597026383.2, 5))
+        self.assertAlmostEqual(bbo.middle_price(), 20.45)
+
+    def test_book_snapshot_handed_to_update_queue(self):
+        update_queue = UpdateQueue(policies={"books": QueuePolicy.CONFLATE_LATEST}, max_depth=100)
+        update_queue_container.append(update_queue)
+        try:
+            _callback(_books_message("update", 11, 10, bids=[["100.5", "2", "0", "1"]]))
+            _callback(_books_message("update", 12, 11, asks=[["100.8", "1", "0", "1"]]))
+        finally:
+            update_queue_container.clear()
+        events = update_queue.drain()
+        self.assertEqual(len(events), 1)
+        snapshot = events[0].payload
+        self.assertIs(order_book_snapshots.pop(INST_ID), snapshot)
+        self.assertEqual(snapshot.version, self.order_book.version)
+        self.assertEqual((snapshot.seq_id, snapshot.best_bid_price(), snapshot.best_ask_price()), (12, 100.5, 100.8))
+        on_orderbook_snapshot_or_update(_books_message("update", 13, 12, bids=[["100.7", "2", "0", "1"]]))
+        self.assertEqual(snapshot.best_bid_price(), 100.5)
+        self.assertEqual(self.order_book.best_bid_price(), 100.7)
+
+    @patch("okx_market_maker.market_data_service.WssMarketDataService.reactor")
+    def test_args_sharded_across_connections(self, reactor_mock):
+        inst_ids = ["BTC-USDT", "ETH-USDT", "SOL-USDT"]
+        reactor_mock.callFromThread.side_effect = lambda f, *args: f(*args)
+        mds = WssMarketDataService(url="wss://localhost", inst_ids=inst_ids, channels=["books", "bbo-tbt"],
+                                   max_args_per_connection=4)
+        mds._send_op = MagicMock(return_value=None)
+        mds.addConnection = MagicMock(return_value=None)
+        mds.run_service()
+        self.assertEqual(sorted(mds._connection_args), ["mds-0", "mds-1"])
+        self.assertEqual(len(mds._connection_args["mds-0"]), 4)
+        self.assertEqual(len(mds._connection_args["mds-1"]), 2)
+        self.assertEqual(mds.addConnection.call_count, 2)
+        for inst_id in inst_ids:
+            self.assertIn(inst_id, order_books)
+        mds.add_args([{"channel": "books", "instId": "XRP-USDT"}, {"channel": "books", "instId": "BTC-USDT"}])
+        self.assertEqual(len(mds._connection_args["mds-1"]), 3)
+        mds._send_op.assert_called_once_with("subscribe", [{"channel": "books", "instId": "XRP-USDT"}], "mds-1")
+        mds.remove_args([{"channel": "books", "instId": "XRP-USDT"}])
+        self.assertEqual(len(mds._connection_args["mds-1"]), 2)
+        self.assertEqual(len(mds.args), 6)
+        for inst_id in inst_ids:
+            order_books.pop(inst_id, None)
+
+    @patch("okx_market_maker.market_data_service.WssMarketDataService.reactor")
+    def test_args_added_before_open_sent_on_first_message(self, reactor_mock):
+        reactor_mock.callFromThread.side_effect = lambda f, *args: f(*args)
+        mds = WssMarketDataService(url="wss://localhost", inst_ids=["BTC-USDT"], channels=["bbo-tbt"])
+        mds.addConnection = MagicMock(return_value=None)
+        mds.run_service()
+        factory = mds.factories["mds-0"]
+        # built and connecting with the first payload, not open yet
+        mds.add_args([{"channel": "bbo-tbt", "instId": "ETH-USDT"}])
+        self.assertIn(b"ETH-USDT", factory.payload)
+        protocol = MagicMock(state=3, STATE_OPEN=3)
+        factory.instance = protocol
+        protocol.sendMessage.assert_not_called()
+        factory.callback({"event": "subscribe", "arg": {"channel": "bbo-tbt", "instId": "BTC-USDT"}})
+        protocol.sendMessage.assert_called_once_with(
+            b'{"op": "subscribe", "args": [{"channel": "bbo-tbt", "instId": "ETH-USDT"}]}', False)
+        mds.remove_args([{"channel": "bbo-tbt", "instId": "ETH-USDT"}])
+        self.assertEqual(protocol.sendMessage.call_count, 2)
+        self.assertEqual([arg["instId"] for arg in mds.args], ["BTC-USDT"])
+
+    @patch("okx_market_maker.market_data_service.WssMarketDataService.reactor")
+    def test_risk_price_subscriptions(self, reactor_mock):
+        saved_containers = list(tickers_container), list(mark_px_container)
+        tickers_container.clear()
+        mark_px_container.clear()
+        reactor_mock.callFromThread.side_effect = lambda f, *args: f(*args)
+        service = WssRiskPriceService(url="wss://localhost")
+        service._send_op = MagicMock(return_value=None)
+        service.addConnection = MagicMock(return_value=None)
+        account = Account(details={"BTC": AccountDetail(ccy="BTC"), "USDT": AccountDetail(ccy="USDT")})
+        positions = Positions(_position_map={"1": Position(inst_id="ETH-USDT-SWAP", ccy="USDT")})
+        to_add, to_remove = service.update_subscriptions(account, positions, ["BTC-USDT"])
+        self.assertEqual(to_add, [{"channel": "tickers", "instId": "BTC-USDT"},
+                                  {"channel": "tickers", "instId": "ETH-USDT"},
+                                  {"channel": "mark-price", "instId": "BTC-USD-SWAP"},
+                                  {"channel": "mark-price", "instId": "BTC-USDT-SWAP"},
+                                  {"channel": "mark-price", "instId": "ETH-USDT-SWAP"}])
+        self.assertEqual(to_remove, [])
+        self.assertFalse(service.prices_ready())
+        for arg in to_add:
+            data = {"instType": "SWAP" if arg["channel"] == "mark-price" else "SPOT", "instId": arg["instId"],
+                    "markPx": "100", "bidPx": "99", "askPx": "101", "ts": "1597026383085"}
+            _callback({"arg": arg, "data": [data]})
+        self.assertTrue(service.prices_ready())
+        self.assertEqual(tickers_container[0].get_usdt_price_by_ccy("ETH"), 100)
+        self.assertEqual(mark_px_container[0].get_mark_px("ETH-USDT-SWAP").mark_px, 100)
+        to_add, to_remove = service.update_subscriptions(account, Positions(), ["BTC-USDT"])
+        self.assertEqual(to_add, [])
+        self.assertEqual(to_remove, [{"channel": "tickers", "instId": "ETH-USDT"},
+                                     {"channel": "mark-price", "instId": "ETH-USDT-SWAP"}])
+        self.assertEqual(len(service.args), 3)
+        tickers_container[:] = saved_containers[0]
+        mark_px_container[:] = saved_containers[1]
+
+    @patch("okx_market_maker.market_data_service.WssMarketDataService.reactor")
+    def test_risk_price_inverse_position(self, reactor_mock):
+        saved_containers = list(tickers_container), list(mark_px_container)
+        tickers_container.clear()
+        mark_px_container.clear()
+        instruments["ETH-USD-230630:FUTURES"] = Instrument(inst_id="ETH-USD-230630", inst_type=InstType.FUTURES,
+                                                           ct_val_ccy="USD", settle_ccy="ETH")
+        reactor_mock.callFromThread.side_effect = lambda f, *args: f(*args)
+        service = WssRiskPriceService(url="wss://localhost")
+        service._send_op = MagicMock(return_value=None)
+        service.addConnection = MagicMock(return_value=None)
+        positions = Positions(_position_map={"1": Position(inst_id="BTC-USD-SWAP", ccy="BTC"),
+                                             "2": Position(inst_id="ETH-USD-230630", ccy="ETH")})
+        to_add, _ = service.update_subscriptions(Account(), positions)
+        instruments.pop("ETH-USD-230630:FUTURES")
+        self.assertEqual(to_add, [{"channel": "tickers", "instId": "BTC-USDT"},
+                                  {"channel": "tickers", "instId": "ETH-USDT"},
+                                  {"channel": "mark-price", "instId": "BTC-USD-SWAP"},
+                                  {"channel": "mark-price", "instId": "BTC-USDT-SWAP"},
+                                  {"channel": "mark-price", "instId": "ETH-USD-230630"}])
+        for arg in to_add:
+            data = {"instType": "SWAP" if arg["channel"] == "mark-price" else "SPOT", "instId": arg["instId"],
+                    "markPx": "100", "bidPx": "99", "askPx": "101", "ts": "1597026383085"}
+            _callback({"arg": arg, "data": [data]})
+        self.assertTrue(service.prices_ready())
+        tickers_container[:] = saved_containers[0]
+        mark_px_container[:] = saved_containers[1]
+
+
+class TestRESTMarketDataService(TestCase):
+    @patch("time.time", return_value=1000)
+    def test_concurrent_fetch_per_inst_type_interval(self, time_mock):
+        rest_mds = RESTMarketDataService(refresh_sec={"SPOT": 2, "MARGIN": 2, "SWAP": 2, "FUTURES": 2, "OPTION": 10},
+                                         retry_sec=10)
+        rest_mds.market_api.get_tickers = MagicMock(return_value={"code": "0", "data": [
+            {"instType": "SPOT", "instId": "ETH-USDT", "bidPx": "99", "askPx": "101"}]})
+        rest_mds.public_api.get_mark_price = MagicMock(side_effect=lambda instType: {"code": "0", "data": [
+            {"instType": instType, "instId": f"ETH-USDT-{instType}", "markPx": "100", "ts": "1000000"}]}
+            if instType != "FUTURES" else {"code": "50001", "msg": "unavailable", "data": []})
+        self.assertEqual(rest_mds.poll(), 1002)
+        for endpoint in rest_mds._endpoints:
+            endpoint.future.result()
+        self.assertEqual(tickers_container[0].get_usdt_price_by_ccy("ETH"), 100)
+        self.assertEqual(mark_px_container[0].get_mark_px("ETH-USDT-OPTION").mark_px, 100)
+        self.assertEqual(rest_mds.stats[InstType.SPOT].latency.count, 1)
+        self.assertEqual(rest_mds.stats[InstType.SPOT].staleness_sec(), 0)
+        self.assertEqual(rest_mds.stats[InstType.FUTURES].failures, 1)
+        self.assertEqual(rest_mds.stats[InstType.FUTURES].staleness_sec(), float("inf"))
+        time_mock.return_value = 1002
+        rest_mds.poll()
+        for endpoint in rest_mds._endpoints:
+            endpoint.future.result()
+        self.assertEqual(rest_mds.market_api.get_tickers.call_count, 2)
+        # options every 10 seconds, futures retried after 10 seconds
+        self.assertEqual(sorted(call.kwargs["instType"] for call in rest_mds.public_api.get_mark_price.call_args_list),
+                         ["FUTURES", "MARGIN", "MARGIN", "OPTION", "SWAP", "SWAP"])
+        self.assertIn("FUTURES: mean 0.0 ms", rest_mds.fetch_summary())
+        # the failure is rescheduled by the scheduler thread once it sees the future done
+        futures_endpoint = next(endpoint for endpoint in rest_mds._endpoints if endpoint.inst_type == InstType.FUTURES)
+        self.assertEqual(futures_endpoint.next_time, 1010)
+
+
+def _instruments_response(inst_type: str, tick_sz: str = "0.1"):
+    return {"code": "0", "data": [
+        {"instType": inst_type, "instId": "ETH-USDT-SWAP" if inst_type == "SWAP" else "ETH-USDT", "tickSz": tick_sz,
+         "lotSz": "1", "minSz": "1", "state": "live"},
+        {"instType": inst_type, "instId": "NEW-USDT-SWAP" if inst_type == "SWAP" else "NEW-USDT", "tickSz": "1",
+         "lotSz": "1", "minSz": "1", "state": "preopen"}]}
+
+
+class TestInstrumentMetadataService(TestCase):
+    def setUp(self) -> None:
+        instruments.clear()
+        self.cache_path = os.path.join(tempfile.mkdtemp(), "instrument_cache.pkl")
+
+    def tearDown(self) -> None:
+        instruments.clear()
+
+    def _service(self, **kwargs) -> InstrumentMetadataService:
+        service = InstrumentMetadataService(is_paper_trading=True, inst_types=["SPOT", "SWAP"],
+                                            cache_path=self.cache_path, cache_max_age_sec=60, **kwargs)
+        service.public_api.get_instruments = MagicMock(
+            side_effect=lambda instType: _instruments_response(instType))
+        return service
+
+    def test_preload_from_exchange_then_cache_file(self):
+        service = self._service()
+        self.assertEqual(service.preload(), 2)
+        self.assertEqual(service.public_api.get_instruments.call_count, 2)
+        self.assertEqual(sorted(instruments), ["ETH-USDT-SWAP:SWAP", "ETH-USDT:SPOT"])
+        with patch.object(InstrumentUtil, "public_api") as public_api_mock:
+            self.assertEqual(InstrumentUtil.get_instrument("ETH-USDT-SWAP").tick_sz, Decimal("0.1"))
+        public_api_mock.get_instruments.assert_not_called()
+        instruments.clear()
+        restarted = self._service()
+        self.assertEqual(restarted.preload(), 2)
+        restarted.public_api.get_instruments.assert_not_called()
+        self.assertEqual(instruments["ETH-USDT:SPOT"].tick_sz, Decimal("0.1"))
+        # a cache file of the live trading environment is not used for paper trading
+        instruments.clear()
+        live = self._service()
+        live.is_paper_trading = False
+        self.assertEqual(live.preload(), 2)
+        self.assertEqual(live.public_api.get_instruments.call_count, 2)
+
+    def test_stale_cache_file_ignored(self):
+        self._service().preload()
+        stale = self._service()
+        stale.cache_max_age_sec = -1
+        stale.preload()
+        self.assertEqual(stale.public_api.get_instruments.call_count, 2)
+
+    def test_refresh_picks_up_tick_size_change(self):
+        service = self._service()
+        service.preload()
+        service.public_api.get_instruments = MagicMock(side_effect=lambda instType: _instruments_response(
+            instType, tick_sz="0.01") if instType == "SWAP" else {"code": "50001", "msg": "unavailable", "data": []})
+        with patch("okx_market_maker.market_data_service.model.InstrumentCache.InstrumentCache.save") as save_mock:
+            self.assertEqual(list(service.refresh()), ["ETH-USDT-SWAP:SWAP"])
+        save_mock.assert_not_called()
+        self.assertEqual(instruments["ETH-USDT-SWAP:SWAP"].tick_sz, Decimal("0.01"))
+        self.assertEqual(instruments["ETH-USDT:SPOT"].tick_sz, Decimal("0.1"))
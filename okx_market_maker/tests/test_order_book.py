@@ -0,0 +1,195 @@
+import binascii
+import random
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import patch
+
+from okx_market_maker.market_data_service.model.OrderBook import OrderBook, OrderBookLevel
+from okx_market_maker.utils.OkxEnum import OrderSide
+
+
+def _level(price: str, quantity: str) -> OrderBookLevel:
+    return OrderBookLevel(price=float(price), quantity=float(quantity), order_count=1, price_string=price,
+                          quantity_string=quantity, order_count_string="1")
+
+
+class TestOrderBook(TestCase):
+    def setUp(self) -> None:
+        order_book = OrderBook("BTC-USDT-SWAP")
+        order_book.set_bids_on_snapshot([_level("99", "1"), _level("100", "2"), _level("98", "3")])
+        order_book.set_asks_on_snapshot([_level("102", "1"), _level("101", "2"), _level("103", "3")])
+        self.order_book = order_book
+
+    def test_snapshot_sorted(self):
+        self.assertEqual([level.price for level in self.order_book._bids], [100, 99, 98])
+        self.assertEqual([level.price for level in self.order_book._asks], [101, 102, 103])
+        self.assertEqual(self.order_book.best_bid_price(), 100)
+        self.assertEqual(self.order_book.best_ask_price(), 101)
+        self.assertEqual(self.order_book.middle_price(), 100.5)
+
+    def test_update_insert_replace_delete(self):
+        self.order_book.set_bids_on_update(_level("99.5", "4"))
+        self.order_book.set_bids_on_update(_level("100", "5"))
+        self.order_book.set_bids_on_update(_level("98", "0"))
+        self.order_book.set_asks_on_update(_level("100.5", "6"))
+        self.order_book.set_asks_on_update(_level("103", "0"))
+        self.assertEqual([(level.price, level.quantity) for level in self.order_book._bids],
+                         [(100, 5), (99.5, 4), (99, 1)])
+        self.assertEqual([(level.price, level.quantity) for level in self.order_book._asks],
+                         [(100.5, 6), (101, 2), (102, 1)])
+
+    def test_delete_unknown_level_ignored(self):
+        self.order_book.set_bids_on_update(_level("97", "0"))
+        self.order_book.set_asks_on_update(_level("104", "0"))
+        self.assertEqual(len(self.order_book._bids), 3)
+        self.assertEqual(len(self.order_book._asks), 3)
+
+    def test_by_level(self):
+        self.assertEqual(self.order_book.bid_by_level(2).price, 99)
+        self.assertEqual(self.order_book.ask_by_level(0).price, 101)
+        self.assertEqual(self.order_book.ask_by_level(10).price, 103)
+        with self.assertRaises(IndexError):
+            OrderBook("BTC-USDT-SWAP").best_bid()
+
+    def test_level_from_wire(self):
+        level = OrderBookLevel.from_wire(["8476.98", "415", "0", "13"])
+        self.assertEqual((level.price, level.quantity, level.order_count), (8476.98, 415, 13))
+        self.assertFalse(hasattr(level, "__dict__"))
+        self.assertIn("quantity", OrderBookLevel.__slots__)
+        self.assertEqual(OrderBookLevel(price=8476.98, quantity_string="415").quantity, 415)
+        self.assertEqual(level.__eq__(SimpleNamespace(price=8476.98, quantity=415)), NotImplemented)
+        self.assertEqual([level.price for level in self.order_book._bids.top(2)], [100, 99])
+        self.assertEqual(self.order_book._bids[-1].price, 98)
+        with self.assertRaises(IndexError):
+            self.order_book._bids[3]
+
+    def test_check_sum(self):
+        check_string = "100:2:101:2:99:1:102:1:98:3:103:3"
+        crc = binascii.crc32(check_string.encode())
+        self.order_book.set_exch_check_sum(crc if crc < 0x80000000 else crc - 0x100000000)
+        self.assertTrue(self.order_book.do_check_sum())
+        self.order_book.set_bids_on_update(_level("98", "4"))
+        self.assertFalse(self.order_book.do_check_sum())
+
+    def test_check_sum_cached_until_top_levels_change(self):
+        for i in range(30):
+            self.order_book.set_asks_on_update(_level(str(110 + i), "1"))
+        self.order_book.set_exch_check_sum(1)
+        self.order_book.do_check_sum()
+        with patch.object(OrderBook, "_calc_check_sum", return_value=1) as calc_mock:
+            self.order_book.set_asks_on_update(_level("139", "2"))
+            self.order_book.do_check_sum()
+            calc_mock.assert_not_called()
+            self.order_book.set_asks_on_update(_level("101", "5"))
+            self.assertTrue(self.order_book.do_check_sum())
+            calc_mock.assert_called_once()
+
+    def test_depth_view_incremental(self):
+        self.order_book.depth_view()
+        self.order_book.set_bids_on_update(_level("99.5", "4"))
+        self.order_book.set_bids_on_update(_level("100", "5"))
+        self.order_book.set_bids_on_update(_level("98", "0"))
+        self.order_book.set_asks_on_update(_level("101", "0"))
+        for i in range(100):
+            self.order_book.set_asks_on_update(_level(str(200 + i), "1"))
+        depth_view = self.order_book.depth_view()
+        self.assertEqual(depth_view.bid_prices.tolist(), [100, 99.5, 99])
+        self.assertEqual(depth_view.bid_quantities.tolist(), [5, 4, 1])
+        self.assertEqual(depth_view.ask_prices.tolist(), [level.price for level in self.order_book._asks])
+        self.assertEqual(depth_view.ask_quantities.tolist(), [level.quantity for level in self.order_book._asks])
+
+    def test_depth_view_analytics(self):
+        depth_view = self.order_book.depth_view()
+        self.assertEqual(depth_view.cumulative_depth(OrderSide.BUY, 102), 3)
+        self.assertEqual(depth_view.cumulative_depth(OrderSide.SELL, 99), 3)
+        self.assertEqual(depth_view.price_for_size(OrderSide.BUY, 2.5), 102)
+        self.assertEqual(depth_view.price_for_size(OrderSide.SELL, 10), 0)
+        self.assertAlmostEqual(depth_view.vwap_for_size(OrderSide.BUY, 3), (101 * 2 + 102) / 3)
+        self.assertAlmostEqual(depth_view.imbalance(2), (3 - 3) / 6)
+        self.assertAlmostEqual(depth_view.microprice(), (100 * 2 + 101 * 2) / 4)
+
+    def test_snapshot_check_sum_and_depth_view(self):
+        check_string = "100:2:101:2:99:1:102:1:98:3:103:3"
+        crc = binascii.crc32(check_string.encode())
+        self.order_book.set_exch_check_sum(crc if crc < 0x80000000 else crc - 0x100000000)
+        snapshot = self.order_book.snapshot(2, with_depth_view=True)
+        with self.assertRaises(ValueError):
+            self.order_book.snapshot().depth_view()
+        self.order_book.set_bids_on_update(_level("98", "4"))
+        self.order_book.set_asks_on_update(_level("104", "1"))
+        with patch.object(OrderBook, "_calc_check_sum") as calc_mock:
+            self.assertTrue(snapshot.do_check_sum())
+            calc_mock.assert_not_called()
+        self.assertFalse(self.order_book.snapshot().do_check_sum())
+        self.assertEqual(len(snapshot._bids), 2)
+        self.assertEqual(snapshot.depth_view().bid_quantities.tolist(), [2, 1, 3])
+        self.assertEqual(snapshot.depth_view().ask_prices.tolist(), [101, 102, 103])
+
+    def test_max_depth_matches_full_book(self):
+        rnd = random.Random(3)
+        full_book = OrderBook("BTC-USDT-SWAP")
+        limited_book = OrderBook("BTC-USDT-SWAP", max_depth=30)
+        limited_book.depth_view()
+        snapshot_bids = [_level(str(1000 - i), "1") for i in range(100)]
+        snapshot_asks = [_level(str(1001 + i), "1") for i in range(100)]
+        for order_book in [full_book, limited_book]:
+            order_book.set_bids_on_snapshot(list(snapshot_bids))
+            order_book.set_asks_on_snapshot(list(snapshot_asks))
+        self.assertEqual(len(limited_book._bids), 30)
+        for _ in range(5000):
+            price = str(rnd.randint(850, 1150))
+            quantity = str(rnd.choice([0, 0, rnd.randint(1, 9)]))
+            for order_book in [full_book, limited_book]:
+                if float(price) <= 1000:
+                    order_book.set_bids_on_update(_level(price, quantity))
+                else:
+                    order_book.set_asks_on_update(_level(price, quantity))
+            self.assertEqual(limited_book._calc_check_sum(), full_book._calc_check_sum())
+        for limited_side, full_side in [(limited_book._bids, full_book._bids), (limited_book._asks, full_book._asks)]:
+            self.assertLessEqual(len(limited_side), 30)
+            self.assertEqual([(level.price, level.quantity) for level in limited_side],
+                             [(level.price, level.quantity) for level in full_side.top(30)])
+        depth_view = limited_book.depth_view()
+        self.assertEqual(depth_view.bid_prices.tolist(), [level.price for level in limited_book._bids])
+        self.assertEqual(depth_view.ask_quantities.tolist(), [level.quantity for level in limited_book._asks])
+
+    def test_max_depth_bounds(self):
+        with self.assertRaises(ValueError):
+            OrderBook("BTC-USDT-SWAP", max_depth=10)
+        order_book = OrderBook("BTC-USDT-SWAP", max_depth=25, max_overflow=5)
+        order_book.set_asks_on_snapshot([_level(str(1001 + i), "1") for i in range(40)])
+        self.assertEqual(len(order_book._asks), 25)
+        self.assertEqual(order_book._asks.dropped_levels, 10)
+        order_book.set_asks_on_update(_level("1001", "0"))
+        self.assertEqual(order_book._asks[24].price, 1026)
+
+    def test_full_overflow_keeps_demoted_level(self):
+        full_book = OrderBook("BTC-USDT-SWAP")
+        limited_book = OrderBook("BTC-USDT-SWAP", max_depth=25, max_overflow=5)
+        for order_book in [full_book, limited_book]:
+            order_book.set_asks_on_snapshot([_level(str(1001 + i), "1") for i in range(40)])
+            order_book.set_asks_on_update(_level("1000.5", "1"))
+            order_book.set_asks_on_update(_level("1000.5", "0"))
+        self.assertEqual(limited_book._asks[24].price, 1025)
+        self.assertEqual(limited_book._calc_check_sum(), full_book._calc_check_sum())
+        # 1031 and beyond dropped by the snapshot, then 1030 evicted for the demoted 1025
+        self.assertEqual(limited_book._asks.truncated_price, 1030)
+        self.assertEqual(limited_book._asks.trusted_depth(), 25)
+
+    def test_small_overflow_matches_full_book_up_to_trusted_depth(self):
+        rnd = random.Random(11)
+        full_book = OrderBook("BTC-USDT-SWAP")
+        limited_book = OrderBook("BTC-USDT-SWAP", max_depth=25, max_overflow=10)
+        snapshot_asks = [_level(str(1001 + i), "1") for i in range(100)]
+        for order_book in [full_book, limited_book]:
+            order_book.set_asks_on_snapshot(list(snapshot_asks))
+        for _ in range(3000):
+            price = str(rnd.randint(990, 1060) + rnd.choice([0, 0.5]))
+            quantity = str(rnd.choice([0, 0, rnd.randint(1, 9)]))
+            for order_book in [full_book, limited_book]:
+                order_book.set_asks_on_update(_level(price, quantity))
+            trusted_depth = limited_book._asks.trusted_depth()
+            self.assertEqual([(level.price, level.quantity) for level in limited_book._asks.top(trusted_depth)],
+                             [(level.price, level.quantity) for level in full_book._asks.top(trusted_depth)])
+            if trusted_depth >= 25 or len(full_book._asks) == trusted_depth:
+                self.assertEqual(limited_book._calc_check_sum(), full_book._calc_check_sum())
@@ -0,0 +1,130 @@
+import threading
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from okx_market_maker import order_gateway_container
+from okx_market_maker.order_management_service import WssOrderManagementService
+from okx_market_maker.order_management_service.OrderGateway import OrderGateway, REST, WEBSOCKET
+from okx_market_maker.utils.OkxEnum import OrderOp
+
+
+class LocalPrivateSocket:
+    """
+    Stands in for the private websocket: accepts order ops while connected, and replies from another thread
+    through the orders callback, as the reactor thread does.
+    """
+    def __init__(self, connected=True, code="0"):
+        self.connected = connected
+        self.code = code
+        self.sent = []
+
+    def send_order_op(self, request_id, op, args):
+        if not self.connected:
+            return False
+        self.sent.append((request_id, op, args))
+        if self.code is not None:
+            reply = {"id": request_id, "op": op.value, "code": self.code, "msg": "", "data": [
+                {"clOrdId": arg["clOrdId"], "ordId": "1", "reqId": arg.get("reqId", ""), "sCode": "0", "sMsg": ""}
+                for arg in args]}
+            threading.Thread(target=WssOrderManagementService._callback, args=(reply,)).start()
+        return True
+
+
+class TestOrderGateway(TestCase):
+    def setUp(self) -> None:
+        self.release = threading.Event()
+        self.trade_api = MagicMock()
+
+        def place_multiple_orders(order_data_list):
+            self.release.wait(5)
+            return {"code": "0", "data": [{"clOrdId": order_data["clOrdId"], "ordId": "1", "sCode": "0"}
+                                          for order_data in order_data_list]}
+        self.trade_api.place_multiple_orders.side_effect = place_multiple_orders
+        self.gateway = OrderGateway(self.trade_api, max_workers=2)
+
+    def tearDown(self) -> None:
+        self.release.set()
+        self.gateway.shutdown()
+
+    def test_batches_in_flight_concurrently(self):
+        first = self.gateway.place_orders([{"clOrdId": "a"}])
+        second = self.gateway.place_orders([{"clOrdId": "b"}])
+        self.assertFalse(first.done())
+        self.assertIs(self.gateway.in_flight("b"), second)
+        self.assertEqual(self.gateway.in_flight_count(), 2)
+        self.assertEqual(self.gateway.drain_responses(), [])
+        self.release.set()
+        self.assertTrue(self.gateway.wait_all(5))
+        self.assertIsNone(self.gateway.in_flight("a"))
+        responses = self.gateway.drain_responses()
+        self.assertEqual(sorted(response.order_data_list[0]["clOrdId"] for response in responses), ["a", "b"])
+        self.assertEqual(self.gateway.stats.send_to_ack[(REST, OrderOp.BATCH_ORDER)].count, 2)
+
+    def test_request_error_reported_as_unknown_outcome(self):
+        self.trade_api.amend_multiple_orders.side_effect = ConnectionError("timed out")
+        response = self.gateway.amend_orders([{"clOrdId": "a", "reqId": "amend1"}]).result(5)
+        self.assertTrue(response.outcome_unknown)
+        self.assertFalse(response.is_batch_failed())
+        self.assertEqual(response.result["msg"], "timed out")
+        self.assertEqual(self.gateway.stats.failed, 0)
+        self.assertEqual(self.gateway.stats.unknown, 1)
+
+    def test_order_lookup_on_worker_thread(self):
+        self.trade_api.get_order.side_effect = lambda **kwargs: self.release.wait(5) and {
+            "code": "0", "data": [{"clOrdId": kwargs["clOrdId"], "state": "live"}]}
+        future = self.gateway.get_order("BTC-USDT-SWAP", "a")
+        self.assertFalse(future.done())
+        self.release.set()
+        response = future.result(5)
+        self.trade_api.get_order.assert_called_once_with(instId="BTC-USDT-SWAP", clOrdId="a")
+        self.assertIsNone(response.op)
+        self.assertEqual(self.gateway.drain_responses(), [response])
+        self.assertEqual((self.gateway.stats.sent, self.gateway.stats.completed), (0, 0))
+
+
+class TestWebsocketOrderEntry(TestCase):
+    def setUp(self) -> None:
+        self.trade_api = MagicMock()
+        self.trade_api.cancel_multiple_orders.return_value = {"code": "0", "data": [
+            {"clOrdId": "a", "ordId": "1", "sCode": "0"}]}
+        self.socket = LocalPrivateSocket()
+        self.gateway = OrderGateway(self.trade_api, ws_client=self.socket, ws_timeout_sec=0.05)
+        order_gateway_container.append(self.gateway)
+
+    def tearDown(self) -> None:
+        order_gateway_container.clear()
+        self.gateway.shutdown()
+
+    def test_reply_matched_by_request_id(self):
+        future = self.gateway.amend_orders([{"instId": "BTC-USDT-SWAP", "clOrdId": "a", "reqId": "amend1"}])
+        response = future.result(5)
+        request_id, op, _ = self.socket.sent[0]
+        self.assertEqual(op.value, "batch-amend-orders")
+        self.assertEqual(response.result["id"], request_id)
+        self.assertEqual(response.channel, WEBSOCKET)
+        self.assertEqual(response.result["data"][0]["reqId"], "amend1")
+        self.trade_api.amend_multiple_orders.assert_not_called()
+        self.assertEqual(self.gateway.stats.send_to_ack[(WEBSOCKET, OrderOp.BATCH_AMEND)].count, 1)
+
+    def test_rest_fallback(self):
+        self.socket.connected = False
+        response = self.gateway.cancel_orders([{"instId": "BTC-USDT-SWAP", "clOrdId": "a"}]).result(5)
+        self.assertEqual(response.channel, REST)
+        self.socket.connected = True
+        self.socket.code = "60011"
+        response = self.gateway.cancel_orders([{"instId": "BTC-USDT-SWAP", "clOrdId": "a"}]).result(5)
+        self.assertEqual(response.channel, REST)
+        self.assertEqual(self.trade_api.cancel_multiple_orders.call_count, 2)
+        self.assertEqual(self.gateway.stats.rest_fallbacks, 2)
+
+    def test_no_reply_times_out(self):
+        self.socket.code = None
+        future = self.gateway.place_orders([{"instId": "BTC-USDT-SWAP", "clOrdId": "a"}])
+        self.assertTrue(self.gateway.wait_all(5))
+        self.assertTrue(future.result().outcome_unknown)
+        self.assertFalse(future.result().is_batch_failed())
+        self.assertEqual(self.gateway.stats.unknown, 1)
+        self.trade_api.place_multiple_orders.assert_not_called()
+        with self.assertRaises(ValueError):
+            self.gateway.place_orders([{"clOrdId": "b"}])
+        self.assertEqual(self.gateway.in_flight_count(), 0)
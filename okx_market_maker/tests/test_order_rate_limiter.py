@@ -0,0 +1,76 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from okx_market_maker.order_management_service.OrderRateLimiter import OrderRateLimiter
+from okx_market_maker.order_management_service.model.OrderRequest import CancelOrderRequest, AmendOrderRequest, \
+    PlaceOrderRequest
+from okx_market_maker.strategy.SampleMM import SampleMM, TRADING_INSTRUMENT_ID
+from okx_market_maker.strategy.model.StrategyOrder import StrategyOrder
+from okx_market_maker.utils.OkxEnum import OrderOp, OrderSide, OrderType, TdMode
+
+
+class TestOrderRateLimiter(TestCase):
+    @patch("time.monotonic", return_value=100)
+    def test_buckets(self, monotonic_mock):
+        limiter = OrderRateLimiter(window_sec=2, per_instrument=3, per_account=4)
+        self.assertEqual([limiter.try_acquire(OrderOp.BATCH_ORDER, "BTC-USDT") for _ in range(4)],
+                         [True, True, True, False])
+        self.assertTrue(limiter.try_acquire(OrderOp.BATCH_AMEND, "ETH-USDT"))
+        self.assertFalse(limiter.try_acquire(OrderOp.BATCH_AMEND, "ETH-USDT"))
+        self.assertTrue(limiter.try_acquire(OrderOp.BATCH_CANCEL, "BTC-USDT"))
+        monotonic_mock.return_value = 101
+        self.assertTrue(limiter.try_acquire(OrderOp.BATCH_ORDER, "BTC-USDT"))
+        self.assertEqual(limiter.stats.deferred[OrderOp.BATCH_ORDER], 1)
+        limiter.on_rate_limited(OrderOp.BATCH_CANCEL, ["BTC-USDT"])
+        self.assertFalse(limiter.try_acquire(OrderOp.BATCH_CANCEL, "BTC-USDT"))
+
+    @patch("time.monotonic", return_value=100)
+    def test_strategy_pushes_back_requests(self, monotonic_mock):
+        strategy = SampleMM()
+        strategy.order_rate_limiter = OrderRateLimiter(window_sec=2, per_instrument=10, per_account=2)
+        sent = []
+        strategy.order_gateway.place_orders = lambda order_data_list: sent.append(("place", order_data_list))
+        strategy.order_gateway.amend_orders = lambda order_data_list: sent.append(("amend", order_data_list))
+        strategy.order_gateway.cancel_orders = lambda order_data_list: sent.append(("cancel", order_data_list))
+        for cid in ["order1", "order2"]:
+            strategy._strategy_order_dict[cid] = StrategyOrder(
+                inst_id=TRADING_INSTRUMENT_ID, side=OrderSide.BUY, ord_type=OrderType.LIMIT, size="1", price="1",
+                client_order_id=cid)
+        cancel_deferred = strategy.cancel_orders([CancelOrderRequest(TRADING_INSTRUMENT_ID,
+                                                                     client_order_id="order1")])
+        amend_deferred = strategy.amend_orders([AmendOrderRequest(TRADING_INSTRUMENT_ID, client_order_id="order2",
+                                                                  req_id="amend1", new_price="2")])
+        place_request = PlaceOrderRequest(TRADING_INSTRUMENT_ID, TdMode.CROSS, OrderSide.BUY, OrderType.LIMIT, "1",
+                                          price="1", client_order_id="order3")
+        place_deferred = strategy.place_orders([place_request, PlaceOrderRequest(
+            TRADING_INSTRUMENT_ID, TdMode.CROSS, OrderSide.BUY, OrderType.LIMIT, "1", price="0.9",
+            client_order_id="order4")])
+        self.assertEqual((cancel_deferred, amend_deferred), ([], []))
+        self.assertEqual([request.client_order_id for request in place_deferred], ["order4"])
+        self.assertEqual([op for op, _ in sent], ["cancel", "amend", "place"])
+        self.assertNotIn("order4", strategy.get_strategy_orders())
+
+    @patch("time.monotonic", return_value=100)
+    def test_deferred_cancels_sent_next_cycle(self, monotonic_mock):
+        strategy = SampleMM()
+        strategy.order_rate_limiter = OrderRateLimiter(window_sec=2, per_instrument=1, per_account=10)
+        sent = []
+        strategy.order_gateway.place_orders = lambda order_data_list: sent.append(("place", order_data_list))
+        strategy.order_gateway.cancel_orders = lambda order_data_list: sent.append(("cancel", order_data_list))
+        for cid in ["order1", "order2"]:
+            strategy._strategy_order_dict[cid] = StrategyOrder(
+                inst_id=TRADING_INSTRUMENT_ID, side=OrderSide.BUY, ord_type=OrderType.LIMIT, size="1", price="1",
+                client_order_id=cid)
+        place_request = PlaceOrderRequest(TRADING_INSTRUMENT_ID, TdMode.CROSS, OrderSide.BUY, OrderType.LIMIT, "1",
+                                          price="1", client_order_id="order3")
+        strategy._send_order_requests([place_request], [], [
+            CancelOrderRequest(TRADING_INSTRUMENT_ID, client_order_id=cid) for cid in ["order1", "order2"]])
+        self.assertEqual([(op, [order_data["clOrdId"] for order_data in order_data_list])
+                          for op, order_data_list in sent], [("cancel", ["order1"]), ("place", ["order3"])])
+        self.assertEqual([request.client_order_id for request in strategy._deferred_cancel_orders], ["order2"])
+        # the next decision cancels order2 again, it is sent once
+        strategy.order_rate_limiter = OrderRateLimiter(window_sec=2, per_instrument=1, per_account=10)
+        strategy._send_order_requests([], [], [CancelOrderRequest(TRADING_INSTRUMENT_ID, client_order_id="order2")])
+        self.assertEqual([(op, [order_data["clOrdId"] for order_data in order_data_list])
+                          for op, order_data_list in sent[2:]], [("cancel", ["order2"])])
+        self.assertEqual(strategy._deferred_cancel_orders, [])
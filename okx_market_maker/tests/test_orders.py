@@ -0,0 +1,86 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from okx_market_maker import orders_container
+from okx_market_maker.order_management_service.WssOrderManagementService import on_orders_update, seed_orders
+from okx_market_maker.order_management_service.model.Order import Orders
+from okx_market_maker.order_management_service.model.OrderArchive import OrderArchive
+from okx_market_maker.utils.OkxEnum import OrderState
+from okx_market_maker.tests.fixtures import order_json
+
+
+class TestOrders(TestCase):
+    def tearDown(self) -> None:
+        orders_container.clear()
+
+    def test_copy_on_write_update(self):
+        on_orders_update({"arg": {"channel": "orders"}, "data": [order_json(1), order_json(2)]})
+        first_version: Orders = orders_container[0]
+        on_orders_update({"arg": {"channel": "orders"}, "data": [order_json(2, state="filled"), order_json(3)]})
+        second_version: Orders = orders_container[0]
+        self.assertIsNot(first_version, second_version)
+        self.assertEqual(second_version.version, first_version.version + 1)
+        self.assertEqual(first_version.get_order_by_client_order_id("order2").state, OrderState.LIVE)
+        self.assertIsNone(first_version.get_order_by_order_id("3"))
+        self.assertEqual(second_version.get_order_by_client_order_id("order2").state, OrderState.FILLED)
+        self.assertIs(second_version.get_order_by_order_id("1"), first_version.get_order_by_order_id("1"))
+        self.assertEqual(len(second_version.get_active_orders()), 2)
+
+    def test_seed_orders_keeps_newer_pushes(self):
+        on_orders_update({"arg": {"channel": "orders"}, "data": [{**order_json(1, state="canceled"), "uTime": "2000"},
+                                                                 {**order_json(2), "uTime": "1000"}]})
+        seed_orders([{**order_json(1), "uTime": "1500"}, {**order_json(2, state="partially_filled"), "uTime": "1500"},
+                     order_json(3)])
+        orders: Orders = orders_container[0]
+        self.assertEqual(orders.get_order_by_order_id("1").state, OrderState.CANCELED)
+        self.assertEqual(orders.get_order_by_order_id("2").state, OrderState.PARTIALLY_FILLED)
+        self.assertEqual(orders.get_order_by_order_id("3").state, OrderState.LIVE)
+        self.assertEqual(orders.newer_than_cached([order_json(3)]), [])
+
+    @patch("time.time", return_value=1000)
+    def test_terminal_orders_evicted_after_grace(self, time_mock):
+        orders = Orders(terminal_grace_sec=60, max_orders=100, archive=OrderArchive(2))
+        orders = orders.updated_from_json({"data": [order_json(1), order_json(2, state="canceled")]})
+        time_mock.return_value = 1030
+        orders = orders.updated_from_json({"data": [order_json(1, state="filled"), order_json(3, state="canceled")]})
+        self.assertEqual(len(orders._order_map), 3)
+        time_mock.return_value = 1061
+        orders = orders.updated_from_json({"data": []})
+        self.assertIsNone(orders.get_order_by_client_order_id("order2"))
+        self.assertEqual(orders.get_order_by_client_order_id("order1").state, OrderState.FILLED)
+        self.assertEqual(orders.archive.find(client_order_id="order2").state, OrderState.CANCELED)
+        time_mock.return_value = 1091
+        orders = orders.updated_from_json({"data": [order_json(4)]})
+        self.assertEqual(list(orders._order_map), ["4"])
+        self.assertEqual([record.ord_id for record in orders.archive], ["1", "3"])
+        self.assertEqual(orders.archive.stats.evicted_after_grace, 3)
+
+    @patch("time.time", return_value=1000)
+    def test_cap_evicts_oldest_terminal_orders_only(self, time_mock):
+        orders = Orders(terminal_grace_sec=60, max_orders=3, archive=OrderArchive(10))
+        orders = orders.updated_from_json({"data": [order_json(1, state="canceled"), order_json(2),
+                                                    order_json(3, state="filled"), order_json(4)]})
+        self.assertEqual(sorted(orders._order_map), ["2", "3", "4"])
+        orders = orders.updated_from_json({"data": [order_json(5), order_json(6)]})
+        self.assertEqual(sorted(orders._order_map), ["2", "4", "5", "6"])
+        self.assertEqual(orders.archive.stats.evicted_over_cap, 2)
+        self.assertEqual(orders.archive.stats.over_cap_with_active_orders, 1)
+
+    @patch("time.time", return_value=1000)
+    def test_pinned_orders_not_evicted(self, time_mock):
+        strategy_orders = {"order1": None}
+        orders = Orders(terminal_grace_sec=60, max_orders=2, archive=OrderArchive(10),
+                        pinned_client_order_ids=strategy_orders)
+        orders = orders.updated_from_json({"data": [order_json(1, state="filled"), order_json(2, state="canceled"),
+                                                    order_json(3)]})
+        self.assertEqual(sorted(orders._order_map), ["1", "3"])
+        time_mock.return_value = 1061
+        orders = orders.updated_from_json({"data": []})
+        self.assertEqual(orders.get_order_by_client_order_id("order1").state, OrderState.FILLED)
+        del strategy_orders["order1"]
+        orders = orders.updated_from_json({"data": []})
+        self.assertEqual(orders.get_order_by_client_order_id("order1").state, OrderState.FILLED)
+        time_mock.return_value = 1122
+        orders = orders.updated_from_json({"data": []})
+        self.assertEqual(list(orders._order_map), ["3"])
+        self.assertEqual([record.ord_id for record in orders.archive], ["2", "1"])
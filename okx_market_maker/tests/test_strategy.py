@@ -1,15 +1,27 @@
+import os
+import tempfile
+import time
 from decimal import Decimal
 from unittest import TestCase
 from unittest.mock import patch, MagicMock
 
+from okx_market_maker.market_data_service.model.BestBidOffer import BestBidOffer
+from okx_market_maker.market_data_service.model.Instrument import Instrument
 from okx_market_maker.market_data_service.model.OrderBook import OrderBookLevel
 from okx_market_maker.order_management_service.model.Order import Orders, Order
+from okx_market_maker.order_management_service.model.OrderRequest import PlaceOrderRequest, AmendOrderRequest, \
+    CancelOrderRequest
+from okx_market_maker import update_queue_container, account_container, positions_container
 from okx_market_maker.position_management_service.model.Account import Account
+from okx_market_maker.position_management_service.WssPositionManagementService import _callback as _pms_callback
 from okx_market_maker.settings import ORDER_BOOK_DELAYED_SEC, ACCOUNT_DELAYED_SEC
 from okx_market_maker.strategy.SampleMM import SampleMM, OrderBook, TRADING_INSTRUMENT_ID
+from okx_market_maker.strategy.model.StrategyCheckpoint import StrategyCheckpoint
 from okx_market_maker.strategy.model.StrategyOrder import StrategyOrder, StrategyOrderStatus
+from okx_market_maker.strategy.risk.RiskSnapshot import RiskSnapShot
 from okx_market_maker.utils.OkxEnum import OrderState, OrderSide, OrderType, AccountConfigMode, InstType, TdMode
 from okx_market_maker.utils.TdModeUtil import TdModeUtil
+from okx_market_maker.tests.fixtures import order_json
 
 
 class TestStrategy(TestCase):
@@ -31,6 +43,7 @@ class TestStrategy(TestCase):
         self.strategy.get_account = MagicMock(return_value=account)
         self.strategy.mds.stop_service = MagicMock(return_value=None)
         self.strategy.mds.run_service = MagicMock(return_value=None)
+        self.strategy.mds.resync_instrument = MagicMock(return_value=None)
 
     def test_check_status(self):
         self.strategy.status_api.status = MagicMock(return_value={
@@ -60,6 +73,173 @@ class TestStrategy(TestCase):
         })
         self.assertTrue(self.strategy.check_status())
 
+    @patch("time.time", return_value=1235)
+    def test_health_check_bbo_only(self, time_mock):
+        self.strategy.mds.channels = ["bbo-tbt"]
+        self.strategy.get_order_book = MagicMock(side_effect=ValueError)
+        self.account.u_time = 1234000
+        self.assertFalse(self.strategy._health_check())
+        self.strategy.get_bbo = MagicMock(return_value=BestBidOffer(
+            TRADING_INSTRUMENT_ID, bid_price=1, bid_quantity=1, ask_price=2, ask_quantity=2, timestamp=1234000))
+        self.assertTrue(self.strategy._health_check())
+        self.strategy.get_bbo.return_value = BestBidOffer(TRADING_INSTRUMENT_ID, timestamp=1000)
+        self.assertFalse(self.strategy._health_check())
+
+    def test_drain_updates(self):
+        del self.strategy.get_order_book
+        del self.strategy.get_account
+        self.strategy.on_order_updates = MagicMock(return_value=None)
+        with self.assertRaises(ValueError):
+            self.strategy.get_order_book()
+        update_queue = self.strategy.update_queue
+        update_queue.put("books", TRADING_INSTRUMENT_ID, self.order_book.snapshot())
+        update_queue.put("orders", None, [{"clOrdId": "a"}])
+        update_queue.put("account", None, Account.init_from_json({"data": [{"uTime": "1234000", "details": []}]}))
+        update_queue.put("orders", None, [{"clOrdId": "b"}])
+        self.strategy._drain_updates()
+        self.assertEqual(self.strategy.get_order_book().best_bid_price(), 1)
+        self.assertEqual(self.strategy.get_account().u_time, 1234000)
+        self.strategy.on_order_updates.assert_called_once_with([{"clOrdId": "a"}, {"clOrdId": "b"}])
+
+    def test_partial_account_pushes_merged(self):
+        del self.strategy.get_account
+        update_queue_container.append(self.strategy.update_queue)
+        account_container.clear()
+        positions_container.clear()
+        try:
+            for ccy, eq in [("BTC", "1"), ("USDT", "1000")]:
+                _pms_callback({"arg": {"channel": "account"}, "data": [
+                    {"uTime": "1234000", "details": [{"ccy": ccy, "eq": eq, "availEq": eq}]}]})
+            _pms_callback({"arg": {"channel": "positions"}, "data": [
+                {"posId": "1", "instId": TRADING_INSTRUMENT_ID, "instType": "SWAP", "pos": "2", "mgnMode": "cross",
+                 "posSide": "net", "ccy": "USDT", "posCcy": "", "liabCcy": ""}]})
+            first_account = account_container[0]
+            self.strategy._drain_updates()
+            self.assertEqual(sorted(self.strategy.get_account().get_account_details()), ["BTC", "USDT"])
+            self.assertEqual(list(self.strategy.get_positions().get_position_map()), ["1"])
+            _pms_callback({"arg": {"channel": "account"}, "data": [
+                {"uTime": "1235000", "details": [{"ccy": "BTC", "eq": "0", "availEq": "0"}]}]})
+            self.strategy._drain_updates()
+            self.assertEqual(list(self.strategy.get_account().get_account_details()), ["USDT"])
+            # the account handed over before is left as it was
+            self.assertEqual(sorted(first_account.get_account_details()), ["BTC", "USDT"])
+        finally:
+            update_queue_container.clear()
+            account_container.clear()
+            positions_container.clear()
+
+    def test_wait_for_update(self):
+        update_queue = self.strategy.update_queue
+        self.strategy._last_cycle_time = time.time()
+        update_queue.put("books", "ETH-USDT-SWAP", self.order_book.snapshot())
+        self.assertFalse(self.strategy._wait_for_update())
+        self.assertEqual(update_queue.depth(), 0)
+        self.strategy._last_cycle_time = time.time()
+        update_queue.put("positions", None, {"data": []})
+        self.assertTrue(self.strategy._wait_for_update())
+        tick_time = self.strategy._tick_time
+        self.assertGreater(tick_time, 0)
+        update_queue.put("books", TRADING_INSTRUMENT_ID, self.order_book.snapshot())
+        self.strategy._drain_updates()
+        self.assertEqual(self.strategy._tick_time, tick_time)
+
+    def test_order_gateway_responses(self):
+        self.strategy.trade_api.place_multiple_orders = MagicMock(return_value={"code": "2", "data": [
+            {"clOrdId": "order1", "ordId": "1", "sCode": "0"}, {"clOrdId": "order2", "ordId": "", "sCode": "51008"}]})
+        self.strategy.trade_api.amend_multiple_orders = MagicMock(return_value={"code": "0", "data": [
+            {"clOrdId": "order1", "reqId": "amend1", "sCode": "0"}]})
+        self.strategy.place_orders([
+            PlaceOrderRequest(TRADING_INSTRUMENT_ID, TdMode.CROSS, OrderSide.BUY, OrderType.LIMIT, "1", price="1",
+                              client_order_id="order1"),
+            PlaceOrderRequest(TRADING_INSTRUMENT_ID, TdMode.CROSS, OrderSide.BUY, OrderType.LIMIT, "1", price="0.9",
+                              client_order_id="order2")])
+        self.assertEqual(len(self.strategy.get_strategy_orders()), 2)
+        self.assertTrue(self.strategy.order_gateway.wait_all(5))
+        self.strategy._drain_updates()
+        strategy_orders = self.strategy.get_strategy_orders()
+        self.assertEqual(list(strategy_orders), ["order1"])
+        self.assertEqual(strategy_orders["order1"].strategy_order_status, StrategyOrderStatus.ACK)
+        self.assertEqual(strategy_orders["order1"].order_id, "1")
+        self.strategy.amend_orders([AmendOrderRequest(TRADING_INSTRUMENT_ID, client_order_id="order1",
+                                                      req_id="amend2", new_price="1.1")])
+        self.assertTrue(self.strategy.order_gateway.wait_all(5))
+        self.strategy._drain_updates()
+        self.assertEqual(strategy_orders["order1"].strategy_order_status, StrategyOrderStatus.AMD_SENT)
+
+    def test_cancel_sent_once_until_rejected(self):
+        self.strategy.trade_api.cancel_multiple_orders = MagicMock(return_value={"code": "1", "data": [
+            {"clOrdId": "order1", "ordId": "1", "sCode": "51400"}]})
+        self.strategy._strategy_order_dict["order1"] = StrategyOrder(
+            inst_id=TRADING_INSTRUMENT_ID, side=OrderSide.BUY, ord_type=OrderType.LIMIT, size="1", price="1",
+            client_order_id="order1", strategy_order_status=StrategyOrderStatus.LIVE)
+        cancel_request = CancelOrderRequest(TRADING_INSTRUMENT_ID, client_order_id="order1")
+        self.strategy.cancel_orders([cancel_request])
+        self.strategy.cancel_orders([cancel_request])
+        self.assertTrue(self.strategy.order_gateway.wait_all(5))
+        self.strategy.cancel_orders([cancel_request])
+        self.assertEqual(self.strategy.trade_api.cancel_multiple_orders.call_count, 1)
+        self.strategy._drain_updates()
+        self.assertEqual(self.strategy.get_strategy_orders()["order1"].strategy_order_status,
+                         StrategyOrderStatus.LIVE)
+        self.strategy.trade_api.cancel_multiple_orders.return_value = {"code": "0", "data": [
+            {"clOrdId": "order1", "ordId": "1", "sCode": "0"}]}
+        self.strategy.cancel_orders([cancel_request])
+        self.assertTrue(self.strategy.order_gateway.wait_all(5))
+        self.strategy._drain_updates()
+        self.strategy.cancel_orders([cancel_request])
+        self.assertEqual(self.strategy.trade_api.cancel_multiple_orders.call_count, 2)
+        self.assertEqual(self.strategy.get_strategy_orders()["order1"].strategy_order_status,
+                         StrategyOrderStatus.CXL_ACK)
+
+    def test_place_outcome_unknown(self):
+        self.strategy.trade_api.place_multiple_orders = MagicMock(side_effect=TimeoutError("read timeout"))
+        self.strategy.trade_api.cancel_multiple_orders = MagicMock(return_value={"code": "0", "data": [
+            {"clOrdId": "order1", "ordId": "1", "sCode": "0"}]})
+        self.strategy.place_orders([
+            PlaceOrderRequest(TRADING_INSTRUMENT_ID, TdMode.CROSS, OrderSide.BUY, OrderType.LIMIT, "1", price="1",
+                              client_order_id=f"order{i}") for i in [1, 2, 3]])
+        self.assertTrue(self.strategy.order_gateway.wait_all(5))
+        self.strategy._drain_updates()
+        strategy_orders = self.strategy.get_strategy_orders()
+        self.assertEqual(sorted(strategy_orders), ["order1", "order2", "order3"])
+        self.assertEqual(strategy_orders["order1"].strategy_order_status, StrategyOrderStatus.UNKNOWN)
+        # the orders channel tells order1 was placed and filled in part
+        self.strategy._reconcile_order_updates([{**order_json(1, state="partially_filled"), "tradeId": "11",
+                                                 "fillSz": "0.25", "accFillSz": "0.25", "fillPx": "1"}])
+        self.assertEqual(strategy_orders["order1"].strategy_order_status, StrategyOrderStatus.PARTIALLY_FILLED)
+        self.assertEqual(self.strategy._strategy_measurement.net_filled_qty, Decimal("0.25"))
+        # lookups: order2 was placed and filled twice unseen, the order only tells the last fill; order3 never
+        # reached the exchange
+        self.strategy.trade_api.get_order = MagicMock(side_effect=lambda instId, clOrdId: {
+            "code": "0", "data": [{**order_json(2, state="partially_filled"), "tradeId": "22", "fillSz": "0.5",
+                                   "accFillSz": "0.75", "fillPx": "1"}]} if clOrdId == "order2" else
+            {"code": "51603", "msg": "Order does not exist", "data": []})
+        self.strategy.trade_api.get_fills = MagicMock(return_value={"code": "0", "data": [
+            {"tradeId": "22", "ordId": "2", "fillSz": "0.5", "fillPx": "1", "fee": "-0.001", "ts": "1597026383085"},
+            {"tradeId": "21", "ordId": "2", "fillSz": "0.25", "fillPx": "1", "fee": "-0.001",
+             "ts": "1597026383080"}]})
+        self.strategy._resolve_unknown_orders()
+        self.strategy.trade_api.get_order.assert_not_called()
+        with patch("time.time", return_value=time.time() + 60):
+            self.strategy._resolve_unknown_orders()
+            # the lookups are sent without blocking the strategy thread, and applied on the next drain
+            self.strategy._resolve_unknown_orders()
+        for client_order_id in ["order2", "order3"]:
+            strategy_orders[client_order_id].request_future.result(5)
+        self.assertEqual(self.strategy.trade_api.get_order.call_count, 2)
+        self.assertEqual(strategy_orders["order2"].strategy_order_status, StrategyOrderStatus.UNKNOWN)
+        self.strategy._drain_updates()
+        strategy_orders = self.strategy.get_strategy_orders()
+        self.assertEqual(sorted(strategy_orders), ["order1", "order2"])
+        self.assertEqual(strategy_orders["order2"].strategy_order_status, StrategyOrderStatus.PARTIALLY_FILLED)
+        self.strategy.trade_api.get_fills.assert_called_once_with(instId=TRADING_INSTRUMENT_ID, ordId="2")
+        self.assertEqual(self.strategy._strategy_measurement.net_filled_qty, Decimal("1"))
+        self.assertEqual(len(self.strategy._strategy_measurement.fill_ledger), 3)
+        self.strategy.cancel_all()
+        self.assertEqual(sorted(order_data["clOrdId"] for order_data in
+                                self.strategy.trade_api.cancel_multiple_orders.call_args.args[0]),
+                         ["order1", "order2"])
+
     @patch("time.time", return_value=1234+ORDER_BOOK_DELAYED_SEC+1)
     def test_health_check_orderbook_timeout(self, time_mock):
         self.assertFalse(self.strategy._health_check())
@@ -68,8 +248,15 @@ class TestStrategy(TestCase):
     def test_health_check_checksum_failed(self, time_mock):
         self.order_book.do_check_sum = MagicMock(return_value=False)
         self.assertFalse(self.strategy._health_check())
-        self.strategy.mds.stop_service.assert_called_once()
-        self.strategy.mds.run_service.assert_called_once()
+        self.strategy.mds.resync_instrument.assert_called_once_with(TRADING_INSTRUMENT_ID)
+        self.strategy.mds.stop_service.assert_not_called()
+        self.strategy.mds.run_service.assert_not_called()
+
+    @patch("time.time", return_value=1235)
+    def test_health_check_orderbook_stale(self, time_mock):
+        self.order_book.set_stale(True)
+        self.assertFalse(self.strategy._health_check())
+        self.strategy.mds.resync_instrument.assert_called_once_with(TRADING_INSTRUMENT_ID)
 
     @patch("time.time", return_value=1234 + ACCOUNT_DELAYED_SEC + 1)
     def test_health_check_account_timeout(self, time_mock):
@@ -108,6 +295,66 @@ class TestStrategy(TestCase):
         self.assertEqual(self.strategy._strategy_order_dict["order4"].filled_size, order4.acc_fill_sz)
         self.assertEqual(self.strategy._strategy_measurement.net_filled_qty, Decimal("1.5"))
 
+    def test_reconcile_order_updates(self):
+        self.strategy._strategy_order_dict = {
+            cid: StrategyOrder(inst_id=TRADING_INSTRUMENT_ID, side=OrderSide.BUY, ord_type=OrderType.LIMIT,
+                               size="1", price="1", client_order_id=cid,
+                               strategy_order_status=StrategyOrderStatus.ACK) for cid in ["order1", "order2", "order3"]}
+        fill = {**order_json(1, state="partially_filled"), "tradeId": "11", "fillSz": "0.25", "accFillSz": "0.25",
+                "fillPx": "30000", "fillTime": "1597026383085"}
+        self.strategy._reconcile_order_updates([
+            order_json(2), fill, fill, {**order_json(3, state="filled"), "tradeId": "12", "fillSz": "1"},
+            order_json(9)])
+        strategy_orders = self.strategy.get_strategy_orders()
+        self.assertEqual(strategy_orders["order1"].strategy_order_status, StrategyOrderStatus.PARTIALLY_FILLED)
+        self.assertEqual(strategy_orders["order1"].filled_size, "0.25")
+        self.assertEqual(strategy_orders["order2"].strategy_order_status, StrategyOrderStatus.LIVE)
+        self.assertNotIn("order3", strategy_orders)
+        self.assertEqual(self.strategy._strategy_measurement.net_filled_qty, Decimal("1.25"))
+        self.assertEqual(len(self.strategy._strategy_measurement.fill_ledger), 2)
+        self.assertEqual(self.strategy._strategy_measurement.fill_ledger.position, 1.25)
+
+    @patch("okx_market_maker.strategy.BaseStrategy.WARM_START_PAGE_LIMIT", 2)
+    @patch("okx_market_maker.strategy.BaseStrategy.reactor")
+    @patch("okx_market_maker.strategy.BaseStrategy.InstrumentUtil.get_instrument",
+           return_value=Instrument(inst_id=TRADING_INSTRUMENT_ID, tick_sz=Decimal("0.1"), lot_sz=Decimal("1")))
+    def test_warm_start(self, get_instrument_mock, reactor_mock):
+        self.strategy.trading_instrument_type = InstType.SWAP
+        pages = [[{**order_json(1), "px": "30000.1"}, {**order_json(2), "clOrdId": "manual2"}],
+                 [{**order_json(3, state="partially_filled"), "accFillSz": "0.5", "side": "sell"}]]
+        self.strategy.trade_api.get_order_list = MagicMock(
+            side_effect=[{"code": "0", "data": page} for page in pages])
+        self.strategy.account_api.get_positions = MagicMock(return_value={"code": "0", "data": []})
+        with patch("okx_market_maker.strategy.BaseStrategy.STRATEGY_CHECKPOINT_PATH",
+                   os.path.join(tempfile.mkdtemp(), "checkpoint.pkl")):
+            self.strategy.warm_start()
+        self.assertEqual(self.strategy.trade_api.get_order_list.call_args.kwargs["after"], "2")
+        self.assertEqual(reactor_mock.callFromThread.call_count, 2)
+        strategy_orders = self.strategy.get_strategy_orders()
+        self.assertEqual(sorted(strategy_orders), ["order1", "order3"])
+        self.assertEqual(strategy_orders["order1"].price, "30000.1")
+        self.assertEqual(strategy_orders["order1"].order_id, "1")
+        self.assertEqual(strategy_orders["order1"].strategy_order_status, StrategyOrderStatus.LIVE)
+        self.assertEqual(strategy_orders["order3"].side, OrderSide.SELL)
+        self.assertEqual(strategy_orders["order3"].filled_size, "0.5")
+        self.assertEqual(strategy_orders["order3"].strategy_order_status, StrategyOrderStatus.PARTIALLY_FILLED)
+
+    def test_strategy_checkpoint(self):
+        path = os.path.join(tempfile.mkdtemp(), "checkpoint.pkl")
+        measurement = self.strategy.get_strategy_measurement()
+        self.assertIsNone(measurement.to_checkpoint())
+        measurement.consume_risk_snapshot(RiskSnapShot(timestamp=1234, asset_usd_value=100))
+        measurement.net_filled_qty = Decimal("1.5")
+        measurement.to_checkpoint().save(path)
+        self.assertIsNone(StrategyCheckpoint.load(path, "ETH-USDT-SWAP", max_age_sec=60))
+        checkpoint = StrategyCheckpoint.load(path, "BTC-USDT-SWAP", max_age_sec=60)
+        self.strategy.set_strategy_measurement("BTC-USDT-SWAP", trading_instrument_type=InstType.SWAP)
+        self.strategy.get_strategy_measurement().restore_checkpoint(checkpoint)
+        self.assertEqual(self.strategy.get_strategy_measurement()._inception_risk_snapshot.asset_usd_value, 100)
+        self.assertEqual(self.strategy.get_strategy_measurement().net_filled_qty, Decimal("1.5"))
+        with patch("time.time", return_value=time.time() + 61):
+            self.assertIsNone(StrategyCheckpoint.load(path, "BTC-USDT-SWAP", max_age_sec=60))
+
     def test_decide_td_mode(self):
         td_mode = TdModeUtil.decide_trading_mode(AccountConfigMode.CASH, InstType.SPOT, td_mode_setting="cross")
         self.assertEqual(td_mode, TdMode.CASH)
@@ -0,0 +1,67 @@
+from unittest import TestCase
+
+from okx_market_maker.market_data_service.model.Tickers import Tickers
+from okx_market_maker.utils.OkxEnum import InstType
+
+
+def _ticker_json(inst_id: str, bid_px: float, ask_px: float, last: float = 0, vol_ccy24h: float = 0,
+                 ts: int = 1597026383085) -> dict:
+    return {"instType": "SPOT", "instId": inst_id, "bidPx": str(bid_px), "askPx": str(ask_px),
+            "last": str(last or (bid_px + ask_px) / 2), "volCcy24h": str(vol_ccy24h), "ts": str(ts)}
+
+
+class TestTickers(TestCase):
+    def setUp(self) -> None:
+        self.tickers = Tickers()
+        self.tickers.update_from_json({"code": "0", "data": [
+            _ticker_json("BTC-USDT", 29999, 30001, vol_ccy24h=1e9),
+            _ticker_json("ETH-USDT", 1999, 2001, vol_ccy24h=1e8),
+            _ticker_json("USDC-USDT", 0.999, 1.001, vol_ccy24h=1e7),
+            _ticker_json("ABC-USDC", 1.9, 2.1, vol_ccy24h=1e3),
+            _ticker_json("ABC-BTC", 0.0001, 0.0001, vol_ccy24h=1),
+            _ticker_json("ABC-ETH", 0.001, 0.001, vol_ccy24h=0.01),
+        ]})
+
+    def test_usdt_price_paths(self):
+        self.assertEqual(self.tickers.get_usdt_price_by_ccy("USDT"), 1)
+        self.assertEqual(self.tickers.get_usdt_price_by_ccy("BTC"), 30000)
+        self.assertEqual(self.tickers.get_usdt_price_by_ccy("XYZ"), 0)
+        # ABC-BTC is the most liquid path: 1 BTC traded, against 1000 USDC and 0.01 ETH
+        audit = self.tickers.audit_usdt_price("ABC")
+        self.assertEqual(audit.inst_ids, ("ABC-BTC", "BTC-USDT"))
+        self.assertAlmostEqual(audit.usdt_price, 3)
+        self.assertTrue(audit.use_mid)
+        self.assertEqual(self.tickers.audit_usdt_price("ABC", use_mid=False).inst_ids, ("ABC-BTC", "BTC-USDT"))
+        self.tickers.update_from_data([_ticker_json("ABC-USDT", 4, 4)])
+        self.assertEqual(self.tickers.audit_usdt_price("ABC").inst_ids, ("ABC-USDT",))
+
+    def test_price_invalidated_by_path_tickers_only(self):
+        self.assertAlmostEqual(self.tickers.get_usdt_price_by_ccy("ABC"), 3)
+        self.tickers.update_from_data([_ticker_json("ETH-USDT", 2999, 3001, ts=1597026384085)])
+        self.assertIn(("ABC", True), self.tickers._conversion_index._prices)
+        self.tickers.update_from_data([_ticker_json("BTC-USDT", 39999, 40001, vol_ccy24h=1e9,
+                                                             ts=1597026384085)])
+        self.assertNotIn(("ABC", True), self.tickers._conversion_index._prices)
+        self.assertAlmostEqual(self.tickers.get_usdt_price_by_ccy("ABC"), 4)
+        self.assertEqual(self.tickers.get_usdt_price_by_ccy("ETH"), 3000)
+
+    def test_update_skipped_unless_ts_advances(self):
+        self.tickers.update_from_data([_ticker_json("BTC-USDT", 39999, 40001)])
+        self.assertEqual(self.tickers.get_price("BTC-USDT"), 30000)
+        self.assertEqual(self.tickers.get_ticker_by_inst_id("BTC-USDT").bid_px, 29999)
+        self.tickers.update_from_data([_ticker_json("BTC-USDT", 39999, 40001, ts=1597026384085)])
+        self.assertEqual(self.tickers.get_price("BTC-USDT"), 40000)
+        self.assertEqual(self.tickers.get_price("BTC-USDT", use_mid=False), 40000)
+        ticker = self.tickers.get_ticker_by_inst_id("BTC-USDT")
+        self.assertEqual((ticker.inst_type, ticker.ask_px, ticker.vol_ccy24h, ticker.ts),
+                         (InstType.SPOT, 40001, 0, 1597026384085))
+        self.assertIsNone(self.tickers.get_ticker_by_inst_id("XYZ-USDT"))
+        self.assertEqual(self.tickers.get_price("XYZ-USDT"), 0)
+
+    def test_rows_grow_past_initial_capacity(self):
+        tickers = Tickers(initial_capacity=2)
+        tickers.update_from_data([_ticker_json(f"C{i}-USDT", i, i + 2, vol_ccy24h=i) for i in range(1, 6)])
+        self.assertEqual(len(tickers), 5)
+        self.assertIn("C3-USDT", tickers)
+        self.assertEqual(tickers.get_price("C3-USDT"), 4)
+        self.assertEqual(tickers.get_vol_ccy24h("C5-USDT"), 5)
@@ -0,0 +1,49 @@
+import threading
+from unittest import TestCase
+from unittest.mock import patch
+
+from okx_market_maker.utils.UpdateQueue import UpdateQueue, QueuePolicy
+
+
+class TestUpdateQueue(TestCase):
+    def setUp(self) -> None:
+        self.update_queue = UpdateQueue(policies={"books": QueuePolicy.CONFLATE_LATEST,
+                                                  "orders": QueuePolicy.NEVER_DROP}, max_depth=3)
+
+    def test_conflate_latest_per_key(self):
+        self.update_queue.put("books", "BTC-USDT", 1)
+        self.update_queue.put("orders", None, ["a"])
+        self.update_queue.put("books", "ETH-USDT", 2)
+        self.update_queue.put("books", "BTC-USDT", 3)
+        self.update_queue.put("orders", None, ["b"])
+        self.assertEqual(self.update_queue.depth("books"), 2)
+        self.assertEqual(self.update_queue.depth(), 4)
+        events = self.update_queue.drain()
+        self.assertEqual([(event.channel, event.key, event.payload) for event in events],
+                         [("books", "BTC-USDT", 3), ("orders", None, ["a"]), ("books", "ETH-USDT", 2),
+                          ("orders", None, ["b"])])
+        self.assertEqual(self.update_queue.enqueued["books"], 3)
+        self.assertEqual(self.update_queue.conflated["books"], 1)
+        self.assertEqual(self.update_queue.depth(), 0)
+        self.assertEqual(self.update_queue.drain(), [])
+
+    def test_never_drop_beyond_max_depth(self):
+        with patch("okx_market_maker.utils.UpdateQueue.logging") as logging_mock:
+            for i in range(10):
+                self.update_queue.put("orders", None, [i])
+            logging_mock.warning.assert_called_once()
+        self.assertEqual([event.payload for event in self.update_queue.drain()], [[i] for i in range(10)])
+        self.assertEqual(self.update_queue.high_water_mark, 10)
+
+    @patch("time.time", side_effect=[100.0, 100.5])
+    def test_consumer_lag(self, time_mock):
+        self.update_queue.put("books", "BTC-USDT", 1)
+        self.update_queue.drain()
+        self.assertEqual(self.update_queue.consumer_lag["books"].last_ms, 500)
+
+    def test_wait_wakes_on_put(self):
+        self.assertFalse(self.update_queue.wait(0.01))
+        timer = threading.Timer(0.05, self.update_queue.put, args=("books", "BTC-USDT", 1))
+        timer.start()
+        self.assertTrue(self.update_queue.wait(5))
+        timer.join()
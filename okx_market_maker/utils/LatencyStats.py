@@ -0,0 +1,43 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque
+
+
+@dataclass
+class LatencyStats:
+    """
+    Running latency statistics in milliseconds, with a bounded window of recent samples for percentiles.
+    """
+    count: int = 0
+    total_ms: float = 0
+    last_ms: float = 0
+    max_ms: float = 0
+    _recent: Deque[float] = field(default_factory=lambda: deque(maxlen=1000))
+
+    def record(self, latency_ms: float):
+        self.count += 1
+        self.total_ms += latency_ms
+        self.last_ms = latency_ms
+        if latency_ms > self.max_ms:
+            self.max_ms = latency_ms
+        self._recent.append(latency_ms)
+
+    def record_since(self, start_time: float, end_time: float):
+        """
+        :param start_time: time.time() / time.perf_counter() reading at the start
+        :param end_time: reading from the same clock at the end
+        """
+        self.record((end_time - start_time) * 1000)
+
+    def mean_ms(self) -> float:
+        return self.total_ms / self.count if self.count else 0
+
+    def percentile_ms(self, pct: float) -> float:
+        if not self._recent:
+            return 0
+        recent = sorted(self._recent)
+        return recent[min(int(len(recent) * pct / 100), len(recent) - 1)]
+
+    def __str__(self):
+        return f"count {self.count}, last {self.last_ms:.3f}ms, mean {self.mean_ms():.3f}ms, " \
+               f"p99 {self.percentile_ms(99):.3f}ms, max {self.max_ms:.3f}ms"
@@ -84,7 +84,7 @@ class OrderOp(Enum, metaclass=ListEnumMeta):
     CANCEL = "cancel-order"
     BATCH_CANCEL = "batch-cancel-orders"
     AMEND = "amend-order"
-    BATCH_AMEND = "batch-amend-order"
+    BATCH_AMEND = "batch-amend-orders"
 
 
 class TdMode(Enum, metaclass=ListEnumMeta):
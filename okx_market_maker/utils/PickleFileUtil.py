@@ -0,0 +1,54 @@
+import logging
+import os
+import pickle
+import time
+import traceback
+from typing import Optional, Type, TypeVar
+
+T = TypeVar("T")
+
+
+class PickleFileUtil:
+    """
+    State kept on disk between runs, as a pickled object with a version and a saved_time attribute.
+    """
+    @classmethod
+    def save(cls, obj, path: str) -> None:
+        """
+        Written to a temporary file first and renamed, so that a crash while saving leaves the previous file.
+        :param obj: object with a saved_time attribute, set to now
+        :param path: file path
+        """
+        obj.saved_time = time.time()
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "wb") as f:
+            pickle.dump(obj, f)
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path: str, expected_type: Type[T], version: int, max_age_sec: float,
+             description: str) -> Optional[T]:
+        """
+        :param path: file path
+        :param expected_type: class of the object saved
+        :param version: version the object must carry
+        :param max_age_sec: maximum age of the file since it was saved
+        :param description: what the file holds, for the warnings logged
+        :return: the object, or None if there is none, or it is unreadable, from another version, or older than
+        max_age_sec
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                obj = pickle.load(f)
+        except Exception:
+            logging.warning(f"Failed to load {description} {path}: {traceback.format_exc()}")
+            return None
+        if not isinstance(obj, expected_type) or obj.version != version:
+            logging.warning(f"Ignored {description} {path} of another version")
+            return None
+        if time.time() - obj.saved_time > max_age_sec:
+            logging.warning(f"Ignored {description} {path} saved more than {max_age_sec} seconds ago")
+            return None
+        return obj
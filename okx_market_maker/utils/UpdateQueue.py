@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Dict, List, Hashable
+
+from okx_market_maker.utils.LatencyStats import LatencyStats
+
+
+class QueuePolicy(Enum):
+    CONFLATE_LATEST = "conflate_latest"  # keep only the latest payload per key until the consumer drains
+    NEVER_DROP = "never_drop"  # keep every payload in arrival order
+
+
+@dataclass
+class UpdateEvent:
+    channel: str
+    key: Hashable
+    payload: Any
+    enqueue_time: float  # time.time() of the first put since the last drain
+
+
+class UpdateQueue:
+    """
+    Hand-off between the websocket threads and the strategy thread. Producers put without ever blocking on the
+    consumer; the consumer drains all pending events at once, in arrival order. Channels with the CONFLATE_LATEST
+    policy hold at most one event per key (instrument), later payloads replace the pending one in place, so the
+    depth of a conflated channel is bounded by its number of keys however slow the consumer is. NEVER_DROP channels
+    keep every event, and a warning is logged when the queue grows beyond max_depth.
+    """
+
+    def __init__(self, policies: Dict[str, QueuePolicy], max_depth: int,
+                 default_policy: QueuePolicy = QueuePolicy.NEVER_DROP):
+        """
+        :param policies: policy by channel
+        :param max_depth: number of pending events above which a warning is logged
+        :param default_policy: policy of channels not in policies
+        """
+        self.policies = policies
+        self.max_depth = max_depth
+        self.default_policy = default_policy
+        self.enqueued: Dict[str, int] = defaultdict(int)
+        self.conflated: Dict[str, int] = defaultdict(int)
+        self.consumer_lag: Dict[str, LatencyStats] = defaultdict(LatencyStats)
+        self.high_water_mark = 0
+        self._pending: Dict[str, int] = defaultdict(int)
+        self._events: "OrderedDict[Hashable, UpdateEvent]" = OrderedDict()
+        self._sequence = 0
+        self._over_max_depth = False
+        self._condition = threading.Condition()
+
+    def put(self, channel: str, key: Hashable, payload: Any):
+        """
+        Called on the websocket threads.
+        :param channel: channel of the update
+        :param key: conflation key, e.g. instId
+        :param payload: immutable payload, it is handed to the consumer as is
+        """
+        now = time.time()
+        with self._condition:
+            self.enqueued[channel] += 1
+            if self.policies.get(channel, self.default_policy) == QueuePolicy.CONFLATE_LATEST:
+                event_key = (channel, key)
+                event = self._events.get(event_key)
+                if event is not None:
+                    event.payload = payload
+                    self.conflated[channel] += 1
+                    return
+            else:
+                self._sequence += 1
+                event_key = (channel, self._sequence)
+            self._events[event_key] = UpdateEvent(channel=channel, key=key, payload=payload, enqueue_time=now)
+            self._pending[channel] += 1
+            depth = len(self._events)
+            if depth > self.high_water_mark:
+                self.high_water_mark = depth
+            if depth > self.max_depth and not self._over_max_depth:
+                self._over_max_depth = True
+                logging.warning(f"Update queue depth {depth} over {self.max_depth}, the strategy is falling behind!")
+            self._condition.notify_all()
+
+    def drain(self) -> List[UpdateEvent]:
+        """
+        Called on the consumer thread.
+        :return: all pending events in arrival order, a conflated event in the place of its first arrival
+        """
+        with self._condition:
+            events = list(self._events.values())
+            self._events = OrderedDict()
+            self._pending = defaultdict(int)
+            self._over_max_depth = False
+        now = time.time()
+        for event in events:
+            self.consumer_lag[event.channel].record_since(event.enqueue_time, now)
+        return events
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Block the consumer until an event is pending or timeout seconds passed.
+        :return: whether an event is pending
+        """
+        with self._condition:
+            if not self._events:
+                self._condition.wait(timeout)
+            return bool(self._events)
+
+    def depth(self, channel: str = None) -> int:
+        with self._condition:
+            return self._pending.get(channel, 0) if channel else len(self._events)
+
+    def __str__(self):
+        return "; ".join(f"{channel}: depth {self._pending.get(channel, 0)}, enqueued {self.enqueued[channel]}, "
+                         f"conflated {self.conflated[channel]}, lag {self.consumer_lag[channel]}"
+                         for channel in list(self.enqueued))
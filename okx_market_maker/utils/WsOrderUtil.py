@@ -1,4 +1,3 @@
-from okx.websocket.WsUtils import isNotBlankStr, getParamKey, initSubscribeSet
 from okx_market_maker.utils.OkxEnum import OrderOp
 
 import shortuuid
@@ -8,31 +7,25 @@ def get_request_uuid(op):
     return f"{op}{str(shortuuid.uuid())}"
 
 
-def check_socket_request_params(op: str, args: list, channel_args, channel_param_map):
-    if ~isNotBlankStr(op):
+def check_socket_request_params(op: str, args: list) -> str:
+    """
+    Validate an order operation sent over the private websocket
+    :param op: one of OrderOp
+    :param args: order requests' json, each with instId
+    :return: a new request id, alphanumeric as the exchange requires
+    """
+    if not isinstance(op, str) or not op.strip():
         raise ValueError("op must not none")
     if op not in OrderOp:
         raise ValueError(f"invalid op {op}")
-    request_id = get_request_uuid(op)
+    if not args:
+        raise ValueError("args must not be empty")
     for arg in args:
-        channel = arg['channel'].strip()
-        if ~isNotBlankStr(channel):
-            raise ValueError("channel must not none")
-        arg_set = channel_param_map.get(channel, set())
-        arg_key = getParamKey(arg)
-        if arg_key in arg_set:
-            continue
-        else:
-            valid_params = initSubscribeSet(arg)
-        if len(valid_params) < 1:
-            continue
-        p = {}
-        for k in arg:
-            p[k.strip()] = arg.get(k).strip()
-        channel_param_map[channel] = channel_param_map.get(channel, set()) | valid_params
-        if channel not in channel_args:
-            channel_args[channel] = []
-        channel_args[channel].append(p)
+        if not isinstance(arg, dict):
+            raise ValueError("arg must dict")
+        if not isinstance(arg.get("instId"), str) or not arg["instId"].strip():
+            raise ValueError("instId must not none")
+    return get_request_uuid("ws")
 
 
 def get_request_param_key(arg: dict) -> str: